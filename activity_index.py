@@ -0,0 +1,273 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Callable, Tuple
+
+from web3 import Web3
+
+from wallet_utils import rpc_batch, _resolve_web3
+
+# 默认索引文件位置（每条链一个文件，见index_path_for_chain）
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# 每个批量请求拉取的完整区块数（完整区块较大，批次不宜过大）
+BLOCK_BATCH_SIZE = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS address_activity (
+    address TEXT PRIMARY KEY,
+    first_ts INTEGER NOT NULL,
+    last_ts INTEGER NOT NULL,
+    first_block INTEGER NOT NULL,
+    last_block INTEGER NOT NULL,
+    tx_count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS address_days (
+    address TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (address, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS gaps (
+    from_block INTEGER NOT NULL,
+    to_block INTEGER NOT NULL
+);
+"""
+
+
+def index_path_for_chain(chain_id: int) -> str:
+    """链chain_id的默认索引文件路径"""
+    return os.path.join(DEFAULT_INDEX_DIR, f"activity_index_{chain_id}.db")
+
+
+class ActivityIndex:
+    """
+    基于SQLite的钱包活跃度索引
+
+    按区块顺序拉取包含完整交易的区块，记录每个发送地址的活跃日期、
+    首次/最近交易时间，并保存已索引到的区块号，下次运行从断点继续。
+    查询活跃度时只读本地索引，不再消耗RPC请求。
+
+    只统计地址发出的交易（tx["from"]），与二分模式按交易数（nonce）统计的口径一致：
+    只收到转账、从未发出交易的钱包在两种模式下都没有活跃记录。
+
+    索引只覆盖 [first_block, last_block] 区间（中间可能有跳过的区块，见gaps），
+    首次交易时间是该区间内的第一笔，不一定是地址在链上的第一笔交易。
+    每个索引文件只属于一条链，第一次更新时记录节点的chain id，之后不一致则拒绝写入。
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def _get_meta(self, key: str) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def first_block(self) -> Optional[int]:
+        """索引覆盖的起始区块"""
+        return self._get_meta("first_block")
+
+    @property
+    def last_block(self) -> Optional[int]:
+        """已索引到的最后一个区块"""
+        return self._get_meta("last_block")
+
+    @property
+    def chain_id(self) -> Optional[int]:
+        """索引所属链的chain id"""
+        return self._get_meta("chain_id")
+
+    def gaps(self) -> List[Tuple[int, int]]:
+        """因落后太多而跳过、未被索引的区块区间 [(起始, 结束), ...]"""
+        with self._lock:
+            return self._conn.execute("SELECT from_block, to_block FROM gaps ORDER BY from_block").fetchall()
+
+    def _check_chain(self, web3: Web3):
+        """确认节点与索引属于同一条链，首次更新时记录chain id"""
+        chain_id = web3.eth.chain_id
+        recorded = self.chain_id
+        if recorded is None:
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('chain_id', ?)", (chain_id,))
+        elif recorded != chain_id:
+            raise ValueError(f"索引文件 {self.db_path} 属于链 {recorded}，当前节点为链 {chain_id}")
+
+    def _store_blocks(self, blocks: List[Dict[str, Any]]):
+        """将一批区块的交易写入索引（单个事务）"""
+        summary = {}
+        days = set()
+        for block in blocks:
+            number = int(block["number"], 16)
+            timestamp = int(block["timestamp"], 16)
+            day = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+            for tx in block.get("transactions") or []:
+                if not isinstance(tx, dict) or not tx.get("from"):
+                    continue
+                sender = tx["from"].lower()
+                days.add((sender, day))
+                entry = summary.get(sender)
+                if entry is None:
+                    summary[sender] = [timestamp, timestamp, number, number, 1]
+                else:
+                    entry[0] = min(entry[0], timestamp)
+                    entry[1] = max(entry[1], timestamp)
+                    entry[2] = min(entry[2], number)
+                    entry[3] = max(entry[3], number)
+                    entry[4] += 1
+
+        last_number = int(blocks[-1]["number"], 16)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO address_days (address, day) VALUES (?, ?)", days
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO address_activity (address, first_ts, last_ts, first_block, last_block, tx_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(address) DO UPDATE SET
+                    first_ts = min(first_ts, excluded.first_ts),
+                    last_ts = max(last_ts, excluded.last_ts),
+                    first_block = min(first_block, excluded.first_block),
+                    last_block = max(last_block, excluded.last_block),
+                    tx_count = tx_count + excluded.tx_count
+                """,
+                [(addr, *entry) for addr, entry in summary.items()]
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('last_block', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (last_number,)
+            )
+
+    def index_range(
+        self,
+        web3: Web3,
+        from_block: int,
+        to_block: int,
+        batch_size: int = BLOCK_BATCH_SIZE,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """
+        索引 [from_block, to_block] 区间内的区块
+
+        每批区块写入后立即提交，中途失败时已完成的部分保留，下次从断点继续。
+
+        Args:
+            web3: Web3对象或RPCPool，已连接到RPC节点
+            from_block: 起始区块
+            to_block: 结束区块（包含）
+            batch_size: 每个批量请求拉取的区块数
+            progress_callback: 进度回调 (已索引到的区块, 结束区块)
+
+        Returns:
+            本次索引的区块数
+        """
+        web3 = _resolve_web3(web3)
+        if self.first_block is None:
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('first_block', ?)", (from_block,))
+
+        indexed = 0
+        for start in range(from_block, to_block + 1, batch_size):
+            numbers = range(start, min(start + batch_size, to_block + 1))
+            calls = [("eth_getBlockByNumber", [hex(n), True]) for n in numbers]
+            blocks = rpc_batch(web3, calls, batch_size)
+            for number, block in zip(numbers, blocks):
+                if isinstance(block, Exception):
+                    raise RuntimeError(f"获取区块 {number} 失败: {str(block)}")
+                if block is None:
+                    raise RuntimeError(f"节点未返回区块 {number}")
+            self._store_blocks(blocks)
+            indexed += len(blocks)
+            if progress_callback:
+                progress_callback(numbers[-1], to_block)
+        return indexed
+
+    def update(
+        self,
+        web3: Web3,
+        max_blocks: int = 10000,
+        batch_size: int = BLOCK_BATCH_SIZE,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """
+        将索引更新到最新区块，每次最多索引max_blocks+1个区块
+
+        首次运行时从最新区块往前max_blocks个区块开始；之后从上次索引到的区块继续。
+        落后超过max_blocks个区块时只索引最新的部分，中间跳过的区块记入gaps，
+        不会因为长时间未运行而一次追赶整段历史。
+
+        Returns:
+            本次新索引的区块数
+        """
+        web3 = _resolve_web3(web3)
+        self._check_chain(web3)
+        head = web3.eth.block_number
+        last_block = self.last_block
+        start = max(0, head - max_blocks)
+        if last_block is not None:
+            if last_block + 1 < start:
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "INSERT INTO gaps (from_block, to_block) VALUES (?, ?)", (last_block + 1, start - 1)
+                    )
+            else:
+                start = last_block + 1
+        if start > head:
+            return 0
+        return self.index_range(web3, start, head, batch_size, progress_callback)
+
+    def lookup(self, wallet_addresses: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        从本地索引查询钱包活跃度
+
+        索引不从创世区块开始时，首次交易时间标注为索引范围内的第一笔；
+        有跳过的区块时，最近交易时间和活跃天数同样只统计已索引的区块。
+        只统计钱包发出的交易，只收到转账的钱包视为无交易。
+
+        Returns:
+            字典 {地址: {"active_weeks", "active_days", "first_tx_time", "last_tx_time"}}
+        """
+        first_block = self.first_block
+        partial = bool(self.gaps())
+        first_note = f"（区块{first_block}起的首笔）" if first_block or partial else ""
+        last_note = "（不含跳过的区块）" if partial else ""
+        results = {}
+        with self._lock:
+            for addr in wallet_addresses:
+                key = addr.lower()
+                row = self._conn.execute(
+                    "SELECT first_ts, last_ts FROM address_activity WHERE address = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    results[addr] = {
+                        "active_weeks": 0,
+                        "active_days": 0,
+                        "first_tx_time": "索引范围内无交易",
+                        "last_tx_time": "索引范围内无交易"
+                    }
+                    continue
+                days = [day for (day,) in self._conn.execute(
+                    "SELECT day FROM address_days WHERE address = ?", (key,)
+                )]
+                weeks = {datetime.strptime(day, "%Y-%m-%d").isocalendar()[:2] for day in days}
+                results[addr] = {
+                    "active_weeks": len(weeks),
+                    "active_days": len(days),
+                    "first_tx_time": datetime.fromtimestamp(row[0]).strftime("%Y-%m-%d") + first_note,
+                    "last_tx_time": datetime.fromtimestamp(row[1]).strftime("%Y-%m-%d") + last_note
+                }
+        return results
@@ -0,0 +1,320 @@
+import asyncio
+import threading
+import time
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union, Tuple
+
+import aiohttp
+
+from defaults import DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+from wallet_utils import RPCError, encode_batch, parse_batch_response
+from rpc_pool import RPCPool, _is_node_failure
+from lean_rpc import is_address, address_param, format_balance, json_dumps, json_loads
+from rate_limit import (
+    RateLimitError, get_limiter, parse_retry_after, is_rate_limited, is_transient,
+    backoff_delay, MAX_RETRIES
+)
+
+
+# 每个地址需要查询的字段: (结果字段, RPC方法)
+_WALLET_FIELDS = (
+    ("balance", "eth_getBalance"),
+    ("transactions", "eth_getTransactionCount"),
+)
+
+# 检查取消标志的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.1
+
+# 请求体由json_dumps预先编码（安装了orjson时更快）
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# 每批结果回调: (余额字典, 交易数字典)，只包含本批完成的地址
+BatchCallback = Callable[[Dict[str, Union[str, int]], Dict[str, Union[str, int]]], None]
+
+
+def _convert(field: str, value: str) -> Union[int, str]:
+    """将RPC返回的十六进制结果转换为与wallet_utils一致的格式"""
+    raw = int(value, 16)
+    if field == "balance":
+        return format_balance(raw)
+    return raw
+
+
+async def _post(
+    session: aiohttp.ClientSession,
+    url: str,
+    calls: List[Tuple[str, list]],
+    batched: bool
+) -> List[Any]:
+    """
+    发送一个JSON-RPC请求（批量或单个）
+
+    Returns:
+        与calls顺序一致的结果列表，失败的调用对应位置为RPCError
+    """
+    payload = encode_batch(calls)
+    limiter = get_limiter(url)
+    await limiter.acquire_async()
+    try:
+        body = json_dumps(payload if batched else payload[0])
+        async with session.post(url, data=body, headers=_JSON_HEADERS) as response:
+            if response.status == 429:
+                raise RateLimitError(retry_after=parse_retry_after(response.headers.get("Retry-After")))
+            response.raise_for_status()
+            data = await response.json(content_type=None, loads=json_loads)
+
+        # 单个请求的正常响应也按批量格式解析
+        if not batched and isinstance(data, dict) and "error" not in data:
+            data = [data]
+        results = parse_batch_response(data, len(calls))
+    except Exception as e:
+        limiter.report(e)
+        raise
+
+    # 批内单个调用被限流时同样降速
+    limiter.report(next((r for r in results if isinstance(r, Exception) and is_rate_limited(r)), None))
+    return results
+
+
+def _error_text(error: Exception) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "请求超时"
+    return str(error)
+
+
+async def _attempt(
+    session: aiohttp.ClientSession,
+    pool: RPCPool,
+    endpoint,
+    calls: List[Tuple[str, list]],
+    batched: bool
+) -> List[Any]:
+    """向连接池中的指定节点发送一次请求并记录节点健康状态"""
+    start = time.monotonic()
+    try:
+        results = await _post(session, endpoint.url, calls, batched)
+    except RPCError as e:
+        # 整个请求只返回一个错误对象：限流、内部错误等计为节点故障，请求本身的错误不算
+        pool.record(endpoint, None if _is_node_failure(e) else time.monotonic() - start)
+        if is_rate_limited(e):
+            # 与RPCPool相同，被限流时切换到其他节点
+            raise RateLimitError(str(e)) from e
+        raise
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, RateLimitError):
+        pool.record(endpoint, None)
+        raise
+    # 批内出现节点故障错误时计为失败，失败的调用由重试处理
+    failed = any(isinstance(r, RPCError) and _is_node_failure(r) for r in results)
+    pool.record(endpoint, None if failed else time.monotonic() - start)
+    return results
+
+
+async def _post_to_pool(
+    session: aiohttp.ClientSession,
+    pool: RPCPool,
+    calls: List[Tuple[str, list]],
+    batched: bool,
+    exclude: Optional[list] = None,
+    last_error: Optional[Exception] = None
+) -> List[Any]:
+    """通过连接池发送请求：按健康度选择节点，失败时切换到其他节点"""
+    tried = list(exclude or [])
+    for _ in range(len(pool.endpoints) - len(tried)):
+        endpoint = pool.choose(exclude=tried)
+        tried.append(endpoint)
+        try:
+            return await _attempt(session, pool, endpoint, calls, batched)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, RateLimitError) as e:
+            last_error = e
+    if isinstance(last_error, (asyncio.TimeoutError, RateLimitError)):
+        raise last_error
+    raise ConnectionError(f"所有RPC节点均请求失败: {last_error}")
+
+
+async def _post_to_pool_hedged(
+    session: aiohttp.ClientSession,
+    pool: RPCPool,
+    calls: List[Tuple[str, list]],
+    batched: bool
+) -> List[Any]:
+    """
+    对冲发送：主请求超过连接池的对冲延迟仍未返回时，向另一个节点发送副本，
+    先成功返回的结果胜出，另一个请求被取消
+    """
+    delay = pool.hedge_delay()
+    if delay is None:
+        return await _post_to_pool(session, pool, calls, batched)
+
+    primary = pool.choose()
+    tasks = {asyncio.ensure_future(_attempt(session, pool, primary, calls, batched)): primary}
+    done, _ = await asyncio.wait(tasks, timeout=delay)
+    if not done and pool.take_hedge():
+        secondary = pool.choose(exclude=[primary])
+        tasks[asyncio.ensure_future(_attempt(session, pool, secondary, calls, batched))] = secondary
+
+    last_error = None
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    if tasks[task] is not primary:
+                        pool.note_hedge_win()
+                    return task.result()
+                if isinstance(error, RPCError):
+                    raise error
+                last_error = error
+    finally:
+        for task in pending:
+            task.cancel()
+    # 已发送的都失败了，继续切换到其余节点
+    return await _post_to_pool(session, pool, calls, batched, exclude=list(tasks.values()), last_error=last_error)
+
+
+async def fetch_wallet_data(
+    rpc: Union[str, RPCPool],
+    wallet_addresses: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    batch_size: Optional[int] = DEFAULT_BATCH_SIZE,
+    max_retries: int = MAX_RETRIES,
+    on_batch: Optional[BatchCallback] = None,
+    cancel: Optional[threading.Event] = None,
+    fields: Optional[Iterable[str]] = None
+) -> Tuple[Dict[str, Union[str, int]], Dict[str, Union[str, int]]]:
+    """
+    并发查询钱包余额和交易数，两类请求在同一个任务池中交错执行
+
+    Args:
+        rpc: RPC节点URL或RPCPool连接池
+        wallet_addresses: 钱包地址列表
+        concurrency: 同时在途的最大请求数
+        timeout: 单个请求的超时时间（秒）
+        batch_size: 每个JSON-RPC批量请求包含的调用数，为None时每个调用单独发送
+        max_retries: 临时错误（限流、超时、连接失败）的最大重试次数
+        on_batch: 每个批量请求完成后以本批结果调用（在事件循环线程中），
+            等待重试的调用不包含在内
+        cancel: 置位后停止发送新请求并取消在途请求，返回已完成的部分结果
+        fields: 要查询的字段（"balance"、"transactions"），默认两者都查询
+
+    Returns:
+        (余额字典 {地址: 余额 | 错误信息}, 交易数字典 {地址: 交易数 | 错误信息})，
+        取消时只包含已完成的地址，未查询的字段为空字典
+    """
+    if fields is None:
+        wanted = _WALLET_FIELDS
+    else:
+        fields = set(fields)
+        unknown = fields - {field for field, _ in _WALLET_FIELDS}
+        if unknown:
+            raise ValueError(f"未知的字段: {', '.join(sorted(unknown))}")
+        wanted = tuple((field, method) for field, method in _WALLET_FIELDS if field in fields)
+    results = {field: {} for field, _ in _WALLET_FIELDS}
+
+    # 展开为 (地址, 字段, 方法) 调用列表
+    jobs = []
+    for addr in wallet_addresses:
+        if is_address(addr):
+            param = address_param(addr)
+            for field, method in wanted:
+                jobs.append((addr, field, method, [param, "latest"]))
+        else:
+            for field, _ in wanted:
+                results[field][addr] = "无效地址"
+    if on_batch and any(results.values()):
+        on_batch(dict(results["balance"]), dict(results["transactions"]))
+
+    batched = bool(batch_size)
+    step = max(1, int(batch_size)) if batched else 1
+    chunks = [jobs[i:i + step] for i in range(0, len(jobs), step)]
+
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def run_chunk(session: aiohttp.ClientSession, chunk: list, attempt: int = 0):
+        async with semaphore:
+            if cancel is not None and cancel.is_set():
+                return
+            try:
+                calls = [(method, params) for _, _, method, params in chunk]
+                if isinstance(rpc, RPCPool):
+                    rpc.note_request()
+                    if rpc.is_hedgeable(calls):
+                        values = await _post_to_pool_hedged(session, rpc, calls, batched)
+                    else:
+                        values = await _post_to_pool(session, rpc, calls, batched)
+                else:
+                    values = await _post(session, rpc, calls, batched)
+            except Exception as e:
+                values = [e] * len(chunk)
+
+        retry = []
+        completed = {field: {} for field, _ in _WALLET_FIELDS}
+        for job, value in zip(chunk, values):
+            addr, field = job[0], job[1]
+            if isinstance(value, Exception):
+                if attempt < max_retries and is_transient(value):
+                    # 临时错误（限流、超时等）重新排队，不记为错误
+                    retry.append(job)
+                    continue
+                completed[field][addr] = f"错误: {_error_text(value)}"
+            else:
+                try:
+                    completed[field][addr] = _convert(field, value)
+                except Exception as e:
+                    completed[field][addr] = f"错误: {str(e)}"
+        for field, values_by_addr in completed.items():
+            results[field].update(values_by_addr)
+        if on_batch and (completed["balance"] or completed["transactions"]):
+            on_batch(completed["balance"], completed["transactions"])
+
+        if retry:
+            await asyncio.sleep(backoff_delay(attempt))
+            await asyncio.gather(*(
+                run_chunk(session, retry[i:i + step], attempt + 1)
+                for i in range(0, len(retry), step)
+            ))
+
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        work = asyncio.gather(*(run_chunk(session, chunk) for chunk in chunks))
+        if cancel is not None:
+            # 定期检查取消标志，置位后取消全部在途请求
+            while not work.done():
+                if cancel.is_set():
+                    work.cancel()
+                    break
+                await asyncio.wait({work}, timeout=CANCEL_POLL_INTERVAL)
+        try:
+            await work
+        except asyncio.CancelledError:
+            if cancel is None or not cancel.is_set():
+                raise
+
+    # 保持与输入一致的顺序（取消时跳过未完成的地址）
+    balances = {addr: results["balance"][addr] for addr in wallet_addresses if addr in results["balance"]}
+    tx_counts = {addr: results["transactions"][addr] for addr in wallet_addresses if addr in results["transactions"]}
+    return balances, tx_counts
+
+
+def query_wallet_data(
+    rpc: Union[str, RPCPool],
+    wallet_addresses: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    batch_size: Optional[int] = DEFAULT_BATCH_SIZE,
+    max_retries: int = MAX_RETRIES,
+    on_batch: Optional[BatchCallback] = None,
+    cancel: Optional[threading.Event] = None,
+    fields: Optional[Iterable[str]] = None
+) -> Tuple[Dict[str, Union[str, int]], Dict[str, Union[str, int]]]:
+    """
+    fetch_wallet_data 的阻塞版本，供线程或同步代码直接调用
+
+    Args/Returns: 同 fetch_wallet_data
+    """
+    return asyncio.run(fetch_wallet_data(
+        rpc, wallet_addresses,
+        concurrency=concurrency, timeout=timeout, batch_size=batch_size,
+        max_retries=max_retries, on_batch=on_batch, cancel=cancel, fields=fields
+    ))
@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from web3 import Web3
+
+from wallet_utils import rpc_batch, _resolve_web3
+
+# 默认缓存文件位置
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "block_timestamps.db")
+# 内存LRU最多保留的区块数
+DEFAULT_MAX_ENTRIES = 100000
+# SQLite单条语句的参数上限以内分批查询
+_SQL_CHUNK = 500
+
+
+class BlockTimestampCache:
+    """
+    区块时间戳缓存
+
+    两级结构：内存LRU + SQLite持久化。历史区块不可变，缓存条目永不过期。
+    未命中的区块合并为JSON-RPC批量请求一起获取（只取区块头，不含交易）。
+    条目以 (chain id, 区块号) 为键，连接不同的链时互不干扰。
+    """
+
+    def __init__(self, db_path: Optional[str] = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._chain_ids = weakref.WeakKeyDictionary()  # provider -> chain id
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chain_block_timestamps ("
+                "chain_id INTEGER NOT NULL, number INTEGER NOT NULL, timestamp INTEGER NOT NULL, "
+                "PRIMARY KEY (chain_id, number)) WITHOUT ROWID"
+            )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, chain_id: int, number: int, timestamp: int):
+        key = (chain_id, number)
+        self._memory[key] = timestamp
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load_from_disk(self, chain_id: int, numbers: list) -> Dict[int, int]:
+        found = {}
+        if self._conn is None:
+            return found
+        for start in range(0, len(numbers), _SQL_CHUNK):
+            chunk = numbers[start:start + _SQL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for number, timestamp in self._conn.execute(
+                f"SELECT number, timestamp FROM chain_block_timestamps "
+                f"WHERE chain_id = ? AND number IN ({placeholders})", [chain_id, *chunk]
+            ):
+                found[number] = timestamp
+        return found
+
+    def _chain_id(self, web3: Web3) -> int:
+        """节点的chain id，每个provider只查询一次"""
+        provider = web3.provider
+        try:
+            return self._chain_ids[provider]
+        except (KeyError, TypeError):
+            pass
+        chain_id = web3.eth.chain_id
+        try:
+            self._chain_ids[provider] = chain_id
+        except TypeError:
+            pass
+        return chain_id
+
+    def get_many(self, web3: Web3, numbers: Iterable[int]) -> Dict[int, int]:
+        """
+        获取多个区块的时间戳
+
+        Args:
+            web3: Web3对象或RPCPool，用于确定chain id和获取未命中的区块
+            numbers: 区块号
+
+        Returns:
+            字典 {区块号: 时间戳}，获取失败的区块不在结果中
+        """
+        web3 = _resolve_web3(web3)
+        chain_id = self._chain_id(web3)
+        wanted = sorted(set(numbers))
+        results = {}
+        with self._lock:
+            missing = []
+            for number in wanted:
+                key = (chain_id, number)
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[number] = self._memory[key]
+                    self.hits += 1
+                else:
+                    missing.append(number)
+
+            if missing:
+                from_disk = self._load_from_disk(chain_id, missing)
+                for number, timestamp in from_disk.items():
+                    self._remember(chain_id, number, timestamp)
+                    results[number] = timestamp
+                self.disk_hits += len(from_disk)
+                missing = [number for number in missing if number not in from_disk]
+
+        if not missing:
+            return results
+
+        # 批量请求获取所有未命中的区块头
+        blocks = rpc_batch(web3, [("eth_getBlockByNumber", [hex(n), False]) for n in missing])
+        fetched = {}
+        for number, block in zip(missing, blocks):
+            if isinstance(block, dict) and block.get("timestamp"):
+                fetched[number] = int(block["timestamp"], 16)
+
+        with self._lock:
+            self.misses += len(missing)
+            for number, timestamp in fetched.items():
+                self._remember(chain_id, number, timestamp)
+            if self._conn is not None and fetched:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO chain_block_timestamps (chain_id, number, timestamp) VALUES (?, ?, ?)",
+                        [(chain_id, number, timestamp) for number, timestamp in fetched.items()]
+                    )
+        results.update(fetched)
+        return results
+
+    def get(self, web3: Web3, number: int) -> Optional[int]:
+        """获取单个区块的时间戳"""
+        return self.get_many(web3, [number]).get(number)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_block_timestamp_cache() -> BlockTimestampCache:
+    """进程内共享的区块时间戳缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = BlockTimestampCache()
+        return _default_cache
@@ -0,0 +1,370 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 默认缓存文件位置与容量
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chain_cache.bin")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 距最新区块不足该深度的数据可能被重组，不缓存
+DEFAULT_FINALITY_DEPTH = 32
+# 超出容量后压缩到容量的比例
+_COMPACT_RATIO = 0.7
+
+# 记录格式: 32字节键(sha256) + 4字节大端长度 + zlib压缩的JSON结果
+_HEADER = struct.Struct(">32sI")
+
+# 区块参数所在位置: {方法: 参数下标}
+_BLOCK_PARAM_INDEX = {
+    "eth_getBlockByNumber": 0,
+    "eth_getBalance": 1,
+    "eth_getTransactionCount": 1,
+    "eth_getCode": 1,
+    "eth_getStorageAt": 2,
+    "eth_call": 1,
+}
+# 结果中带区块号、上链后不再变化的方法
+_MINED_RESULT_METHODS = {"eth_getBlockByHash", "eth_getTransactionByHash", "eth_getTransactionReceipt"}
+
+
+def _parse_block(value: Any) -> Optional[int]:
+    """解析区块参数，latest/pending等标签返回None"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith("0x"):
+        try:
+            return int(value, 16)
+        except ValueError:
+            return None
+    return None
+
+
+class ChainCache:
+    """
+    不可变链上数据的持久化缓存
+
+    以 (chain id, 方法, 参数) 的sha256为键，结果以压缩JSON追加写入单个二进制文件，
+    读取通过mmap完成。只缓存最终确定深度以下的区块数据（按区块号指定的状态查询、
+    区块、回执、日志），latest/pending等标签一律绕过缓存。
+    文件超过容量上限时按LRU顺序压缩，淘汰最久未使用的条目。
+
+    chain id和最新区块号按provider分别记录：每个provider首次使用时通过ensure_context查询，
+    同时使用多个节点（包括不同的链）时互不干扰；chain id未知时绕过缓存。
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        finality_depth: int = DEFAULT_FINALITY_DEPTH
+    ):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.finality_depth = finality_depth
+        self._contexts = weakref.WeakKeyDictionary()  # provider -> _ChainContext
+        self._default_context = None  # 未指定provider时使用
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # 键 -> (偏移, 长度)，按最近使用排序
+        self._file = open(path, "a+b")
+        self._mmap = None
+        self._size = 0
+        self._load_index()
+
+    # ---- 文件与索引 ----
+
+    def _load_index(self):
+        """扫描文件头重建索引，忽略末尾不完整的记录"""
+        self._file.seek(0, os.SEEK_END)
+        file_size = self._file.tell()
+        self._remap()
+        offset = 0
+        while offset + _HEADER.size <= file_size:
+            key, length = _HEADER.unpack_from(self._mmap, offset)
+            if offset + _HEADER.size + length > file_size:
+                break
+            self._index[key] = (offset + _HEADER.size, length)
+            self._index.move_to_end(key)
+            offset += _HEADER.size + length
+        if offset != file_size:
+            # Windows上不能截断仍被映射的文件
+            self._mmap.close()
+            self._mmap = None
+            self._file.truncate(offset)
+        self._size = offset
+        self._remap()
+
+    def _remap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.flush()
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+
+    def _compact(self):
+        """按LRU顺序保留最近使用的条目，重写缓存文件"""
+        budget = int(self.max_bytes * _COMPACT_RATIO)
+        keep = []
+        total = 0
+        for key in reversed(self._index):
+            offset, length = self._index[key]
+            if total + _HEADER.size + length > budget:
+                break
+            keep.append((key, bytes(self._mmap[offset:offset + length])))
+            total += _HEADER.size + length
+
+        tmp_path = self.path + ".tmp"
+        new_index = OrderedDict()
+        with open(tmp_path, "wb") as f:
+            offset = 0
+            # 最久未使用的在前，重新加载时顺序不变
+            for key, payload in reversed(keep):
+                f.write(_HEADER.pack(key, len(payload)))
+                f.write(payload)
+                new_index[key] = (offset + _HEADER.size, len(payload))
+                offset += _HEADER.size + len(payload)
+
+        self._mmap.close()
+        self._mmap = None
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a+b")
+        self._index = new_index
+        self._size = offset
+        self._remap()
+
+    # ---- 缓存策略 ----
+
+    def make_key(self, chain_id: int, method: str, params: Any) -> bytes:
+        canonical = json.dumps([chain_id, method, params], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).digest()
+
+    def _context(self, source: Any) -> Optional["_ChainContext"]:
+        """provider已知的chain id和最新区块号（调用方持有self._lock）"""
+        if source is None:
+            return self._default_context
+        try:
+            return self._contexts.get(source)
+        except TypeError:
+            return None
+
+    def ensure_context(self, send: Callable[[List[Tuple[str, Any]]], List[Any]], source: Any = None):
+        """
+        确保已知provider（source）的chain id和最新区块号，首次使用该provider时通过send查询
+
+        查询失败时不重试，该节点的请求绕过缓存。
+        """
+        with self._lock:
+            if self._context(source) is not None:
+                return
+        chain_id, head = send([("eth_chainId", []), ("eth_blockNumber", [])])
+        context = _ChainContext(
+            None if isinstance(chain_id, Exception) else _parse_block(chain_id),
+            None if isinstance(head, Exception) else _parse_block(head)
+        )
+        with self._lock:
+            if self._context(source) is not None:
+                return
+            if source is None:
+                self._default_context = context
+                return
+            try:
+                self._contexts[source] = context
+            except TypeError:
+                # 不能弱引用的provider不记录，其请求绕过缓存
+                pass
+
+    def note_head(self, block_number: int, source: Any = None):
+        """记录provider观察到的最新区块号"""
+        with self._lock:
+            context = self._context(source)
+            if context is not None and (context.head is None or block_number > context.head):
+                context.head = block_number
+
+    def _is_final(self, block_number: Optional[int], head: Optional[int]) -> bool:
+        return (
+            block_number is not None and head is not None
+            and block_number <= head - self.finality_depth
+        )
+
+    def is_cacheable_request(self, method: str, params: Any, head: Optional[int]) -> bool:
+        """请求本身是否指向确定的历史数据（结果相关的方法在存入时再判断）"""
+        if method in _MINED_RESULT_METHODS:
+            return True
+        if method == "eth_getLogs":
+            criteria = params[0] if params else {}
+            if criteria.get("blockHash"):
+                return True
+            return self._is_final(_parse_block(criteria.get("toBlock")), head)
+        index = _BLOCK_PARAM_INDEX.get(method)
+        if index is None or len(params) <= index:
+            return False
+        return self._is_final(_parse_block(params[index]), head)
+
+    def _is_cacheable_result(self, method: str, result: Any, head: Optional[int]) -> bool:
+        if result is None:
+            return False
+        if method in _MINED_RESULT_METHODS:
+            number = _parse_block(result.get("blockNumber") or result.get("number")) if isinstance(result, dict) else None
+            return self._is_final(number, head)
+        return True
+
+    # ---- 读写 ----
+
+    def get(self, method: str, params: Any, source: Any = None) -> Tuple[bool, Any]:
+        """
+        查询缓存
+
+        Args:
+            method: 方法名
+            params: 参数列表
+            source: 发送请求的provider，决定chain id和最新区块号
+
+        Returns:
+            (是否命中, 结果)
+        """
+        with self._lock:
+            context = self._context(source)
+            if context is None or context.chain_id is None:
+                return False, None
+            if not self.is_cacheable_request(method, params, context.head):
+                return False, None
+            key = self.make_key(context.chain_id, method, params)
+            location = self._index.get(key)
+            if location is None:
+                self.misses += 1
+                return False, None
+            self._index.move_to_end(key)
+            offset, length = location
+            # 追加写入后按需重新映射
+            if self._mmap is None or offset + length > len(self._mmap):
+                self._remap()
+            payload = self._mmap[offset:offset + length]
+            self.hits += 1
+        return True, json.loads(zlib.decompress(payload))
+
+    def put(self, method: str, params: Any, result: Any, source: Any = None):
+        """写入provider（source）返回的结果（不满足缓存条件时忽略）"""
+        if method == "eth_blockNumber":
+            number = _parse_block(result)
+            if number is not None:
+                self.note_head(number, source)
+            return
+        with self._lock:
+            context = self._context(source)
+            if context is None or context.chain_id is None:
+                return
+            head = context.head
+            if not self.is_cacheable_request(method, params, head) or not self._is_cacheable_result(method, result, head):
+                return
+            key = self.make_key(context.chain_id, method, params)
+        payload = zlib.compress(json.dumps(result, separators=(",", ":")).encode())
+        with self._lock:
+            if key in self._index:
+                return
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(_HEADER.pack(key, len(payload)))
+            self._file.write(payload)
+            self._index[key] = (self._size + _HEADER.size, len(payload))
+            self._size += _HEADER.size + len(payload)
+            if self._size > self.max_bytes:
+                self._remap()
+                self._compact()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            chain_ids = sorted({
+                context.chain_id for context in list(self._contexts.values()) + [self._default_context]
+                if context is not None and context.chain_id is not None
+            })
+        return {
+            "entries": len(self._index),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "chain_ids": chain_ids,
+        }
+
+
+class _ChainContext:
+    """一个provider的chain id和已知的最新区块号"""
+    __slots__ = ("chain_id", "head")
+
+    def __init__(self, chain_id: Optional[int], head: Optional[int]):
+        self.chain_id = chain_id
+        self.head = head
+
+
+_chain_cache = None
+
+
+def configure_chain_cache(
+    path: Optional[str] = DEFAULT_CACHE_PATH,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    finality_depth: int = DEFAULT_FINALITY_DEPTH
+) -> Optional[ChainCache]:
+    """启用（path为None时关闭）进程内共享的链上数据缓存"""
+    global _chain_cache
+    if _chain_cache is not None:
+        _chain_cache.close()
+    _chain_cache = ChainCache(path, max_bytes, finality_depth) if path else None
+    return _chain_cache
+
+
+def get_chain_cache() -> Optional[ChainCache]:
+    """当前启用的链上数据缓存，未启用时为None"""
+    return _chain_cache
+
+
+def cached_batch(
+    calls: List[Tuple[str, Any]],
+    send: Callable[[List[Tuple[str, Any]]], List[Any]],
+    source: Any = None
+) -> List[Any]:
+    """
+    经过缓存发送一组调用：命中的直接返回，只把未命中的交给send发送，结果写回缓存
+
+    Args:
+        calls: [(方法名, 参数列表), ...]
+        send: 实际发送函数，返回与输入顺序一致的结果列表（失败项为异常对象）
+        source: 发送请求的provider，首次使用时查询其chain id和最新区块号
+    """
+    cache = _chain_cache
+    if cache is None:
+        return send(calls)
+    cache.ensure_context(send, source)
+
+    results = [None] * len(calls)
+    missing = []
+    for i, (method, params) in enumerate(calls):
+        hit, value = cache.get(method, params, source)
+        if hit:
+            results[i] = value
+        else:
+            missing.append(i)
+
+    if missing:
+        values = send([calls[i] for i in missing])
+        for i, value in zip(missing, values):
+            results[i] = value
+            if not isinstance(value, Exception):
+                cache.put(calls[i][0], calls[i][1], value, source)
+    return results
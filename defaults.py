@@ -0,0 +1,11 @@
+# 查询参数默认值（不依赖web3等第三方库，界面启动时可直接导入）
+
+# 默认RPC节点
+DEFAULT_RPC_URL = "https://testnet-rpc.monad.xyz/"
+
+# JSON-RPC批量请求默认每批包含的调用数
+DEFAULT_BATCH_SIZE = 100
+# 默认同时在途的请求数
+DEFAULT_CONCURRENCY = 8
+# 默认单个请求超时时间（秒）
+DEFAULT_TIMEOUT = 15.0
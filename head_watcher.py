@@ -0,0 +1,183 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from web3 import Web3
+
+from wallet_utils import rpc_batch, _resolve_web3, _format_balance, DEFAULT_BATCH_SIZE
+
+# 轮询最新区块的间隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+# 每个批量请求拉取的完整区块数
+BLOCK_BATCH_SIZE = 20
+# 一次落后超过该区块数时不再逐块扫描，直接刷新全部地址
+MAX_CATCHUP_BLOCKS = 500
+
+
+def touched_addresses(blocks: Iterable[dict], tracked: Dict[str, str]) -> Set[str]:
+    """
+    找出区块交易中涉及的被跟踪地址
+
+    Args:
+        blocks: 包含完整交易的区块
+        tracked: {小写地址: 原始地址}
+
+    Returns:
+        被涉及的原始地址集合（交易发送方或接收方）
+    """
+    touched = set()
+    for block in blocks:
+        for tx in block.get("transactions") or []:
+            if not isinstance(tx, dict):
+                continue
+            for key in ("from", "to"):
+                addr = tx.get(key)
+                if addr:
+                    original = tracked.get(addr.lower())
+                    if original is not None:
+                        touched.add(original)
+    return touched
+
+
+class HeadWatcher:
+    """
+    跟随最新区块的增量刷新
+
+    后台线程轮询eth_blockNumber，拉取每个新区块的完整交易，
+    用哈希集合与被跟踪地址求交集，只为被涉及的地址重新查询余额和交易数。
+    通过合约内部转账收到的原生代币不出现在交易的from/to中，不会触发刷新。
+    """
+
+    def __init__(
+        self,
+        web3: Web3,
+        addresses: Iterable[str],
+        on_update: Callable[[int, Dict[str, str], Dict[str, int]], None],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        on_error: Optional[Callable[[Exception], None]] = None
+    ):
+        """
+        Args:
+            web3: Web3对象或RPCPool，已连接到RPC节点
+            addresses: 被跟踪的钱包地址
+            on_update: 回调 (区块号, {地址: 余额}, {地址: 交易数})，在后台线程中调用
+            poll_interval: 轮询间隔（秒）
+            batch_size: 刷新地址时每个批量请求包含的调用数
+            on_error: 错误回调，出错后继续轮询
+        """
+        self.web3 = _resolve_web3(web3)
+        self.on_update = on_update
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.last_block = None
+        self.blocks_scanned = 0
+        self.addresses_refreshed = 0
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.set_addresses(addresses)
+
+    def set_addresses(self, addresses: Iterable[str]):
+        """替换被跟踪的地址集合"""
+        tracked = {addr.lower(): addr for addr in addresses if Web3.is_address(addr)}
+        with self._lock:
+            self._tracked = tracked
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, from_block: Optional[int] = None):
+        """启动后台轮询；from_block为None时从当前最新区块之后开始"""
+        if self.running:
+            return
+        self.last_block = self.web3.eth.block_number if from_block is None else from_block - 1
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.poll_interval + 1.0)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+            self._stop.wait(self.poll_interval)
+
+    def poll(self) -> int:
+        """
+        处理自上次以来的新区块
+
+        Returns:
+            本次刷新的地址数
+        """
+        head = self.web3.eth.block_number
+        if self.last_block is not None and head <= self.last_block:
+            return 0
+        with self._lock:
+            tracked = dict(self._tracked)
+
+        if self.last_block is None or head - self.last_block > MAX_CATCHUP_BLOCKS:
+            # 落后太多，逐块扫描不如直接全量刷新
+            touched = set(tracked.values())
+        else:
+            touched = set()
+            number = self.last_block + 1
+            while number <= head:
+                numbers = range(number, min(number + BLOCK_BATCH_SIZE, head + 1))
+                blocks = rpc_batch(
+                    self.web3, [("eth_getBlockByNumber", [hex(n), True]) for n in numbers], BLOCK_BATCH_SIZE
+                )
+                available = 0
+                for n, block in zip(numbers, blocks):
+                    if isinstance(block, Exception):
+                        raise RuntimeError(f"获取区块 {n} 失败: {str(block)}")
+                    if block is None:
+                        break
+                    touched |= touched_addresses([block], tracked)
+                    available += 1
+                self.blocks_scanned += available
+                number += available
+                if available < len(numbers):
+                    # 节点尚未同步到后面的区块，下次再从这里继续
+                    break
+            head = number - 1
+            if head == self.last_block:
+                return 0
+
+        if touched:
+            balances, tx_counts = self.refresh(sorted(touched), head)
+            self.on_update(head, balances, tx_counts)
+        self.last_block = head
+        self.addresses_refreshed += len(touched)
+        return len(touched)
+
+    def refresh(self, addresses: List[str], block_number: int):
+        """在指定区块查询地址的余额和交易数（一次批量请求）"""
+        block = hex(block_number)
+        calls = []
+        for addr in addresses:
+            checksum_addr = Web3.to_checksum_address(addr)
+            calls.append(("eth_getBalance", [checksum_addr, block]))
+            calls.append(("eth_getTransactionCount", [checksum_addr, block]))
+        values = rpc_batch(self.web3, calls, self.batch_size)
+
+        balances, tx_counts = {}, {}
+        for i, addr in enumerate(addresses):
+            balance, nonce = values[2 * i], values[2 * i + 1]
+            balances[addr] = (
+                f"错误: {str(balance)}" if isinstance(balance, Exception)
+                else _format_balance(self.web3, int(balance, 16))
+            )
+            tx_counts[addr] = f"错误: {str(nonce)}" if isinstance(nonce, Exception) else int(nonce, 16)
+        return balances, tx_counts
@@ -0,0 +1,284 @@
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+
+from defaults import DEFAULT_BATCH_SIZE
+from wallet_utils import (
+    RPCError, encode_batch, parse_batch_response, rpc_batch, _query_by_address_batch, _format_balance
+)
+from rpc_pool import RPCPool, _node_error
+from rate_limit import RateLimitError, get_limiter, parse_retry_after, is_rate_limited, MAX_RETRIES
+
+# orjson可选，未安装时使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 连接池中每个节点保持的keep-alive连接数
+DEFAULT_POOL_SIZE = 16
+
+_HEX_ADDRESS = re.compile(r"^(0[xX])?[0-9a-fA-F]{40}$")
+_WEI_PER_ETHER = 10 ** 18
+
+
+def json_dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def is_address(addr: Any) -> bool:
+    """
+    与Web3.is_address结果一致的地址校验
+
+    全小写或全大写的十六进制地址只做格式检查；大小写混合时需要校验checksum，
+    交给web3计算keccak。
+    """
+    if not isinstance(addr, str) or not _HEX_ADDRESS.match(addr):
+        return Web3.is_address(addr)
+    body = addr[-40:]
+    if body == body.lower() or body == body.upper():
+        return True
+    return Web3.is_address(addr)
+
+
+def address_param(addr: str) -> str:
+    """RPC参数中的地址：小写十六进制（节点不区分大小写，无需计算checksum）"""
+    return "0x" + addr[-40:].lower()
+
+
+def format_balance(balance_wei: int) -> str:
+    """与wallet_utils._format_balance结果一致：wei整数除法后格式化为5位小数"""
+    # int/int的真除法结果是正确舍入的浮点数，与Decimal精确相除后再转float相同
+    return "{:.5f}".format(balance_wei / _WEI_PER_ETHER)
+
+
+class LeanRPCClient:
+    """
+    热点只读查询的精简JSON-RPC传输
+
+    不经过web3的中间件和格式化层：复用keep-alive连接池直接发送批量请求，
+    可选gzip压缩响应，安装了orjson时用它编解码，结果直接按十六进制解析。
+    作为transport传给rpc_batch，同样经过链上数据缓存、请求合并和重试。
+    """
+
+    def __init__(
+        self,
+        rpc: Union[str, RPCPool, Web3],
+        timeout: float = 30.0,
+        gzip: bool = True,
+        pool_size: int = DEFAULT_POOL_SIZE
+    ):
+        """
+        Args:
+            rpc: RPC节点URL、RPCPool连接池（使用连接池的节点选择和健康统计），
+                或provider为HTTP节点/RPCPool的Web3对象
+            timeout: 单个请求超时时间（秒）
+            gzip: 是否请求gzip压缩的响应
+            pool_size: 每个节点保持的keep-alive连接数
+        """
+        if isinstance(rpc, Web3):
+            rpc = rpc.provider if isinstance(rpc.provider, RPCPool) else rpc.provider.endpoint_uri
+        self.pool = rpc if isinstance(rpc, RPCPool) else None
+        self.url = None if self.pool else rpc
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip" if gzip else "identity",
+        })
+
+    @property
+    def endpoint_uri(self) -> str:
+        return self.url or self.pool.endpoint_uri
+
+    def _post_to(self, url: str, body: bytes) -> Tuple[Any, Optional[RPCError]]:
+        """
+        向一个节点发送请求体，返回解码后的响应和其中属于节点故障的错误（没有则为None）
+
+        与RPCPool相同，响应体中的限流、内部错误等反馈给限速器。
+        """
+        limiter = get_limiter(url)
+        limiter.acquire()
+        try:
+            response = self.session.post(url, data=body, timeout=self.timeout)
+            if response.status_code == 429:
+                raise RateLimitError(retry_after=parse_retry_after(response.headers.get("Retry-After")))
+            response.raise_for_status()
+            data = json_loads(response.content)
+        except Exception as e:
+            limiter.report(e)
+            raise
+        error = _node_error(data)
+        limiter.report(error if error is not None and is_rate_limited(error) else None)
+        return data, error
+
+    def send_batch(self, calls: List[Tuple[str, list]]) -> List[Any]:
+        """发送一个JSON-RPC批量请求；使用连接池时失败自动切换节点"""
+        body = json_dumps(encode_batch(calls))
+        if self.pool is None:
+            data, _ = self._post_to(self.url, body)
+            return parse_batch_response(data, len(calls))
+
+        tried = []
+        last_error = None
+        for _ in range(len(self.pool.endpoints)):
+            endpoint = self.pool.choose(exclude=tried)
+            tried.append(endpoint)
+            start = time.monotonic()
+            try:
+                data, error = self._post_to(endpoint.url, body)
+                results = parse_batch_response(data, len(calls))
+            except RPCError:
+                self.pool.record(endpoint, time.monotonic() - start)
+                raise
+            except (requests.RequestException, ValueError, RateLimitError) as e:
+                self.pool.record(endpoint, None)
+                last_error = e
+                continue
+            # 批内出现节点故障错误时计为失败，失败的调用由rpc_batch重试
+            self.pool.record(endpoint, None if error is not None else time.monotonic() - start)
+            return results
+        if isinstance(last_error, RateLimitError):
+            raise last_error
+        raise ConnectionError(f"所有RPC节点均请求失败: {last_error}")
+
+    def _query(self, wallet_addresses: List[str], method: str, convert, batch_size: int, max_retries: int):
+        """按地址批量调用 method(addr, 'latest')，输出格式与wallet_utils一致"""
+        results = {}
+        valid = []
+        for addr in wallet_addresses:
+            if is_address(addr):
+                valid.append(addr)
+            else:
+                results[addr] = "无效地址"
+
+        calls = [(method, [address_param(addr), "latest"]) for addr in valid]
+        for addr, value in zip(valid, rpc_batch(None, calls, batch_size, max_retries, transport=self)):
+            if isinstance(value, Exception):
+                results[addr] = f"错误: {str(value)}"
+            else:
+                try:
+                    results[addr] = convert(int(value, 16))
+                except Exception as e:
+                    results[addr] = f"错误: {str(e)}"
+
+        return {addr: results[addr] for addr in wallet_addresses}
+
+    def get_wallet_balances(
+        self,
+        wallet_addresses: List[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_retries: int = MAX_RETRIES
+    ) -> Dict[str, str]:
+        """批量查询余额，结果与wallet_utils.get_wallet_balances相同"""
+        return self._query(wallet_addresses, "eth_getBalance", format_balance, batch_size, max_retries)
+
+    def get_transaction_count(
+        self,
+        wallet_addresses: List[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_retries: int = MAX_RETRIES
+    ) -> Dict[str, Union[int, str]]:
+        """批量查询交易数，结果与wallet_utils.get_transaction_count相同"""
+        return self._query(wallet_addresses, "eth_getTransactionCount", int, batch_size, max_retries)
+
+
+def benchmark(
+    rpc: Union[str, RPCPool],
+    wallet_addresses: List[str],
+    rounds: int = 5,
+    repeat: int = 20
+) -> Dict[str, Any]:
+    """
+    比较web3路径与精简传输查询余额的开销，并核对两者结果一致
+
+    端到端耗时每轮只发一个批量请求（避免被限速器主导）；本地开销用同一份节点响应
+    分别按两条路径解码、校验地址并格式化，只衡量网络之外的部分。
+
+    Returns:
+        {"web3_ms", "lean_ms", "web3_per_call_us", "lean_per_call_us", "identical"}
+    """
+    web3 = rpc.as_web3() if isinstance(rpc, RPCPool) else Web3(Web3.HTTPProvider(rpc))
+    lean = LeanRPCClient(rpc)
+    batch_size = max(1, len(wallet_addresses))
+
+    def web3_path():
+        return _query_by_address_batch(
+            web3, wallet_addresses, "eth_getBalance",
+            lambda wei: _format_balance(web3, wei), batch_size
+        )
+
+    def lean_path():
+        return lean.get_wallet_balances(wallet_addresses, batch_size)
+
+    def best_of(fn, times):
+        best = None
+        for _ in range(times):
+            start = time.perf_counter()
+            output = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
+
+    web3_total, web3_output = best_of(web3_path, rounds)
+    lean_total, lean_output = best_of(lean_path, rounds)
+
+    # 同一份响应体，分别按两条路径处理
+    calls = [("eth_getBalance", [address_param(addr), "latest"]) for addr in wallet_addresses]
+    body = json.dumps(
+        [{"jsonrpc": "2.0", "id": i, "result": value}
+         for i, value in enumerate(rpc_batch(None, calls, batch_size, transport=lean))],
+        default=str
+    ).encode()
+
+    def web3_local():
+        values = parse_batch_response(json.loads(body), len(calls))
+        return [
+            (web3.to_checksum_address(addr), _format_balance(web3, int(value, 16)))
+            for addr, value in zip(wallet_addresses, values) if web3.is_address(addr)
+        ]
+
+    def lean_local():
+        values = parse_batch_response(json_loads(body), len(calls))
+        return [
+            (address_param(addr), format_balance(int(value, 16)))
+            for addr, value in zip(wallet_addresses, values) if is_address(addr)
+        ]
+
+    count = max(1, len(wallet_addresses))
+    web3_local_time, _ = best_of(web3_local, repeat)
+    lean_local_time, _ = best_of(lean_local, repeat)
+    return {
+        "web3_ms": round(web3_total * 1000, 2),
+        "lean_ms": round(lean_total * 1000, 2),
+        "web3_per_call_us": round(web3_local_time / count * 1e6, 2),
+        "lean_per_call_us": round(lean_local_time / count * 1e6, 2),
+        "identical": web3_output == lean_output,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("用法: python lean_rpc.py <RPC URL> [地址数量]")
+        sys.exit(1)
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    addresses = ["0x" + format(i, "040x") for i in range(1, count + 1)]
+    print(benchmark(sys.argv[1], addresses))
@@ -0,0 +1,63 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# 默认保留的日志行数
+DEFAULT_MAX_LINES = 5000
+
+
+class LogBuffer:
+    """
+    有上限的日志模型
+
+    日志行保存在固定长度的环形缓冲区中，超出上限时丢弃最旧的行，
+    长时间运行（如监控新区块）内存占用不再增长。append可在任意线程调用，
+    界面在主线程定期用take_pending取出新行批量写入控件；
+    指定文件路径时每行同时追加写入日志文件（带日期，不受行数上限影响）。
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_MAX_LINES, path: Optional[str] = None):
+        self.max_lines = max(1, int(max_lines))
+        self.path = path
+        self.lines = deque(maxlen=self.max_lines)
+        self._pending = deque(maxlen=self.max_lines)
+        self._dropped = 0  # 尚未显示就被挤出的行数
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+
+    def append(self, message: str) -> str:
+        """记录一条消息，返回带时间的日志行"""
+        now = datetime.now()
+        line = f"[{now.strftime('%H:%M:%S')}] {message}"
+        with self._lock:
+            if len(self._pending) == self.max_lines:
+                self._dropped += 1
+            self.lines.append(line)
+            self._pending.append(line)
+            if self._file is not None:
+                self._file.write(f"{now.strftime('%Y-%m-%d %H:%M:%S')} {message}\n")
+                self._file.flush()
+        return line
+
+    def take_pending(self) -> Tuple[List[str], int]:
+        """取出尚未显示的行，返回 (行列表, 期间被丢弃的行数)"""
+        with self._lock:
+            lines = list(self._pending)
+            dropped = self._dropped
+            self._pending.clear()
+            self._dropped = 0
+        return lines, dropped
+
+    def clear(self):
+        """清空缓冲区（日志文件不受影响）"""
+        with self._lock:
+            self.lines.clear()
+            self._pending.clear()
+            self._dropped = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
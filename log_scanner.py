@@ -0,0 +1,235 @@
+from typing import List, Dict, Any, Optional, Iterator
+
+from web3 import Web3
+
+from wallet_utils import rpc_batch, _resolve_web3
+from rate_limit import is_log_range_error
+
+# Transfer(address,address,uint256) 事件签名
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# 自适应窗口参数（区块数）
+INITIAL_WINDOW = 2000
+MIN_WINDOW = 1
+MAX_WINDOW = 100000
+# 单个窗口返回的日志少于该数量时扩大窗口
+GROW_THRESHOLD = 500
+# 每组topic OR集合最多包含的地址数（节点对过滤条件长度有限制）
+TOPIC_CHUNK_SIZE = 100
+
+
+def pad_address_topic(address: str) -> str:
+    """将地址左补零为32字节的topic"""
+    return "0x" + address.lower().replace("0x", "").rjust(64, "0")
+
+
+def topic_to_address(topic: str) -> str:
+    """从32字节topic中取出地址（checksum格式）"""
+    return Web3.to_checksum_address("0x" + topic[-40:])
+
+
+def decode_transfer_log(log: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    解析原始Transfer日志
+
+    兼容ERC-20（金额在data中）和ERC-721（tokenId为第4个topic）。
+    """
+    topics = log["topics"]
+    data = log.get("data") or "0x"
+    if len(topics) > 3:
+        value = int(topics[3], 16)
+    else:
+        value = int(data, 16) if data not in ("0x", "") else 0
+    return {
+        "from": topic_to_address(topics[1]),
+        "to": topic_to_address(topics[2]),
+        "value": value,
+        "block_number": int(log["blockNumber"], 16),
+        "log_index": int(log["logIndex"], 16),
+        "tx_hash": log["transactionHash"],
+        "address": log["address"],
+    }
+
+
+def _log_key(log: Dict[str, Any]):
+    return int(log["blockNumber"], 16), int(log["logIndex"], 16)
+
+
+def iter_logs(
+    web3: Web3,
+    topic_filters: List[List[Any]],
+    address: Optional[str] = None,
+    from_block: int = 0,
+    to_block: Optional[int] = None,
+    newest_first: bool = True,
+    initial_window: int = INITIAL_WINDOW
+) -> Iterator[Dict[str, Any]]:
+    """
+    分段扫描eth_getLogs，窗口大小自适应，逐条产出日志
+
+    每个窗口内的多个topic过滤条件打包成一次JSON-RPC批量请求，整个区块范围只扫描一遍。
+    节点报告结果过多或区块范围过大时窗口减半重试，减半后的大小同时成为窗口上限；
+    返回日志较少时窗口翻倍，但不超过上限，不会再放大到已知会失败的范围。
+
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        topic_filters: 多组topics过滤条件，结果取并集
+        address: 合约地址（可选）
+        from_block: 起始区块
+        to_block: 结束区块，默认为最新区块
+        newest_first: 是否从最新区块往前扫描
+        initial_window: 初始窗口大小（区块数）
+
+    Yields:
+        去重后的原始日志，按区块和日志序号排序（newest_first时倒序）
+    """
+    web3 = _resolve_web3(web3)
+    if to_block is None:
+        to_block = web3.eth.block_number
+    if address:
+        address = web3.to_checksum_address(address)
+
+    window = max(MIN_WINDOW, min(initial_window, MAX_WINDOW))
+    ceiling = MAX_WINDOW  # 最近一次失败的窗口大小的一半
+    low, high = from_block, to_block
+
+    while low <= high:
+        if newest_first:
+            start, end = max(low, high - window + 1), high
+        else:
+            start, end = low, min(high, low + window - 1)
+
+        calls = []
+        for topics in topic_filters:
+            params = {"fromBlock": hex(start), "toBlock": hex(end), "topics": topics}
+            if address:
+                params["address"] = address
+            calls.append(("eth_getLogs", [params]))
+
+        responses = rpc_batch(web3, calls, len(calls))
+        error = next((r for r in responses if isinstance(r, Exception)), None)
+        if error is not None:
+            if is_log_range_error(error) and window > MIN_WINDOW:
+                window = ceiling = max(MIN_WINDOW, window // 2)
+                continue
+            raise RuntimeError(f"获取区块 {start}-{end} 的日志失败: {str(error)}")
+
+        # 多个过滤条件可能命中同一条日志（例如自转），窗口内去重
+        window_logs = {}
+        for logs in responses:
+            for log in logs or []:
+                window_logs.setdefault((log["transactionHash"], log["logIndex"]), log)
+        yield from sorted(window_logs.values(), key=_log_key, reverse=newest_first)
+
+        if newest_first:
+            high = start - 1
+        else:
+            low = end + 1
+
+        if len(window_logs) < GROW_THRESHOLD:
+            window = min(ceiling, window * 2)
+
+
+def scan_logs(
+    web3: Web3,
+    topic_filters: List[List[Any]],
+    address: Optional[str] = None,
+    from_block: int = 0,
+    to_block: Optional[int] = None,
+    max_results: Optional[int] = None,
+    newest_first: bool = True,
+    initial_window: int = INITIAL_WINDOW
+) -> List[Dict[str, Any]]:
+    """
+    iter_logs 的列表版本；凑满max_results条即停止扫描（从新到旧扫描时即为最新的max_results条）
+
+    Returns:
+        原始日志列表
+    """
+    results = []
+    for log in iter_logs(web3, topic_filters, address, from_block, to_block, newest_first, initial_window):
+        results.append(log)
+        if max_results is not None and len(results) >= max_results:
+            break
+    return results
+
+
+def scan_transfer_logs(
+    web3: Web3,
+    contract_address: str,
+    wallet_address: str,
+    from_block: int = 0,
+    to_block: Optional[int] = None,
+    max_results: Optional[int] = None,
+    newest_first: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    扫描某个钱包在某个代币合约上的转入和转出Transfer日志（单次遍历区块范围）
+
+    Returns:
+        原始日志列表，可用decode_transfer_log解析
+    """
+    wallet_topic = pad_address_topic(wallet_address)
+    topic_filters = [
+        [TRANSFER_TOPIC, wallet_topic],        # 转出
+        [TRANSFER_TOPIC, None, wallet_topic],  # 转入
+    ]
+    return scan_logs(
+        web3, topic_filters, contract_address,
+        from_block, to_block, max_results, newest_first
+    )
+
+
+def scan_transfer_logs_bulk(
+    web3: Web3,
+    contract_address: str,
+    wallet_addresses: List[str],
+    from_block: int = 0,
+    to_block: Optional[int] = None,
+    topic_chunk_size: int = TOPIC_CHUNK_SIZE
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    一次扫描区块范围，取回整个钱包列表在某个代币合约上的Transfer日志并按钱包分组
+
+    钱包地址补零后作为topic的OR集合（from位置和to位置各一组），
+    地址过多时按topic_chunk_size拆成多组过滤条件，同一窗口内的所有过滤条件
+    在一次批量请求中发送；N个钱包的成本约等于一次扫描。
+
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        contract_address: 代币合约地址
+        wallet_addresses: 钱包地址列表
+        from_block: 起始区块
+        to_block: 结束区块，默认为最新区块
+        topic_chunk_size: 每组topic OR集合包含的地址数
+
+    Returns:
+        字典 {钱包地址: [解析后的Transfer事件，按区块从新到旧]}
+    """
+    buckets = {addr: [] for addr in wallet_addresses}
+    by_topic = {}
+    for addr in wallet_addresses:
+        if Web3.is_address(addr):
+            by_topic.setdefault(pad_address_topic(addr), []).append(addr)
+
+    topics = list(by_topic)
+    topic_filters = []
+    for start in range(0, len(topics), topic_chunk_size):
+        chunk = topics[start:start + topic_chunk_size]
+        topic_filters.append([TRANSFER_TOPIC, chunk])        # 转出
+        topic_filters.append([TRANSFER_TOPIC, None, chunk])  # 转入
+    if not topic_filters:
+        return buckets
+
+    for log in iter_logs(web3, topic_filters, contract_address, from_block, to_block):
+        event = decode_transfer_log(log)
+        # 同一事件可能同时属于发送方和接收方（也可能是同一个钱包自转）
+        owners = []
+        for topic in log["topics"][1:3]:
+            for addr in by_topic.get(topic.lower(), []):
+                if addr not in owners:
+                    owners.append(addr)
+        for addr in owners:
+            buckets[addr].append(event)
+
+    return buckets
@@ -0,0 +1,241 @@
+"""
+Monad钱包查询工具的命令行入口（无界面，适合服务器和定时任务）
+
+示例:
+    python monad_wallet_cli.py wallets.txt --query balance,nonce --format csv > result.csv
+    cat wallets.txt | python monad_wallet_cli.py - --rpc https://a --rpc https://b --format jsonl
+    python monad_wallet_cli.py wallets.txt --query balance,tokens --token 0x... --token 0x...
+    python monad_wallet_cli.py wallets.txt --query interactions --contract 0x... --from-block 1000000
+
+只在需要时导入web3等依赖，不导入tkinter和pandas。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from defaults import DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, DEFAULT_RPC_URL, DEFAULT_TIMEOUT
+from progress import ProgressTracker
+
+# 每处理这么多地址输出一次结果
+DEFAULT_CHUNK_SIZE = 1000
+QUERY_TYPES = ("balance", "nonce", "activity", "tokens", "interactions")
+
+
+def read_wallets(paths: List[str], stdin: TextIO = sys.stdin) -> List[str]:
+    """
+    读取钱包地址：每行一个地址（#开头为注释），.json文件为地址列表，"-"表示标准输入
+
+    重复地址只保留第一次出现的位置。
+    """
+    seen = set()
+    wallets = []
+
+    def add(lines: Iterable[str]):
+        for line in lines:
+            addr = line.strip()
+            if addr and not addr.startswith("#") and addr not in seen:
+                seen.add(addr)
+                wallets.append(addr)
+
+    for path in paths or ["-"]:
+        if path == "-":
+            add(stdin)
+        elif path.lower().endswith(".json"):
+            with open(path, "r") as f:
+                add(str(addr) for addr in json.load(f))
+        else:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                add(f)
+    return wallets
+
+
+class RowWriter:
+    """逐行输出CSV或JSONL，CSV表头在第一行数据到达时写出"""
+
+    def __init__(self, out: TextIO, fmt: str = "csv"):
+        self.out = out
+        self.fmt = fmt
+        self._csv = None
+
+    def write(self, row: Dict[str, object]):
+        if self.fmt == "jsonl":
+            self.out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            return
+        if self._csv is None:
+            self._csv = csv.DictWriter(self.out, fieldnames=list(row), extrasaction="ignore")
+            self._csv.writeheader()
+        self._csv.writerow(row)
+
+    def flush(self):
+        self.out.flush()
+
+
+def _chunks(items: List[str], size: int) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def query_chunk(pool, wallets: List[str], args: argparse.Namespace) -> List[Dict[str, object]]:
+    """查询一组钱包，返回与输入顺序一致的结果行"""
+    rows = [{"address": addr} for addr in wallets]
+    queries = args.queries
+
+    if "balance" in queries or "nonce" in queries:
+        balances, tx_counts = {}, {}
+        if "balance" in queries and args.multicall:
+            # 每次eth_call查询一批地址的余额
+            from wallet_utils import get_wallet_balances_multicall
+            balances = get_wallet_balances_multicall(pool, wallets)
+        # 只查询需要的字段
+        fields = []
+        if "balance" in queries and not args.multicall:
+            fields.append("balance")
+        if "nonce" in queries:
+            fields.append("transactions")
+        if fields:
+            from async_query import query_wallet_data
+            queried_balances, tx_counts = query_wallet_data(
+                pool, wallets,
+                concurrency=args.concurrency,
+                timeout=args.timeout,
+                batch_size=args.batch_size,
+                fields=fields
+            )
+            if not args.multicall:
+                balances = queried_balances
+        for row in rows:
+            if "balance" in queries:
+                row["balance"] = balances.get(row["address"], "-")
+            if "nonce" in queries:
+                row["transactions"] = tx_counts.get(row["address"], "-")
+
+    if "activity" in queries:
+        from wallet_utils import get_wallet_activity
+        activity = get_wallet_activity(
+            pool, wallets, max_blocks=args.max_blocks,
+            index_path=args.index_path, mode=args.activity_mode
+        )
+        for row in rows:
+            info = activity.get(row["address"], {})
+            for key in ("active_days", "active_weeks", "first_tx_time", "last_tx_time"):
+                row[key] = info.get(key, "-")
+
+    if "tokens" in queries and args.tokens:
+        from token_matrix import get_token_balance_matrix
+        matrix = get_token_balance_matrix(pool, wallets, args.tokens, metadata=args.token_metadata)
+        columns = [f"{symbol} ({token})" for symbol, token in zip(matrix.symbols, matrix.tokens)]
+        for row, (_, values) in zip(rows, matrix.iter_rows()):
+            row.update(zip(columns, values))
+
+    if "interactions" in queries and args.interactions is not None:
+        # 交互记录已在run()中对全部钱包一次查询
+        for row in rows:
+            txs = args.interactions.get(row["address"], [])
+            row["interactions"] = len(txs)
+            row["last_interaction_time"] = txs[0]["timestamp"] if txs else "-"
+
+    return rows
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="monad_wallet_cli",
+        description="批量查询Monad钱包的余额、交易数、活跃度、代币余额和合约交互，结果逐批输出到标准输出"
+    )
+    parser.add_argument("files", nargs="*", help="钱包地址文件（每行一个，或.json列表），- 或省略表示标准输入")
+    parser.add_argument("--rpc", action="append", dest="rpc_urls", metavar="URL",
+                        help=f"RPC节点URL，可重复指定多个（默认 {DEFAULT_RPC_URL}）")
+    parser.add_argument("--query", default="balance,nonce",
+                        help=f"查询内容，逗号分隔: {','.join(QUERY_TYPES)}（默认 balance,nonce）")
+    parser.add_argument("--token", action="append", dest="tokens", default=[], metavar="ADDRESS",
+                        help="代币合约地址（--query包含tokens时使用），可重复指定")
+    parser.add_argument("--contract", default=None, metavar="ADDRESS",
+                        help="查询Transfer交互的代币合约地址（--query包含interactions时使用）")
+    parser.add_argument("--from-block", type=int, default=0, help="交互查询的起始区块（默认0）")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="输出格式（默认csv）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"同时在途的最大请求数（默认{DEFAULT_CONCURRENCY}）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"每个JSON-RPC批量请求包含的调用数（默认{DEFAULT_BATCH_SIZE}）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"单个请求超时时间（秒，默认{DEFAULT_TIMEOUT}）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"每处理多少个地址输出一次（默认{DEFAULT_CHUNK_SIZE}）")
+    parser.add_argument("--activity-mode", choices=("index", "bisect"), default="bisect",
+                        help="活跃度查询方式（默认bisect，index需要本地区块索引）")
+    parser.add_argument("--max-blocks", type=int, default=10000, help="每次更新活跃度索引最多扫描的区块数")
+    parser.add_argument("--index-path", default=None, help="活跃度索引文件路径")
+    parser.add_argument("--chain-cache", default=None, metavar="PATH", help="启用链上历史数据磁盘缓存")
+    parser.add_argument("--hedge", action="store_true", help="多节点时对冲慢请求")
+    parser.add_argument("--multicall", action="store_true", help="通过Multicall3合约批量查询原生币余额")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不在标准错误输出进度")
+    return parser
+
+
+def run(args: argparse.Namespace, out: TextIO = sys.stdout, err: TextIO = sys.stderr) -> int:
+    args.queries = {item.strip() for item in args.query.split(",") if item.strip()}
+    unknown = args.queries - set(QUERY_TYPES)
+    if unknown:
+        err.write(f"未知的查询类型: {', '.join(sorted(unknown))}\n")
+        return 2
+    if "tokens" in args.queries and not args.tokens:
+        err.write("查询代币余额需要至少一个 --token\n")
+        return 2
+    if "interactions" in args.queries and not args.contract:
+        err.write("查询合约交互需要 --contract\n")
+        return 2
+
+    wallets = read_wallets(args.files)
+    if not wallets:
+        err.write("没有钱包地址可查询\n")
+        return 1
+
+    # 依赖在确定要查询后才导入；aiohttp只在查询余额/交易数时导入（见query_chunk）
+    from rpc_pool import RPCPool
+    if args.chain_cache:
+        from chain_cache import configure_chain_cache
+        configure_chain_cache(args.chain_cache)
+
+    pool = RPCPool(args.rpc_urls or [DEFAULT_RPC_URL], timeout=args.timeout, hedge=args.hedge)
+    args.token_metadata = None
+    if "tokens" in args.queries:
+        # 代币的symbol/decimals对所有批次相同，只查询一次
+        from token_matrix import get_token_metadata
+        args.token_metadata = get_token_metadata(pool, args.tokens)
+    args.interactions = None
+    if "interactions" in args.queries:
+        # 全部钱包只扫描一遍区块范围，各批次从结果中取各自的钱包
+        from wallet_utils import get_contract_interactions_bulk
+        args.interactions = get_contract_interactions_bulk(
+            pool, wallets, args.contract, from_block=args.from_block, max_results=None
+        )
+    writer = RowWriter(out, args.format)
+    progress = ProgressTracker(len(wallets))
+    for chunk in _chunks(wallets, max(1, args.chunk_size)):
+        for row in query_chunk(pool, chunk, args):
+            writer.write(row)
+        writer.flush()
+        progress.advance(len(chunk))
+        if not args.quiet:
+            err.write(progress.format("个钱包") + "\n")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # 下游（如head）提前关闭管道：把标准输出重定向到devnull，避免退出时刷新缓冲区再次出错
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
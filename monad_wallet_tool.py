@@ -1,34 +1,72 @@
+import time
+# 启动耗时统计的起点
+_START_TIME = time.perf_counter()
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
+import queue
 import json
+import csv
 import os
+import re
 import sys
-import time
-from web3 import Web3
-import requests
-import pandas as pd
-from datetime import datetime
-import webbrowser
-# 导入自定义工具函数
-from wallet_utils import get_wallet_balances, get_transaction_count, get_contract_interactions, get_token_info
+# 导入自定义工具函数（只导入不依赖web3的轻量模块，web3/pandas等在首次使用时导入）
+from defaults import DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, DEFAULT_RPC_URL, DEFAULT_TIMEOUT
+from chain_cache import configure_chain_cache
+from result_cache import ResultCache
+from wallet_store import WalletStore
+from single_flight import get_single_flight
+from progress import ProgressTracker
+from result_table import ResultTable
+from virtual_table import VirtualTreeview
+from log_buffer import LogBuffer, DEFAULT_MAX_LINES
+# 模块导入耗时
+_IMPORT_SECONDS = time.perf_counter() - _START_TIME
+
+# 主线程处理界面更新队列的间隔（毫秒）
+UI_DRAIN_INTERVAL_MS = 50
+# 每次最多写入的结果行数，其余留到下一轮，保持界面响应
+UI_ROWS_PER_DRAIN = 20000
+# 筛选下拉框中的列
+FILTER_COLUMNS = {'余额': 'balance', '交易数': 'transactions'}
+# 日志中最多列出的无效地址数
+MAX_LOGGED_INVALID = 20
 
 class MonadWalletTool:
     """Monad测试币钱包工具主类"""
     
-    def __init__(self, root):
+    def __init__(self, root, profile_startup=False, log_file=None, log_max_lines=DEFAULT_MAX_LINES):
         """初始化应用"""
         self.root = root
+        self.profile_startup = profile_startup  # 为True时输出启动耗时后退出
+        # 日志保存在有上限的缓冲区中，由主线程批量写入日志区域；可同时写入日志文件
+        self.log_buffer = LogBuffer(log_max_lines, log_file)
+        self.log_line_count = 0  # 日志区域当前的行数
         self.root.title("Monad钱包查询工具")  # 窗口标题栏
         self.root.geometry("1000x800")
         self.root.minsize(800, 600)
         
         # 变量初始化
-        self.rpc_url = tk.StringVar(value="https://testnet-rpc.monad.xyz/")
+        self.default_rpc_urls = [DEFAULT_RPC_URL]
         self.wallet_address = tk.StringVar()  # 钱包地址输入变量
         self.web3 = None
-        self.wallets = []  # 钱包地址列表
+        self.rpc_pool = None  # 多节点连接池，self.web3以它为provider
+        self.wallet_store = None  # 钱包地址、标签、分组和最近结果的数据库
+        self.wallets = []  # 钱包地址列表（即wallet_store.addresses，只通过wallet_store修改）
+        self.tokens = []  # 代币合约地址列表
+        self.token_matrix = None  # 最近一次的钱包 × 代币余额矩阵
         self.contracts = {}  # 合约地址和ABI {address: abi}
+        self.batch_size = DEFAULT_BATCH_SIZE  # 每个JSON-RPC批量请求包含的调用数
+        self.max_concurrency = DEFAULT_CONCURRENCY  # 同时在途的最大请求数
+        self.request_timeout = DEFAULT_TIMEOUT  # 单个请求超时时间（秒）
+        self.hedge_requests = True  # 多节点时慢请求向另一个节点发送副本
+        self.head_watcher = None  # 跟随新区块的增量刷新
+        self.results = ResultTable()  # 结果表格的数据，表格只显示可见的行
+        self.view_outdated = False  # 排序/筛选需要按新结果重新计算
+        self.ui_queue = queue.Queue()  # 工作线程提交的表格更新，由主线程批量处理
+        self.pending_rows = {}  # 待写入表格的行 {地址: [余额, 交易数, 余额是否过期, 交易数是否过期]}
+        self.query_cancel = None  # 进行中查询的取消标志
+        self.query_progress = None  # 进行中查询的进度统计
         
         # 数据文件路径 - 修改为使用更可靠的路径
         # 方法1: 使用exe所在目录
@@ -47,7 +85,14 @@ class MonadWalletTool:
             user_docs = os.path.join(os.path.expanduser('~'), 'Documents', 'MonadWalletTool')
             self.data_dir = user_docs
             
+        self.wallets_db = os.path.join(self.data_dir, "wallets.db")
+        # 旧版本的钱包列表和结果快照，首次启动新版本时导入数据库
         self.wallets_file = os.path.join(self.data_dir, "wallets.json")
+        self.results_file = os.path.join(self.data_dir, "results.json")
+        self.tokens_file = os.path.join(self.data_dir, "tokens.json")
+        # 查询结果（按区块号标记），持久化在钱包数据库中，启动时恢复到表格；
+        # 缓存的地址就是列表中的钱包（删除时discard），不设上限
+        self.result_cache = ResultCache(max_addresses=None)
         
         # 确保数据目录存在
         if not os.path.exists(self.data_dir):
@@ -56,18 +101,27 @@ class MonadWalletTool:
         # 记录数据保存位置到日志
         print(f"数据将保存到: {self.data_dir}")
         
-        # 进度指示器控制
-        self.progress_running = False
-        self.progress_thread = None
+        # 进度指示器状态（只在主线程中绘制）
+        self.progress_message = None  # 没有进度数据的任务的提示文字
+        self.progress_started = 0.0
+        self.progress_active = False
         
         # 创建UI
         self.create_ui()
         
-        # 自动连接到默认RPC节点
-        self.connect_to_rpc()
-        
         # 加载保存的钱包地址
         self.load_wallets()
+        self.load_tokens()
+        
+        # 窗口显示后记录启动耗时
+        self.root.after_idle(self.report_startup)
+        
+        # 主线程定期处理工作线程提交的表格更新
+        self.root.after(UI_DRAIN_INTERVAL_MS, self.drain_ui_queue)
+        
+        # 在后台线程自动连接到默认RPC节点，不阻塞窗口显示
+        if not self.profile_startup:
+            self.connect_in_background()
         
     def create_ui(self):
         """创建用户界面"""
@@ -108,7 +162,7 @@ class MonadWalletTool:
             font=("Arial", 10, "underline")
         )
         author_label.pack(side=tk.LEFT)
-        author_label.bind("<Button-1>", lambda e: webbrowser.open_new("https://x.com/0x1c3win"))
+        author_label.bind("<Button-1>", lambda e: self.open_url("https://x.com/0x1c3win"))
         
         # 添加分隔线
         separator = ttk.Separator(main_frame, orient="horizontal")
@@ -130,9 +184,13 @@ class MonadWalletTool:
         rpc_frame = ttk.LabelFrame(content_frame, text="RPC配置", padding=10)
         rpc_frame.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
         
-        ttk.Label(rpc_frame, text="RPC URL:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
-        ttk.Entry(rpc_frame, textvariable=self.rpc_url, width=50).grid(row=0, column=1, sticky="ew", padx=5, pady=5)
-        ttk.Button(rpc_frame, text="测试连接", command=self.test_rpc_connection).grid(row=0, column=2, padx=5, pady=5)
+        ttk.Label(rpc_frame, text="RPC URL:").grid(row=0, column=0, sticky="nw", padx=5, pady=5)
+        # 支持多个RPC节点，每行一个
+        self.rpc_text = scrolledtext.ScrolledText(rpc_frame, wrap=tk.NONE, height=3, width=50)
+        self.rpc_text.grid(row=0, column=1, sticky="ew", padx=5, pady=5)
+        self.rpc_text.insert("1.0", "\n".join(self.default_rpc_urls))
+        ttk.Button(rpc_frame, text="测试连接", command=self.test_rpc_connection).grid(row=0, column=2, padx=5, pady=5, sticky="n")
+        ttk.Label(rpc_frame, text="提示: 每行一个RPC URL，多个节点时自动选择最快的节点并故障切换").grid(row=1, column=1, sticky="w", padx=5)
         
         rpc_frame.columnconfigure(1, weight=1)
         
@@ -147,7 +205,7 @@ class MonadWalletTool:
         self.wallet_text.grid(row=0, column=1, sticky="ew", padx=5, pady=5)
         ttk.Button(wallet_frame, text="添加到列表", command=self.add_wallet).grid(row=0, column=2, padx=5, pady=5, sticky="n")
         
-        ttk.Label(wallet_frame, text="提示: 每行输入一个钱包地址").grid(row=1, column=1, sticky="w", padx=5)
+        ttk.Label(wallet_frame, text="提示: 每行输入一个钱包地址，可用逗号附加标签和分组，如 0x...,主号,A组").grid(row=1, column=1, sticky="w", padx=5)
         
         wallet_frame.columnconfigure(1, weight=1)
         
@@ -157,41 +215,54 @@ class MonadWalletTool:
         
         # 将原来的两个查询按钮替换为一个一键查询按钮
         ttk.Button(btn_frame, text="一键查询", command=self.query_all).pack(side=tk.LEFT, padx=10)
+        self.cancel_button = ttk.Button(btn_frame, text="取消查询", command=self.cancel_query, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="清空列表", command=self.clear_wallets).pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="导出结果", command=self.export_results).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="代币余额", command=self.open_token_window).pack(side=tk.LEFT, padx=10)
+        self.watch_button = ttk.Button(btn_frame, text="监控新区块", command=self.toggle_watch)
+        self.watch_button.pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="清除日志", command=self.clear_log).pack(side=tk.LEFT, padx=10)
         
+        # 查询进度：已完成/总数、速率和预计剩余时间
+        self.progress_var = tk.StringVar()
+        self.progress_bar = ttk.Progressbar(btn_frame, mode='determinate', length=120)
+        self.progress_bar.pack(side=tk.RIGHT, padx=10)
+        ttk.Label(btn_frame, textvariable=self.progress_var).pack(side=tk.RIGHT)
+        
         # ==== 4. 结果表格区域 ====
         result_frame = ttk.LabelFrame(content_frame, text="查询结果", padding=10)
         result_frame.grid(row=3, column=0, sticky="nsew", padx=5, pady=5)
         
-        # 创建带滚动条的表格
-        table_frame = ttk.Frame(result_frame)
-        table_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # 创建表格 - 添加序号列
-        columns = ('index', 'address', 'balance', 'transactions')
-        self.result_table = ttk.Treeview(table_frame, columns=columns, show='headings')
-        
-        # 定义列
-        self.result_table.heading('index', text='序号')
-        self.result_table.heading('address', text='钱包地址')
-        self.result_table.heading('balance', text='余额 (MON)')
-        self.result_table.heading('transactions', text='交易数')
-        
-        # 设置列宽
-        self.result_table.column('index', width=50, anchor='center')
-        self.result_table.column('address', width=400, anchor='w')
-        self.result_table.column('balance', width=150, anchor='center')
-        self.result_table.column('transactions', width=150, anchor='center')
+        # 筛选栏：按余额或交易数筛选
+        filter_frame = ttk.Frame(result_frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
         
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.result_table.yview)
-        self.result_table.configure(yscrollcommand=scrollbar.set)
+        ttk.Label(filter_frame, text="筛选:").pack(side=tk.LEFT)
+        self.filter_column = ttk.Combobox(filter_frame, values=list(FILTER_COLUMNS), width=6, state='readonly')
+        self.filter_column.current(0)
+        self.filter_column.pack(side=tk.LEFT, padx=5)
+        self.filter_op = ttk.Combobox(filter_frame, values=['>', '>=', '<', '<=', '='], width=3, state='readonly')
+        self.filter_op.current(0)
+        self.filter_op.pack(side=tk.LEFT)
+        self.filter_value = tk.StringVar(value='0')
+        ttk.Entry(filter_frame, textvariable=self.filter_value, width=12).pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text="筛选", command=self.apply_filter).pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text="显示全部", command=self.clear_filter).pack(side=tk.LEFT)
+        self.row_count_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=self.row_count_var).pack(side=tk.RIGHT)
         
-        # 放置表格和滚动条
-        self.result_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # 创建虚拟化表格（只渲染可见的行），点击列标题排序
+        columns = (
+            ('index', '序号', 50, 'center'),
+            ('address', '钱包地址', 340, 'w'),
+            ('label', '标签', 100, 'w'),
+            ('group', '分组', 80, 'w'),
+            ('balance', '余额 (MON)', 130, 'center'),
+            ('transactions', '交易数', 100, 'center'),
+        )
+        self.result_view = VirtualTreeview(result_frame, self.results, columns)
+        self.result_view.pack(fill=tk.BOTH, expand=True)
         
         # ==== 5. 日志显示区域 ====
         log_frame = ttk.LabelFrame(content_frame, text="日志", padding=10)
@@ -201,157 +272,190 @@ class MonadWalletTool:
         self.log_text.pack(fill=tk.BOTH, expand=True)
         self.log_text.config(state=tk.DISABLED)
     
+    def open_url(self, url):
+        """在浏览器中打开链接"""
+        import webbrowser
+        webbrowser.open_new(url)
+    
+    def report_startup(self):
+        """记录模块导入耗时和首次绘制耗时，便于发现启动变慢"""
+        paint_seconds = time.perf_counter() - _START_TIME
+        message = f"启动耗时: 导入模块 {_IMPORT_SECONDS * 1000:.0f}ms, 首次绘制 {paint_seconds * 1000:.0f}ms"
+        self.log(message)
+        if self.profile_startup:
+            # 窗口在下一轮日志刷新前就会关闭，耗时直接输出到标准输出
+            print(message, flush=True)
+            self.root.after(0, self.root.destroy)
+    
     def log(self, message):
-        """向日志区域添加消息"""
+        """向日志区域添加消息（可在任意线程调用，由主线程批量显示）"""
+        self.log_buffer.append(message)
+    
+    def flush_log(self):
+        """主线程：将新的日志行一次写入日志区域，超出上限时删除最旧的行"""
+        lines, dropped = self.log_buffer.take_pending()
+        if not lines:
+            return
+        if dropped:
+            lines.insert(0, f"... 省略 {dropped} 行日志 ...")
+        text = "\n".join(lines) + "\n"
+        
         self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n")
+        self.log_text.insert(tk.END, text)
+        self.log_line_count += text.count("\n")
+        excess = self.log_line_count - self.log_buffer.max_lines
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_line_count -= excess
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
     
     def start_progress_indicator(self, message="正在查询"):
-        """启动进度指示器，显示动态的省略号"""
-        # 如果已经有一个进度指示器在运行，先停止它
-        self.stop_progress_indicator()
-        
-        # 设置标志为运行状态
-        self.progress_running = True
-        
-        # 启动线程更新进度指示器
-        def update_progress():
-            dot_count = 0
-            base_message = message
-            
-            while self.progress_running:
-                # 创建省略号字符串
-                dots = "." * dot_count
-                full_message = f"{base_message}{dots}"
-                
-                # 更新日志
-                self.log_text.config(state=tk.NORMAL)
-                
-                # 寻找最后一行并检查是否是进度指示器
-                last_line_start = self.log_text.index("end-1c linestart")
-                last_line = self.log_text.get(last_line_start, "end-1c")
-                
-                if last_line.startswith(f"[{datetime.now().strftime('%H:%M:%S')}] {base_message}"):
-                    # 如果最后一行是进度指示器，替换它
-                    self.log_text.delete(last_line_start, "end-1c")
-                    self.log_text.insert("end-1c", f"[{datetime.now().strftime('%H:%M:%S')}] {full_message}")
-                else:
-                    # 否则添加新行
-                    self.log_text.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] {full_message}\n")
-                
-                self.log_text.see(tk.END)
-                self.log_text.config(state=tk.DISABLED)
-                
-                # 增加点数，循环显示1-5个点
-                dot_count = (dot_count + 1) % 6
-                if dot_count == 0:
-                    dot_count = 1
-                    
-                # 暂停一段时间
-                time.sleep(0.5)
-        
-        # 启动更新线程
-        self.progress_thread = threading.Thread(target=update_progress)
-        self.progress_thread.daemon = True
-        self.progress_thread.start()
+        """启动进度指示器，在进度栏显示动态的省略号（动画由主线程绘制）"""
+        self.progress_started = time.monotonic()
+        self.progress_message = message
+        self.log(message)
     
     def stop_progress_indicator(self):
-        """停止进度指示器"""
-        if self.progress_running:
-            self.progress_running = False
-            # 等待线程结束
-            if self.progress_thread and self.progress_thread.is_alive():
-                self.progress_thread.join(1.0)  # 等待最多1秒
-            
-            self.progress_thread = None
+        """停止进度指示器（可在任意线程调用）"""
+        self.progress_message = None
+    
+    def get_rpc_urls(self):
+        """获取RPC输入框中的URL列表"""
+        urls = [line.strip() for line in self.rpc_text.get("1.0", tk.END).split('\n') if line.strip()]
+        return urls or list(self.default_rpc_urls)
     
-    def connect_to_rpc(self):
-        """连接到RPC节点"""
-        url = self.rpc_url.get()
+    def _open_connection(self, urls):
+        """创建连接池并测试连接（在工作线程调用，不修改界面状态），返回 (连接池, Web3或None, 日志消息)"""
+        from rpc_pool import RPCPool
         
         try:
-            # 创建Web3连接
-            self.web3 = Web3(Web3.HTTPProvider(url))
+            # 创建多节点连接池和Web3连接
+            rpc_pool = RPCPool(urls, hedge=self.hedge_requests)
+            web3 = rpc_pool.as_web3()
             
             # 测试连接
-            if self.web3.is_connected():
-                block_number = self.web3.eth.block_number
-                self.log(f"已自动连接到 {url}, 当前区块: {block_number}")
-                return True
+            if web3.is_connected():
+                block_number = web3.eth.block_number
+                return rpc_pool, web3, f"已自动连接到 {', '.join(urls)}, 当前区块: {block_number}"
             else:
-                self.log(f"自动连接到 {url} 失败")
-                self.web3 = None
-                return False
+                return rpc_pool, None, f"自动连接到 {', '.join(urls)} 失败"
         except Exception as e:
-            self.log(f"连接错误: {str(e)}")
-            self.web3 = None
-            return False
+            return None, None, f"连接错误: {str(e)}"
+    
+    def set_connection(self, rpc_pool, web3):
+        """主线程：保存工作线程建立的连接（web3为None表示连接失败）"""
+        self.rpc_pool = rpc_pool
+        self.web3 = web3
+    
+    def worker_connection(self, urls):
+        """
+        工作线程：返回可用的连接池，连接失败时返回None
+        
+        尚未连接时在当前线程连接，连接结果通过界面队列交给主线程保存。
+        """
+        rpc_pool, web3 = self.rpc_pool, self.web3
+        if rpc_pool is not None and web3 is not None:
+            return rpc_pool
+        self.log("未检测到有效连接，尝试连接到RPC节点...")
+        rpc_pool, web3, message = self._open_connection(urls)
+        self.log(message)
+        self.post_call(self.set_connection, rpc_pool, web3)
+        return rpc_pool if web3 is not None else None
+    
+    def connect_in_background(self):
+        """启动时在后台线程打开链上数据缓存并连接RPC节点，连接结果通过界面队列交给主线程"""
+        urls = self.get_rpc_urls()
+        
+        def connect_task():
+            # 已确定的历史链上数据（区块、回执、日志等）缓存到本地磁盘
+            try:
+                configure_chain_cache(os.path.join(self.data_dir, "chain_cache.bin"))
+            except Exception as e:
+                self.log(f"链上数据缓存不可用: {str(e)}")
+            rpc_pool, web3, message = self._open_connection(urls)
+            self.post_call(self.set_connection, rpc_pool, web3)
+            self.log(message)
+        
+        thread = threading.Thread(target=connect_task)
+        thread.daemon = True
+        thread.start()
     
     def test_rpc_connection(self):
-        """测试RPC连接 - 用户手动测试"""
-        url = self.rpc_url.get()
-        self.log(f"测试连接到 {url}...")
+        """测试RPC连接 - 用户手动测试，在后台线程中进行，连接结果通过界面队列交给主线程"""
+        urls = self.get_rpc_urls()
+        self.log(f"测试连接到 {', '.join(urls)}...")
         
-        try:
-            # 创建Web3连接
-            self.web3 = Web3(Web3.HTTPProvider(url))
+        def test_task():
+            from web3 import Web3
+            from rpc_pool import RPCPool
             
-            # 测试连接
-            if self.web3.is_connected():
-                block_number = self.web3.eth.block_number
-                self.log(f"连接成功! 当前区块: {block_number}")
-                return True
-            else:
-                self.log("连接失败: Web3无法连接到RPC节点")
-                self.web3 = None
-                return False
-        except Exception as e:
-            self.log(f"连接错误: {str(e)}")
-            self.web3 = None
-            return False
-    
-    def ensure_connection(self):
-        """确保已连接到RPC节点，如果未连接则尝试连接"""
-        if self.web3 and self.web3.is_connected():
-            return True
-        else:
-            self.log("未检测到有效连接，尝试连接到RPC节点...")
-            return self.connect_to_rpc()
+            try:
+                # 创建多节点连接池和Web3连接
+                rpc_pool = RPCPool(urls, hedge=self.hedge_requests)
+                web3 = rpc_pool.as_web3()
+                
+                # 逐个节点测试，记录各节点延迟
+                for endpoint in rpc_pool.endpoints:
+                    start = time.monotonic()
+                    try:
+                        block_number = Web3(Web3.HTTPProvider(endpoint.url)).eth.block_number
+                        rpc_pool.record(endpoint, time.monotonic() - start)
+                        self.log(f"{endpoint.url}: 当前区块 {block_number}, 延迟 {(time.monotonic() - start) * 1000:.0f}ms")
+                    except Exception as e:
+                        rpc_pool.record(endpoint, None)
+                        self.log(f"{endpoint.url}: 连接失败 ({str(e)})")
+                
+                if web3.is_connected():
+                    block_number = web3.eth.block_number
+                    self.post_call(self.set_connection, rpc_pool, web3)
+                    self.log(f"连接成功! 当前区块: {block_number}")
+                    flight_stats = get_single_flight().stats()
+                    if flight_stats["coalesced"]:
+                        self.log(f"已合并重复请求 {flight_stats['coalesced']} / {flight_stats['requests']} 个")
+                else:
+                    self.post_call(self.set_connection, rpc_pool, None)
+                    self.log("连接失败: Web3无法连接到RPC节点")
+            except Exception as e:
+                self.post_call(self.set_connection, None, None)
+                self.log(f"连接错误: {str(e)}")
+        
+        thread = threading.Thread(target=test_task)
+        thread.daemon = True
+        thread.start()
     
     def add_wallet(self):
         """添加钱包地址到列表"""
+        from web3 import Web3
+        
         addresses_text = self.wallet_text.get("1.0", tk.END).strip()
         
         if not addresses_text:
             messagebox.showinfo("提示", "请输入钱包地址")
             return
             
-        # 按行分割地址
-        addresses = [addr.strip() for addr in addresses_text.split('\n') if addr.strip()]
+        # 按行分割，每行: 地址[,标签[,分组]]
+        entries = [
+            [part.strip() for part in re.split(r'[,，\t]', line.strip(), maxsplit=2)]
+            for line in addresses_text.split('\n') if line.strip()
+        ]
         
-        # 确保已连接到RPC
-        self.ensure_connection()
-        
-        # 验证并添加地址
-        valid_addresses = []
+        # 验证并添加地址（格式和checksum在本地校验，不需要连接RPC节点）
+        valid_entries = []
         invalid_addresses = []
         
-        for addr in addresses:
-            if self.web3 and self.web3.is_address(addr):
-                valid_addresses.append(self.web3.to_checksum_address(addr))
+        for entry in entries:
+            addr = entry[0]
+            if Web3.is_address(addr):
+                valid_entries.append([Web3.to_checksum_address(addr)] + entry[1:])
             elif addr.startswith('0x') and len(addr) == 42:
-                valid_addresses.append(addr)
+                valid_entries.append(entry)
             else:
                 invalid_addresses.append(addr)
         
-        # 添加有效地址到列表
-        added_count = 0
-        for addr in valid_addresses:
-            if addr not in self.wallets:
-                self.wallets.append(addr)
-                added_count += 1
+        # 添加有效地址到列表（一个事务写入数据库，已存在的地址不区分大小写跳过）
+        added_count = len(self.wallet_store.add_many(valid_entries))
+        self.wallets = self.wallet_store.addresses
         
         # 清空输入框
         self.wallet_text.delete("1.0", tk.END)
@@ -363,16 +467,19 @@ class MonadWalletTool:
         
         self.log(result_msg)
         
-        # 如果有无效地址，显示详细信息
+        # 如果有无效地址，显示详细信息（只列出前几个）
         if invalid_addresses:
-            detail_msg = "无效地址: " + ", ".join(invalid_addresses)
+            detail_msg = "无效地址: " + ", ".join(invalid_addresses[:MAX_LOGGED_INVALID])
+            if len(invalid_addresses) > MAX_LOGGED_INVALID:
+                detail_msg += f" 等共 {len(invalid_addresses)} 个"
             self.log(detail_msg)
         
         # 更新表格
         self.update_result_table()
         
-        # 保存钱包列表到文件
-        self.save_wallets()
+        # 监控中则同步被跟踪的地址
+        if self.head_watcher is not None:
+            self.head_watcher.set_addresses(self.wallets)
     
     def clear_wallets(self):
         """清空钱包列表"""
@@ -380,32 +487,52 @@ class MonadWalletTool:
             return
         
         if messagebox.askyesno("确认", "确定要清空钱包列表吗?"):
-            self.wallets = []
+            self.result_cache.discard(self.wallets)
+            self.wallet_store.clear()
+            self.wallets = self.wallet_store.addresses
             # 清空表格
-            for item in self.result_table.get_children():
-                self.result_table.delete(item)
+            self.results.reset([])
+            self.pending_rows = {}
+            self.refresh_table()
             self.log("已清空钱包列表")
-            
-            # 保存空列表到文件
-            self.save_wallets()
+            if self.head_watcher is not None:
+                self.head_watcher.set_addresses(self.wallets)
     
     def update_result_table(self):
         """更新结果表格"""
-        # 清空表格
-        for item in self.result_table.get_children():
-            self.result_table.delete(item)
+        # 按钱包列表重建表格数据（带序号和标签），保留当前的排序和筛选条件
+        self.results.reset(self.wallets, self.wallet_store.labels, self.wallet_store.groups)
         
-        # 添加钱包地址到表格（带序号）
-        for idx, addr in enumerate(self.wallets, 1):
-            self.result_table.insert('', tk.END, values=(idx, addr, '-', '-'))
+        # 已有缓存结果的地址先显示缓存值（过期样式），再按新数据排序/筛选
+        self.show_cached_results(self.wallets, True)
+        self.results.apply_view()
+        self.refresh_table()
+    
+    def refresh_table(self):
+        """重绘表格的可见行并更新行数统计"""
+        self.result_view.refresh()
+        total = len(self.results)
+        shown = len(self.results.view)
+        self.row_count_var.set(f"显示 {shown} / {total} 行" if shown != total else f"共 {total} 行")
+    
+    def apply_filter(self):
+        """按筛选栏的条件筛选表格"""
+        try:
+            value = float(self.filter_value.get())
+        except ValueError:
+            messagebox.showinfo("提示", "请输入数值")
+            return
+        self.results.filter(FILTER_COLUMNS[self.filter_column.get()], self.filter_op.get(), value)
+        self.result_view.offset = 0
+        self.refresh_table()
+    
+    def clear_filter(self):
+        """取消筛选"""
+        self.results.filter(None)
+        self.refresh_table()
     
     def query_all(self):
         """一键查询钱包的余额和交易数量"""
-        # 确保已连接到RPC
-        if not self.ensure_connection():
-            self.log("无法连接到RPC节点，请检查网络连接或RPC URL")
-            return
-            
         if not self.wallets:
             # 如果钱包列表为空，尝试从输入框获取地址并添加
             self.add_wallet()
@@ -413,59 +540,283 @@ class MonadWalletTool:
                 self.log("没有钱包地址可查询")
                 return
         
-        # 启动进度指示器
-        msg = f"正在查询 {len(self.wallets)} 个钱包的余额和交易数"
-        self.start_progress_indicator(msg)
+        if self.query_cancel is not None:
+            self.log("查询正在进行中，请等待完成或先取消")
+            return
+        
+        wallets = list(self.wallets)
+        urls = self.get_rpc_urls()
+        cancel = threading.Event()
+        progress = ProgressTracker(len(wallets))
+        self.query_cancel = cancel
+        self.query_progress = progress
+        self.cancel_button.config(state=tk.NORMAL)
+        self.log(f"正在查询 {len(wallets)} 个钱包的余额和交易数")
+        
+        # 每个钱包的余额和交易数都返回后才算完成
+        remaining = dict.fromkeys(wallets, 2)
+        
+        def on_batch(balance_results, tx_results):
+            """每个批量请求完成后调用（查询线程）：结果立即提交到表格"""
+            finished = 0
+            for results in (balance_results, tx_results):
+                for addr in results:
+                    remaining[addr] -= 1
+                    if remaining[addr] == 0:
+                        finished += 1
+            progress.advance(finished)
+            self.post_results(balance_results, tx_results)
         
         def query_task():
+            from async_query import query_wallet_data
+            
             try:
-                # 使用工具函数同时查询余额和交易数量
-                balance_results = get_wallet_balances(self.web3, self.wallets)
-                tx_results = get_transaction_count(self.web3, self.wallets)
+                # 尚未连接时在查询线程中连接，不阻塞界面
+                rpc_pool = self.worker_connection(urls)
+                if rpc_pool is None:
+                    self.log("无法连接到RPC节点，请检查网络连接或RPC URL")
+                    return
+                web3 = rpc_pool.as_web3()
+                chain_id, head = web3.eth.chain_id, web3.eth.block_number
+                # 节点换成了另一条链：旧结果的区块号不可比较，全部丢弃
+                if self.result_cache.set_chain(chain_id):
+                    self.log(f"当前节点为链 {chain_id}，已清空其他链的缓存结果")
                 
-                # 停止进度指示器
-                self.stop_progress_indicator()
+                # 最新区块未变化：直接使用缓存结果
+                if self.result_cache.is_fresh(wallets, ('balance', 'transactions'), head):
+                    progress.advance(len(wallets))
+                    self.post_results(*self.cached_results(wallets), stale=False)
+                    self.log(f"区块 {head} 无变化，已使用缓存结果")
+                    return
+                
+                # 区块已前进：先显示旧结果（灰色），后台刷新
+                self.post_results(*self.cached_results(wallets), stale=True)
                 
-                # 更新表格
-                for idx, addr in enumerate(self.wallets, 1):
-                    # 查找表格中对应的行
-                    for item in self.result_table.get_children():
-                        item_values = self.result_table.item(item, 'values')
-                        if item_values[1] == addr:  # 地址现在是第二列
-                            # 更新余额和交易数
-                            new_values = (
-                                item_values[0], 
-                                addr, 
-                                balance_results.get(addr, '-'), 
-                                tx_results.get(addr, '-')
-                            )
-                            self.result_table.item(item, values=new_values)
-                            break
-                    else:
-                        # 如果表格中没有找到对应地址，添加新行
-                        self.result_table.insert('', tk.END, values=(
-                            idx, 
-                            addr, 
-                            balance_results.get(addr, '-'), 
-                            tx_results.get(addr, '-')
-                        ))
+                # 使用异步查询引擎并发查询，每批结果返回后立即显示
+                balance_results, tx_results = query_wallet_data(
+                    rpc_pool,
+                    wallets,
+                    concurrency=self.max_concurrency,
+                    timeout=self.request_timeout,
+                    batch_size=self.batch_size,
+                    on_batch=on_batch,
+                    cancel=cancel
+                )
+                
+                # 记录结果所在区块并保存（取消时保存已完成的部分）
+                self.save_results(balance_results, tx_results, head, chain_id)
                 
                 # 显示日志
-                self.log(f"已完成 {len(self.wallets)} 个钱包的余额和交易数查询")
+                if cancel.is_set():
+                    self.log(f"查询已取消，保留已完成的 {progress.done}/{len(wallets)} 个钱包的结果")
+                else:
+                    self.log(f"已完成 {len(wallets)} 个钱包的余额和交易数查询 (区块 {head})，"
+                             f"用时 {progress.elapsed:.1f}秒")
                 
             except Exception as e:
-                # 出错时也要停止进度指示器
-                self.stop_progress_indicator()
                 self.log(f"查询过程中发生错误: {str(e)}")
+            finally:
+                self.post_call(self.finish_query, cancel)
         
         # 启动线程执行查询
         thread = threading.Thread(target=query_task)
         thread.daemon = True
         thread.start()
     
+    def cancel_query(self):
+        """取消进行中的查询：停止发送新请求并取消在途请求，已显示的结果保留"""
+        if self.query_cancel is not None and not self.query_cancel.is_set():
+            self.query_cancel.set()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.log("正在取消查询...")
+    
+    def finish_query(self, cancel):
+        """查询线程结束后在主线程恢复按钮状态"""
+        if self.query_cancel is not cancel:
+            return
+        self.refresh_progress()
+        self.query_cancel = None
+        self.query_progress = None
+        self.cancel_button.config(state=tk.DISABLED)
+        # 结果更新期间保持原有顺序，查询结束、结果全部写入后按新数值重新排序/筛选
+        self.view_outdated = True
+    
+    def refresh_progress(self):
+        """主线程：刷新进度文字和进度条"""
+        progress = self.query_progress
+        if progress is not None:
+            self.progress_bar.config(mode='determinate', maximum=max(1, progress.total), value=progress.done)
+            self.progress_var.set(progress.format("个钱包"))
+            return
+        
+        message = self.progress_message
+        if message is not None:
+            # 没有进度数据的任务：循环显示1-5个点
+            dots = "." * (int((time.monotonic() - self.progress_started) * 2) % 5 + 1)
+            self.progress_active = True
+            self.progress_bar.config(mode='indeterminate')
+            self.progress_bar.step(2)
+            self.progress_var.set(message + dots)
+        elif self.progress_active:
+            self.progress_active = False
+            self.progress_bar.config(mode='determinate', value=0)
+            self.progress_var.set("")
+    
+    def post_results(self, balance_results, tx_results, stale=False):
+        """提交查询结果（可在任意线程调用），由主线程合并后批量写入表格"""
+        self.ui_queue.put(('results', (balance_results, tx_results, stale)))
+    
+    def post_call(self, func, *args):
+        """请主线程调用func(*args)（可在任意线程调用），用于把工作线程的结果交回界面"""
+        self.ui_queue.put(('call', (func, args)))
+    
+    def drain_ui_queue(self):
+        """主线程：执行工作线程提交的调用，合并队列中的所有结果，每轮最多写入UI_ROWS_PER_DRAIN行"""
+        try:
+            while True:
+                kind, payload = self.ui_queue.get_nowait()
+                if kind == 'call':
+                    func, args = payload
+                    try:
+                        func(*args)
+                    except Exception as e:
+                        self.log(f"界面更新出错: {str(e)}")
+                    continue
+                balance_results, tx_results, stale = payload
+                # 同一地址的多次更新合并为一次，后到的覆盖先到的；过期标记按字段记录
+                for column, results in ((0, balance_results), (1, tx_results)):
+                    for addr, value in results.items():
+                        row = self.pending_rows.get(addr)
+                        if row is None:
+                            row = self.pending_rows[addr] = [None, None, False, False]
+                        row[column] = value
+                        row[column + 2] = stale
+        except queue.Empty:
+            pass
+        
+        changed = False
+        if self.pending_rows:
+            count = 0
+            for addr in list(self.pending_rows):
+                balance, tx_count, balance_stale, tx_stale = self.pending_rows.pop(addr)
+                if balance_stale == tx_stale:
+                    self.update_row(addr, balance, tx_count, balance_stale)
+                else:
+                    self.update_row(addr, balance, None, balance_stale)
+                    self.update_row(addr, None, tx_count, tx_stale)
+                count += 1
+                if count >= UI_ROWS_PER_DRAIN:
+                    break
+            changed = True
+        
+        if self.view_outdated and not self.pending_rows:
+            self.view_outdated = False
+            if self.results.sort_column is not None or self.results.filter_rule is not None:
+                self.results.apply_view()
+                changed = True
+        
+        # 只重绘可见的行
+        if changed:
+            self.refresh_table()
+        self.refresh_progress()
+        self.flush_log()
+        
+        # 还有未写完的行时尽快继续，否则按固定间隔检查
+        self.root.after(1 if self.pending_rows else UI_DRAIN_INTERVAL_MS, self.drain_ui_queue)
+    
+    def update_row(self, addr, balance=None, tx_count=None, stale=False):
+        """更新地址所在行的余额和交易数（None表示保留原值）；地址已从列表中移除时忽略"""
+        self.results.update(addr, balance, tx_count, stale)
+    
+    def fill_result_table(self, balance_results, tx_results, stale=False):
+        """将查询结果写入表格（主线程），stale为True时标记为过期结果"""
+        for addr in dict.fromkeys(list(balance_results) + list(tx_results)):
+            self.update_row(addr, balance_results.get(addr), tx_results.get(addr), stale)
+    
+    def save_results(self, balance_results, tx_results, block_number, chain_id):
+        """记录查询结果所在的链和区块，并写入钱包数据库（可在任意线程调用）"""
+        for field, values in (('balance', balance_results), ('transactions', tx_results)):
+            self.result_cache.update(field, values, block_number, chain_id)
+            self.wallet_store.save_results(field, values, block_number, chain_id)
+    
+    def cached_results(self, wallets):
+        """缓存中的 (余额字典, 交易数字典)"""
+        return (
+            self.result_cache.values(wallets, 'balance'),
+            self.result_cache.values(wallets, 'transactions')
+        )
+    
+    def show_cached_results(self, wallets, stale):
+        """将缓存中的结果显示到表格"""
+        balances, tx_counts = self.cached_results(wallets)
+        if balances or tx_counts:
+            self.fill_result_table(balances, tx_counts, stale)
+    
+    def toggle_watch(self):
+        """开启/关闭新区块监控：只刷新新区块交易涉及的钱包"""
+        if self.head_watcher is not None:
+            self.head_watcher.stop()
+            self.head_watcher = None
+            self.watch_button.config(text="监控新区块")
+            self.log("已停止监控新区块")
+            return
+        
+        if not self.wallets:
+            self.log("没有钱包地址可监控")
+            return
+        
+        urls = self.get_rpc_urls()
+        wallets = list(self.wallets)
+        self.watch_button.config(state=tk.DISABLED)
+        
+        def start_task():
+            from head_watcher import HeadWatcher
+            
+            # 连接节点和读取起始区块都在工作线程中完成
+            watcher = None
+            rpc_pool = self.worker_connection(urls)
+            if rpc_pool is None:
+                self.log("无法连接到RPC节点，请检查网络连接或RPC URL")
+            else:
+                try:
+                    chain_id = rpc_pool.as_web3().eth.chain_id
+                    watcher = HeadWatcher(
+                        rpc_pool,
+                        wallets,
+                        on_update=lambda *update: self.on_watch_update(chain_id, *update),
+                        batch_size=self.batch_size,
+                        on_error=lambda e: self.log(f"监控新区块出错: {str(e)}")
+                    )
+                    watcher.start()
+                except Exception as e:
+                    watcher = None
+                    self.log(f"启动监控失败: {str(e)}")
+            self.post_call(self.watch_started, watcher)
+        
+        thread = threading.Thread(target=start_task)
+        thread.daemon = True
+        thread.start()
+    
+    def watch_started(self, watcher):
+        """主线程：新区块监控启动完成（watcher为None表示启动失败）"""
+        self.watch_button.config(state=tk.NORMAL)
+        if watcher is None:
+            return
+        self.head_watcher = watcher
+        # 启动期间钱包列表可能有变化
+        watcher.set_addresses(self.wallets)
+        self.watch_button.config(text="停止监控")
+        self.log(f"开始监控新区块 (从区块 {watcher.last_block} 之后)，仅刷新交易涉及的钱包")
+    
+    def on_watch_update(self, chain_id, block_number, balance_results, tx_results):
+        """新区块中有交易涉及被跟踪的钱包（在监控线程中调用）"""
+        self.save_results(balance_results, tx_results, block_number, chain_id)
+        self.post_results(balance_results, tx_results)
+        self.log(f"区块 {block_number}: 刷新了 {len(balance_results)} 个钱包")
+    
     def export_results(self):
-        """导出查询结果"""
-        if not self.result_table.get_children():
+        """导出查询结果（按表格当前的排序和筛选）"""
+        if not self.results.view:
             messagebox.showinfo("提示", "没有结果可导出")
             return
             
@@ -481,21 +832,14 @@ class MonadWalletTool:
         # 启动进度指示器
         self.start_progress_indicator("正在导出数据")
         
+        # 在主线程取出表格数据快照，工作线程只负责写文件
+        rows = list(self.results.iter_view())
+        
         def export_task():
             try:
-                # 获取表格数据
-                data = []
-                for item in self.result_table.get_children():
-                    values = self.result_table.item(item, 'values')
-                    data.append({
-                        '序号': values[0],
-                        '钱包地址': values[1],
-                        '余额 (MON)': values[2],  # 余额已经被格式化
-                        '交易数': values[3]
-                    })
-                
-                # 创建DataFrame并导出为CSV
-                df = pd.DataFrame(data)
+                # 创建DataFrame并导出为CSV（pandas较大，导出时才导入）
+                import pandas as pd
+                df = pd.DataFrame(rows, columns=['序号', '钱包地址', '标签', '分组', '余额 (MON)', '交易数'])
                 df.to_csv(file_path, index=False, encoding='utf-8-sig')
                 
                 # 停止进度指示器
@@ -511,46 +855,189 @@ class MonadWalletTool:
         thread.daemon = True
         thread.start()
     
+    def open_token_window(self):
+        """打开代币余额矩阵窗口"""
+        window = tk.Toplevel(self.root)
+        window.title("代币余额")
+        window.geometry("900x600")
+        window.columnconfigure(0, weight=1)
+        window.rowconfigure(1, weight=1)
+        
+        # ==== 代币地址输入 ====
+        token_frame = ttk.LabelFrame(window, text="代币合约地址（每行一个）", padding=10)
+        token_frame.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
+        token_frame.columnconfigure(0, weight=1)
+        
+        token_text = scrolledtext.ScrolledText(token_frame, wrap=tk.WORD, height=5)
+        token_text.grid(row=0, column=0, rowspan=2, sticky="ew", padx=5)
+        token_text.insert("1.0", "\n".join(self.tokens))
+        
+        # ==== 结果表格 ====
+        table_frame = ttk.Frame(window, padding=10)
+        table_frame.grid(row=1, column=0, sticky="nsew")
+        
+        def show_matrix(matrix):
+            """用虚拟化表格显示矩阵：控件数量只取决于可见行数，与钱包数无关"""
+            from token_matrix import TokenMatrixView
+            
+            self.token_matrix = matrix
+            for widget in table_frame.winfo_children():
+                widget.destroy()
+            model = TokenMatrixView(matrix)
+            columns = [('address', '钱包地址', 380, 'w')] + [
+                (name, symbol, 120, 'center') for name, symbol in zip(model.columns[1:], matrix.symbols)
+            ]
+            view = VirtualTreeview(table_frame, model, columns)
+            x_scrollbar = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL, command=view.tree.xview)
+            view.tree.configure(xscrollcommand=x_scrollbar.set)
+            x_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+            view.pack(fill=tk.BOTH, expand=True)
+        
+        def query_tokens():
+            tokens = [line.strip() for line in token_text.get("1.0", tk.END).split('\n') if line.strip()]
+            if not tokens:
+                messagebox.showinfo("提示", "请输入代币合约地址", parent=window)
+                return
+            if not self.wallets:
+                self.log("没有钱包地址可查询")
+                return
+            
+            self.tokens = tokens
+            self.save_tokens()
+            urls = self.get_rpc_urls()
+            wallets = list(self.wallets)
+            self.start_progress_indicator(f"正在查询 {len(wallets)} 个钱包在 {len(tokens)} 个代币上的余额")
+            
+            def token_task():
+                from token_matrix import get_token_balance_matrix
+                
+                try:
+                    rpc_pool = self.worker_connection(urls)
+                    if rpc_pool is None:
+                        self.stop_progress_indicator()
+                        self.log("无法连接到RPC节点，请检查网络连接或RPC URL")
+                        return
+                    matrix = get_token_balance_matrix(rpc_pool, wallets, tokens)
+                    self.stop_progress_indicator()
+                    self.post_call(show_matrix, matrix)
+                    self.log(f"已完成代币余额查询: {matrix.shape[0]} 个钱包 × {matrix.shape[1]} 个代币")
+                    for col, error in matrix.errors.items():
+                        self.log(f"{matrix.symbols[col]} ({matrix.tokens[col]}) 部分余额查询失败: {error}")
+                except Exception as e:
+                    self.stop_progress_indicator()
+                    self.log(f"代币余额查询失败: {str(e)}")
+            
+            thread = threading.Thread(target=token_task)
+            thread.daemon = True
+            thread.start()
+        
+        ttk.Button(token_frame, text="查询余额", command=query_tokens).grid(row=0, column=1, padx=5, pady=2, sticky="n")
+        ttk.Button(token_frame, text="导出结果", command=self.export_token_matrix).grid(row=1, column=1, padx=5, pady=2, sticky="n")
+        
+        if self.token_matrix is not None:
+            show_matrix(self.token_matrix)
+    
+    def export_token_matrix(self):
+        """导出代币余额矩阵为CSV（逐行写出，不在内存中构造完整表格）"""
+        matrix = self.token_matrix
+        if matrix is None or not matrix.tokens:
+            messagebox.showinfo("提示", "没有代币余额结果可导出")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")]
+        )
+        
+        if not file_path:
+            return
+        
+        def export_task():
+            try:
+                with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['钱包地址'] + [
+                        f"{symbol} ({token})" for symbol, token in zip(matrix.symbols, matrix.tokens)
+                    ])
+                    for addr, values in matrix.iter_rows():
+                        writer.writerow([addr] + values)
+                self.log(f"代币余额已导出至: {file_path}")
+            except Exception as e:
+                self.log(f"导出失败: {str(e)}")
+        
+        thread = threading.Thread(target=export_task)
+        thread.daemon = True
+        thread.start()
+    
     def clear_log(self):
-        """清除日志区域"""
-        self.stop_progress_indicator()  # 确保停止任何进度指示器
+        """清除日志区域（日志文件不受影响）"""
+        self.log_buffer.clear()
+        self.log_line_count = 0
         self.log_text.config(state=tk.NORMAL)
         self.log_text.delete("1.0", tk.END)
         self.log_text.config(state=tk.DISABLED)
     
-    def save_wallets(self):
-        """保存钱包列表到文件"""
+    def load_wallets(self):
+        """从钱包数据库加载钱包列表和上次的查询结果"""
         try:
-            with open(self.wallets_file, 'w') as f:
-                json.dump(self.wallets, f)
-            self.log(f"钱包列表已保存至: {self.wallets_file}")
+            self.wallet_store = WalletStore(self.wallets_db)
+            imported = self.wallet_store.import_legacy(self.wallets_file, self.results_file)
+            if imported:
+                self.log(f"已从 {self.wallets_file} 导入 {imported} 个钱包地址")
         except Exception as e:
-            self.log(f"保存钱包列表失败: {str(e)}")
-            # 尝试创建目录并重试一次
-            try:
-                os.makedirs(os.path.dirname(self.wallets_file), exist_ok=True)
-                with open(self.wallets_file, 'w') as f:
-                    json.dump(self.wallets, f)
-                self.log(f"重试保存成功: {self.wallets_file}")
-            except Exception as e2:
-                self.log(f"重试保存仍然失败: {str(e2)}")
+            self.log(f"加载钱包列表失败: {str(e)}")
+            # 如果加载失败，使用内存数据库，确保钱包列表为空
+            self.wallet_store = WalletStore(":memory:")
+        self.wallets = self.wallet_store.addresses
+        
+        if self.wallets:
+            self.restore_results()
+            self.update_result_table()
+            self.log(f"已加载 {len(self.wallets)} 个保存的钱包地址")
+            block = self.result_cache.oldest_block(self.wallets, 'balance')
+            if block is not None:
+                self.log(f"已恢复上次查询结果 (区块 {block})，点击一键查询刷新")
+        else:
+            self.log("没有找到保存的钱包列表")
+
+    def restore_results(self):
+        """从钱包数据库恢复上次的查询结果，以过期样式显示，直到重新查询"""
+        try:
+            self.result_cache.set_chain(self.wallet_store.chain_id)
+            for field in ('balance', 'transactions'):
+                for block, values in self.wallet_store.results(field).items():
+                    self.result_cache.update(field, values, block)
+        except Exception as e:
+            self.log(f"恢复上次查询结果失败: {str(e)}")
     
-    def load_wallets(self):
-        """从文件加载钱包列表"""
+    def save_tokens(self):
+        """保存代币地址列表到文件"""
         try:
-            if os.path.exists(self.wallets_file):
-                with open(self.wallets_file, 'r') as f:
-                    self.wallets = json.load(f)
-                self.update_result_table()
-                self.log(f"已加载 {len(self.wallets)} 个保存的钱包地址")
-            else:
-                self.log("没有找到保存的钱包列表")
+            with open(self.tokens_file, 'w') as f:
+                json.dump(self.tokens, f)
         except Exception as e:
-            self.log(f"加载钱包列表失败: {str(e)}")
-            # 如果加载失败，确保钱包列表为空
-            self.wallets = []
+            self.log(f"保存代币列表失败: {str(e)}")
+    
+    def load_tokens(self):
+        """从文件加载代币地址列表"""
+        try:
+            if os.path.exists(self.tokens_file):
+                with open(self.tokens_file, 'r') as f:
+                    self.tokens = json.load(f)
+        except Exception as e:
+            self.log(f"加载代币列表失败: {str(e)}")
+            self.tokens = []
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Monad钱包查询工具")
+    # --profile-startup: 只测量启动耗时（不连接RPC），窗口绘制后立即退出
+    parser.add_argument("--profile-startup", action="store_true", help="输出启动耗时后退出")
+    parser.add_argument("--log-file", default=None, metavar="PATH", help="同时将日志追加写入该文件")
+    parser.add_argument("--log-lines", type=int, default=DEFAULT_MAX_LINES, help=f"日志区域保留的行数（默认{DEFAULT_MAX_LINES}）")
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = MonadWalletTool(root)
+    app = MonadWalletTool(root, profile_startup=args.profile_startup, log_file=args.log_file, log_max_lines=args.log_lines)
     root.mainloop() 
\ No newline at end of file
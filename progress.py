@@ -0,0 +1,62 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+def format_duration(seconds: float) -> str:
+    """将秒数格式化为 "1小时02分" / "3分05秒" / "12秒" """
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}小时{seconds % 3600 // 60:02d}分"
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60:02d}秒"
+    return f"{seconds}秒"
+
+
+class ProgressTracker:
+    """
+    批量任务的进度统计：已完成/总数、速率和预计剩余时间
+
+    advance可在任意线程调用；速率按开始以来的平均值计算，不随单个批次抖动。
+    """
+
+    def __init__(self, total: int, clock: Callable[[], float] = time.monotonic):
+        self.total = total
+        self.done = 0
+        self._clock = clock
+        self._start = clock()
+        self._lock = threading.Lock()
+
+    def advance(self, count: int = 1) -> int:
+        """记录完成count项，返回已完成总数"""
+        with self._lock:
+            self.done += count
+            return self.done
+
+    @property
+    def elapsed(self) -> float:
+        return self._clock() - self._start
+
+    @property
+    def rate(self) -> float:
+        """每秒完成的项数"""
+        return self.done / max(self.elapsed, 1e-6)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """预计剩余秒数，尚无完成项时为None"""
+        if self.done <= 0:
+            return None
+        return max(0, self.total - self.done) / self.rate
+
+    @property
+    def finished(self) -> bool:
+        return self.done >= self.total
+
+    def format(self, unit: str = "个") -> str:
+        """例如 "已完成 1200/5000 个，850 个/秒，预计剩余 5秒" """
+        text = f"已完成 {self.done}/{self.total} {unit}，{self.rate:.0f} {unit}/秒"
+        eta = self.eta
+        if eta is not None and not self.finished:
+            text += f"，预计剩余 {format_duration(eta)}"
+        return text
@@ -0,0 +1,202 @@
+import asyncio
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# 限速器默认参数（每个RPC节点独立）
+DEFAULT_RATE = 10.0       # 初始每秒请求数
+DEFAULT_MIN_RATE = 0.5    # 被限流后最低降到的速率
+DEFAULT_MAX_RATE = 200.0  # 速率上限
+DEFAULT_BURST = 10.0      # 令牌桶容量
+# 两次减速之间的最小间隔（秒），避免并发请求同时收到429时速率被连续减半
+DECREASE_INTERVAL = 1.0
+
+# 重试参数
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5   # 首次重试的基准等待（秒）
+BACKOFF_CAP = 30.0   # 单次等待上限（秒）
+
+# 表示限流的JSON-RPC错误码（-32005: limit exceeded）
+_RATE_LIMIT_CODES = {429, -32005}
+_RATE_LIMIT_MESSAGES = ("rate limit", "too many requests", "limit exceeded", "request limit")
+# eth_getLogs结果过多/区块范围过大的错误（部分节点同样使用-32005），需缩小范围而非重试
+_LOG_RANGE_MESSAGES = (
+    "more than", "too many results", "block range", "range is too", "range too",
+    "response size", "too large", "query timeout", "exceed maximum"
+)
+
+
+class RateLimitError(Exception):
+    """节点返回429或限流错误"""
+
+    def __init__(self, message: str = "请求过于频繁", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.code = 429
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After头（秒数或HTTP日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def is_log_range_error(error: Exception) -> bool:
+    """判断eth_getLogs错误是否因为查询范围过大"""
+    if isinstance(error, RateLimitError):
+        return False
+    message = str(error).lower()
+    return any(text in message for text in _LOG_RANGE_MESSAGES)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """判断错误是否为限流"""
+    if isinstance(error, RateLimitError):
+        return True
+    if is_log_range_error(error):
+        return False
+    # aiohttp的响应错误用status表示HTTP状态码（其code属性已弃用）
+    code = getattr(error, "status", None)
+    if code is None:
+        code = getattr(error, "code", None)
+    if code in _RATE_LIMIT_CODES:
+        return True
+    message = str(error).lower()
+    return any(text in message for text in _RATE_LIMIT_MESSAGES)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    判断错误是否为可重试的临时错误
+
+    只包括限流（429）、连接错误、超时和5xx响应；其余HTTP 4xx（400/404/413等）、
+    响应不是有效JSON、合约执行失败、参数错误等重试也不会成功，不重试。
+    """
+    if is_rate_limited(error):
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "status", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    if isinstance(status, int) and (status == 429 or status >= 500):
+        return True
+    # requests和aiohttp的连接/超时错误不是内置ConnectionError的子类；未导入时不可能出现
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    aiohttp = sys.modules.get("aiohttp")
+    if aiohttp is not None and isinstance(error, aiohttp.ClientConnectionError):
+        return True
+    return False
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """第attempt次重试前的等待时间：带完全抖动的指数退避"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应令牌桶限速器
+
+    成功时按AIMD加性增加速率（每成功约一个速率窗口的请求 +1 次/秒），
+    遇到429时速率减半，并在Retry-After期间暂停发放令牌。
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        min_rate: float = DEFAULT_MIN_RATE,
+        max_rate: float = DEFAULT_MAX_RATE,
+        burst: float = DEFAULT_BURST
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """预定一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        """阻塞直到可以发送下一个请求"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire 的异步版本，等待期间被取消时归还令牌"""
+        wait = self._reserve()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+
+    def release(self):
+        """归还一个已预定但没有用来发送请求的令牌"""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1.0 / max(self.rate, 1.0))
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now - self.last_decrease >= DECREASE_INTERVAL:
+                self.rate = max(self.min_rate, self.rate * 0.5)
+                self.last_decrease = now
+            # 清空已积累的令牌，避免限流后立即突发
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def report(self, error: Optional[Exception]):
+        """根据请求结果调整速率，error为None表示成功"""
+        if error is None:
+            self.on_success()
+        elif is_rate_limited(error):
+            self.on_throttle(getattr(error, "retry_after", None))
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(url: str) -> AdaptiveRateLimiter:
+    """获取某个RPC节点的限速器（同一URL共享一个）"""
+    with _limiters_lock:
+        limiter = _limiters.get(url)
+        if limiter is None:
+            limiter = _limiters[url] = AdaptiveRateLimiter()
+        return limiter
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+# 默认最多缓存的地址数，超出时淘汰最久未使用的地址
+DEFAULT_MAX_ADDRESSES = 100000
+
+
+def is_error_value(value: Any) -> bool:
+    """查询结果是否为错误信息（错误不缓存）"""
+    return isinstance(value, str) and value.startswith("错误")
+
+
+class ResultCache:
+    """
+    按区块号标记的钱包查询结果缓存
+
+    每个 (地址, 字段) 保存最近一次成功查询的值及其查询时的区块号。
+    链上最新区块未变化时缓存结果可直接使用；区块前进后缓存结果视为过期，
+    仍可先显示、再在后台刷新。区块号只在同一条链上可比，切换到另一条链时清空缓存。
+    缓存只在内存中，结果的持久化由WalletStore负责。
+    地址数超过max_addresses时淘汰最久未读写的地址，长期运行的服务内存不再随查询过的地址增长。
+    """
+
+    def __init__(self, max_addresses: Optional[int] = DEFAULT_MAX_ADDRESSES):
+        """
+        Args:
+            max_addresses: 最多缓存的地址数，None表示不限
+        """
+        self.chain_id = None  # 缓存结果所属的链，None表示未知
+        self.max_addresses = max_addresses
+        self._entries = OrderedDict()  # {地址: {字段: [值, 区块号]}}，按最近读写排序
+        self._lock = threading.Lock()
+
+    def _switch_chain(self, chain_id: Optional[int]) -> bool:
+        if chain_id == self.chain_id:
+            return False
+        self.chain_id = chain_id
+        self._entries = OrderedDict()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set_chain(self, chain_id: Optional[int]) -> bool:
+        """切换到链chain_id：与缓存结果所属的链不同时清空缓存，返回是否清空"""
+        with self._lock:
+            return self._switch_chain(chain_id)
+
+    def get(self, address: str, field: str) -> Optional[Tuple[Any, int]]:
+        """返回 (值, 区块号)，没有缓存时返回None"""
+        with self._lock:
+            fields = self._entries.get(address)
+            if fields is None:
+                return None
+            self._entries.move_to_end(address)
+            entry = fields.get(field)
+            return tuple(entry) if entry else None
+
+    def update(self, field: str, values: Dict[str, Any], block_number: int, chain_id: Optional[int] = None):
+        """
+        记录一批查询结果，错误信息和比已有缓存更旧的结果被忽略
+
+        Args:
+            field: 字段名
+            values: {地址: 值}
+            block_number: 查询时的区块号
+            chain_id: 结果所属的链，与缓存的链不同时先清空缓存；None表示沿用当前的链
+        """
+        with self._lock:
+            if chain_id is not None:
+                self._switch_chain(chain_id)
+            for addr, value in values.items():
+                if is_error_value(value):
+                    continue
+                fields = self._entries.setdefault(addr, {})
+                self._entries.move_to_end(addr)
+                entry = fields.get(field)
+                if entry is None or entry[1] <= block_number:
+                    fields[field] = [value, block_number]
+            if self.max_addresses is not None:
+                while len(self._entries) > self.max_addresses:
+                    self._entries.popitem(last=False)
+
+    def values(self, addresses: Iterable[str], field: str) -> Dict[str, Any]:
+        """取出缓存中的值 {地址: 值}，没有缓存的地址不在结果中"""
+        with self._lock:
+            results = {}
+            for addr in addresses:
+                entry = self._entries.get(addr, {}).get(field)
+                if entry:
+                    results[addr] = entry[0]
+            return results
+
+    def is_fresh(self, addresses: Iterable[str], fields: Iterable[str], block_number: int) -> bool:
+        """所有地址的所有字段是否都已在该区块查询过"""
+        fields = list(fields)
+        with self._lock:
+            for addr in addresses:
+                cached = self._entries.get(addr)
+                if cached is None:
+                    return False
+                for field in fields:
+                    entry = cached.get(field)
+                    if entry is None or entry[1] < block_number:
+                        return False
+            return True
+
+    def oldest_block(self, addresses: Iterable[str], field: str) -> Optional[int]:
+        """这些地址中缓存最旧的区块号"""
+        with self._lock:
+            blocks = [
+                self._entries[addr][field][1] for addr in addresses
+                if field in self._entries.get(addr, {})
+            ]
+            return min(blocks) if blocks else None
+
+    def discard(self, addresses: Iterable[str]):
+        """删除地址的缓存结果"""
+        with self._lock:
+            for addr in addresses:
+                self._entries.pop(addr, None)
@@ -0,0 +1,196 @@
+import math
+import operator
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# 可排序/筛选的列
+COLUMNS = ("index", "address", "label", "group", "balance", "transactions")
+
+# 筛选运算符
+FILTER_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "=": operator.eq,
+}
+
+_UNKNOWN_BALANCE = math.nan
+_UNKNOWN_TX_COUNT = -1
+# 过期标记的位：余额和交易数分别标记
+_STALE_BALANCE = 1
+_STALE_TX_COUNT = 2
+
+
+class ResultTable:
+    """
+    查询结果表的紧凑存储
+
+    每个钱包一行：余额存为array('d')中的浮点数，交易数存为array('q')中的整数，
+    过期标记按字段存在bytearray中；只有错误信息等非数值结果、非空的标签和分组才单独保存文本。
+    排序和筛选只重排一个行号数组（view），不复制行数据，界面按view分页显示。
+    """
+
+    def __init__(self, addresses: Optional[List[str]] = None):
+        self.sort_column = None
+        self.sort_descending = False
+        self.filter_rule = None  # (列, 运算符, 值)
+        self.reset(addresses or [])
+
+    def reset(
+        self,
+        addresses: List[str],
+        labels: Optional[Dict[str, str]] = None,
+        groups: Optional[Dict[str, str]] = None
+    ):
+        """用新的地址列表（及 {地址: 标签/分组}）重建表格，所有结果清空，保留排序和筛选条件"""
+        self.addresses = list(addresses)
+        self._index = {addr: row for row, addr in enumerate(self.addresses)}
+        self._labels = {self._index[addr]: text for addr, text in (labels or {}).items() if addr in self._index}
+        self._groups = {self._index[addr]: text for addr, text in (groups or {}).items() if addr in self._index}
+        count = len(self.addresses)
+        self._balances = array('d', [_UNKNOWN_BALANCE]) * count
+        self._tx_counts = array('q', [_UNKNOWN_TX_COUNT]) * count
+        self._stale = bytearray(count)
+        self._balance_text: Dict[int, str] = {}  # 非数值的余额结果（错误信息、无效地址）
+        self._tx_text: Dict[int, str] = {}
+        self.apply_view()
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def row_of(self, address: str) -> Optional[int]:
+        return self._index.get(address)
+
+    def update(
+        self,
+        address: str,
+        balance: Union[str, float, None] = None,
+        tx_count: Union[str, int, None] = None,
+        stale: bool = False
+    ) -> bool:
+        """
+        更新地址的余额和交易数（None表示保留原值）
+
+        stale只作用于本次更新的字段：只刷新余额时交易数的过期标记保持不变。
+        不改变当前排序和筛选的顺序，下次调用apply_view时生效。
+
+        Returns:
+            地址是否在表中
+        """
+        row = self._index.get(address)
+        if row is None:
+            return False
+        flags = self._stale[row]
+        if balance is not None:
+            flags = flags | _STALE_BALANCE if stale else flags & ~_STALE_BALANCE
+            try:
+                self._balances[row] = float(balance)
+                self._balance_text.pop(row, None)
+            except (TypeError, ValueError):
+                self._balances[row] = _UNKNOWN_BALANCE
+                self._balance_text[row] = str(balance)
+        if tx_count is not None:
+            flags = flags | _STALE_TX_COUNT if stale else flags & ~_STALE_TX_COUNT
+            if isinstance(tx_count, int):
+                self._tx_counts[row] = tx_count
+                self._tx_text.pop(row, None)
+            else:
+                self._tx_counts[row] = _UNKNOWN_TX_COUNT
+                self._tx_text[row] = str(tx_count)
+        self._stale[row] = flags
+        return True
+
+    def balance(self, row: int) -> Optional[float]:
+        value = self._balances[row]
+        return None if math.isnan(value) else value
+
+    def tx_count(self, row: int) -> Optional[int]:
+        value = self._tx_counts[row]
+        return None if value < 0 else value
+
+    def is_stale(self, row: int) -> bool:
+        """余额或交易数中有任一是过期结果"""
+        return bool(self._stale[row])
+
+    def row_values(self, row: int) -> Tuple[int, str, str, str, str, Union[int, str]]:
+        """(序号, 地址, 标签, 分组, 余额文本, 交易数) 用于显示和导出"""
+        balance = self._balances[row]
+        if math.isnan(balance):
+            balance_text = self._balance_text.get(row, '-')
+        else:
+            balance_text = "{:.5f}".format(balance)
+        tx_count = self._tx_counts[row]
+        return (
+            row + 1,
+            self.addresses[row],
+            self._labels.get(row, ''),
+            self._groups.get(row, ''),
+            balance_text,
+            self._tx_text.get(row, '-') if tx_count < 0 else tx_count
+        )
+
+    # ---- 排序和筛选 ----
+
+    def _numeric(self, column: str):
+        if column == "balance":
+            return self._balances, lambda value: not math.isnan(value)
+        if column == "transactions":
+            return self._tx_counts, lambda value: value >= 0
+        raise ValueError(f"列 {column} 不支持数值比较")
+
+    def sort(self, column: Optional[str], descending: bool = False):
+        """按列排序（None恢复原始顺序）；没有结果的行总是排在最后"""
+        if column is not None and column not in COLUMNS:
+            raise ValueError(f"未知的列: {column}")
+        self.sort_column = column
+        self.sort_descending = descending
+        self.apply_view()
+
+    def filter(self, column: Optional[str], op: str = ">", value: float = 0):
+        """只显示数值满足 列 运算符 值 的行（column为None时取消筛选）"""
+        if column is None:
+            self.filter_rule = None
+        else:
+            self._numeric(column)
+            if op not in FILTER_OPERATORS:
+                raise ValueError(f"未知的运算符: {op}")
+            self.filter_rule = (column, op, value)
+        self.apply_view()
+
+    def apply_view(self):
+        """按当前的筛选和排序条件重建显示顺序"""
+        rows = range(len(self.addresses))
+        if self.filter_rule is not None:
+            column, op, value = self.filter_rule
+            data, known = self._numeric(column)
+            compare = FILTER_OPERATORS[op]
+            rows = [row for row in rows if known(data[row]) and compare(data[row], value)]
+
+        column = self.sort_column
+        if column in ("balance", "transactions"):
+            data, known = self._numeric(column)
+            ordered = sorted((row for row in rows if known(data[row])),
+                             key=data.__getitem__, reverse=self.sort_descending)
+            ordered.extend(row for row in rows if not known(data[row]))
+            rows = ordered
+        elif column == "address":
+            rows = sorted(rows, key=lambda row: self.addresses[row].lower(), reverse=self.sort_descending)
+        elif column in ("label", "group"):
+            texts = self._labels if column == "label" else self._groups
+            # 没有标签/分组的行排在最后
+            ordered = sorted((row for row in rows if row in texts), key=texts.__getitem__, reverse=self.sort_descending)
+            ordered.extend(row for row in rows if row not in texts)
+            rows = ordered
+        elif column == "index" and self.sort_descending:
+            rows = reversed(rows)
+        self.view = array('l', rows)
+
+    def view_rows(self, start: int, count: int) -> List[int]:
+        """显示顺序中第start起的count个行号"""
+        return self.view[start:start + count].tolist()
+
+    def iter_view(self) -> Iterator[Tuple[int, str, str, str, str, Union[int, str]]]:
+        """按显示顺序逐行产出 row_values"""
+        for row in self.view:
+            yield self.row_values(row)
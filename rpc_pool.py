@@ -0,0 +1,554 @@
+import heapq
+import itertools
+import random
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+
+from wallet_utils import RPCError, encode_batch, parse_batch_response, _http_session
+from chain_cache import get_chain_cache
+from single_flight import get_single_flight, request_scope
+from rate_limit import RateLimitError, get_limiter, parse_retry_after, is_log_range_error, is_rate_limited
+
+# 延迟与错误率的滑动平均系数
+EWMA_ALPHA = 0.2
+# 连续失败多少次后暂时剔除节点
+EJECT_AFTER_FAILURES = 3
+# 剔除冷却时间（秒），每次再次被剔除时翻倍
+EJECT_BASE_SECONDS = 10.0
+EJECT_MAX_SECONDS = 300.0
+
+# 对冲请求：只读调用超过近期延迟的该分位数仍未返回时，向另一个节点再发一份
+DEFAULT_HEDGE_PERCENTILE = 0.95
+# 对冲请求最多占全部请求的比例
+DEFAULT_HEDGE_BUDGET = 0.1
+# 延迟样本数不足时不对冲
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+LATENCY_SAMPLES = 200
+HEDGE_WORKERS = 32
+# 可以对冲的只读方法
+HEDGE_METHODS = frozenset({"eth_getBalance", "eth_getTransactionCount", "eth_call", "eth_getLogs"})
+# 请求本身有误的错误码（合约执行失败、方法不存在、参数错误），与节点健康无关
+_REQUEST_ERROR_CODES = frozenset({3, -32601, -32602})
+
+
+def _node_error(data: Any) -> Optional[RPCError]:
+    """
+    HTTP 200响应体中属于节点故障的第一个JSON-RPC错误（限流、内部错误等），没有则返回None
+
+    查询范围过大、合约执行失败、方法或参数错误是请求本身的问题，不计为节点故障。
+    """
+    for item in data if isinstance(data, list) else [data]:
+        error = item.get("error") if isinstance(item, dict) else None
+        if not error:
+            continue
+        if not isinstance(error, dict):
+            error = {"message": str(error)}
+        rpc_error = RPCError(error.get("message", str(error)), error.get("code"))
+        if _is_node_failure(rpc_error):
+            return rpc_error
+    return None
+
+
+def _is_node_failure(error: RPCError) -> bool:
+    """JSON-RPC错误是否属于节点故障（而不是查询范围、合约执行、方法或参数等请求本身的问题）"""
+    if is_log_range_error(error):
+        return False
+    return error.code not in _REQUEST_ERROR_CODES and "revert" not in str(error).lower()
+
+
+class AttemptAborted(Exception):
+    """对冲请求的另一份已经先返回，本请求被中止"""
+
+
+class _Attempt:
+    """
+    一次可中止的HTTP请求
+
+    发送请求的线程在等待响应期间登记所用的连接；另一个线程调用abort()时关闭该连接的socket，
+    阻塞中的请求立即失败，连接被丢弃而不是放回连接池。
+    """
+
+    def __init__(self):
+        self.aborted = False
+        self.connection = None
+
+
+# 所有_Attempt的连接登记共用一个锁：登记、解除登记和abort()互斥，
+# 保证被关闭的socket一定还属于该请求
+_attempt_lock = threading.Lock()
+_attempt_local = threading.local()
+
+
+class _AbortableMixin:
+    """在请求发出到收到响应头之间，把连接登记到当前线程的_Attempt"""
+
+    def request(self, *args, **kwargs):
+        attempt = getattr(_attempt_local, "attempt", None)
+        if attempt is not None:
+            with _attempt_lock:
+                if attempt.aborted:
+                    raise AttemptAborted()
+                attempt.connection = self
+        return super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            attempt = getattr(_attempt_local, "attempt", None)
+            if attempt is not None:
+                with _attempt_lock:
+                    if attempt.connection is self:
+                        attempt.connection = None
+
+
+class _AbortableHTTPConnection(_AbortableMixin, HTTPConnection):
+    pass
+
+
+class _AbortableHTTPSConnection(_AbortableMixin, HTTPSConnection):
+    pass
+
+
+class _AbortableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _AbortableHTTPConnection
+
+
+class _AbortableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _AbortableHTTPSConnection
+
+
+class _AbortableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _AbortableHTTPConnectionPool,
+            "https": _AbortableHTTPSConnectionPool,
+        }
+
+
+def _abort(attempt: _Attempt):
+    """中止请求：尚未发出的不再发送，正在等待响应的关闭其socket"""
+    with _attempt_lock:
+        attempt.aborted = True
+        connection = attempt.connection
+        if connection is not None and connection.sock is not None:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+# 对冲请求使用的会话，落败的请求可以被中止
+_hedge_session = requests.Session()
+_hedge_session.mount("http://", _AbortableAdapter())
+_hedge_session.mount("https://", _AbortableAdapter())
+
+
+class _HedgeTimer:
+    """在一个后台线程中按到期时间执行回调，不为每个请求单独创建定时线程"""
+
+    def __init__(self):
+        self._heap = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay: float, callback: Callable[[], None]):
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._order), callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                deadline, _, callback = self._heap[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+            callback()
+
+
+class _HedgedCall:
+    """一次对冲发送的状态：主请求、可能的对冲副本和先成功的结果"""
+
+    def __init__(self, payload: Any, primary: "RPCEndpoint"):
+        self.payload = payload
+        self.primary = primary
+        self.attempts = {primary: _Attempt()}
+        self.hedge_state = "waiting"  # waiting: 尚未到对冲时间; sent: 已发送副本; closed: 不再发送
+        self.winner = None
+        self.result = None
+        self.last_error = None
+        self.finished = threading.Event()  # 有结果或对冲副本已结束
+        self.lock = threading.Lock()
+
+    def succeed(self, endpoint: "RPCEndpoint", data: Any) -> bool:
+        """记录成功的结果并中止其余请求，已有结果时返回False"""
+        with self.lock:
+            if self.winner is not None:
+                return False
+            self.winner, self.result = endpoint, data
+            self.hedge_state = "closed"
+            losers = [attempt for other, attempt in self.attempts.items() if other is not endpoint]
+        for attempt in losers:
+            _abort(attempt)
+        self.finished.set()
+        return True
+
+
+class RPCEndpoint:
+    """单个RPC节点及其健康状态"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency = None  # 滑动平均延迟（秒）
+        self.error_rate = 0.0  # 滑动平均错误率
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.eject_seconds = EJECT_BASE_SECONDS
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def score(self) -> float:
+        """越小越健康；未测量过的节点按较低延迟对待，以便尽快获得样本"""
+        latency = self.latency if self.latency is not None else 0.05
+        return latency * (1.0 + 4.0 * self.error_rate)
+
+    def record_success(self, elapsed: float):
+        self.requests += 1
+        self.latency = elapsed if self.latency is None else (
+            EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+        )
+        self.error_rate *= (1 - EWMA_ALPHA)
+        self.consecutive_failures = 0
+        # 恢复后重置冷却时间
+        self.eject_seconds = EJECT_BASE_SECONDS
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_rate
+        if self.latency is None:
+            # 从未成功过的节点按慢节点对待
+            self.latency = 1.0
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= EJECT_AFTER_FAILURES:
+            self.ejected_until = time.monotonic() + self.eject_seconds
+            self.eject_seconds = min(self.eject_seconds * 2, EJECT_MAX_SECONDS)
+            # 冷却结束后只给一次试探机会，再失败立即剔除
+            self.consecutive_failures = EJECT_AFTER_FAILURES - 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "available": self.available,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class RPCPool(JSONBaseProvider):
+    """
+    多节点RPC连接池
+
+    作为web3的provider使用（Web3(pool)），也可以直接传给wallet_utils中的函数。
+    每个请求按节点的滑动延迟和错误率加权选择节点，失败时自动切换到下一个节点；
+    连续失败的节点被暂时剔除，冷却后重新接纳。
+
+    开启hedge后，只读调用超过近期延迟分位数仍未返回时向另一个节点发送副本，
+    先返回的结果胜出；副本数量受hedge_budget（占全部请求的比例）限制。
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        timeout: float = 30.0,
+        hedge: bool = False,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        hedge_budget: float = DEFAULT_HEDGE_BUDGET
+    ):
+        super().__init__()
+        urls = [url.strip() for url in urls if url and url.strip()]
+        if not urls:
+            raise ValueError("至少需要一个RPC URL")
+        self.endpoints = [RPCEndpoint(url) for url in urls]
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.requests = 0  # 经过连接池的逻辑请求数（不含对冲副本）
+        self.hedged = 0    # 发出的对冲副本数
+        self.hedge_wins = 0  # 对冲副本先返回的次数
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._executor = None  # 只用于发送对冲副本
+        self._hedge_timer = None
+        self._lock = threading.Lock()
+        self._web3 = None
+
+    def __str__(self):
+        return f"RPCPool({', '.join(endpoint.url for endpoint in self.endpoints)})"
+
+    @property
+    def endpoint_uri(self) -> str:
+        """当前最健康的节点URL（兼容只接受单个URL的代码）"""
+        return self.choose().url
+
+    def as_web3(self) -> Web3:
+        """返回以本连接池为provider的Web3对象"""
+        if self._web3 is None:
+            self._web3 = Web3(self)
+        return self._web3
+
+    def choose(self, exclude: Optional[List[RPCEndpoint]] = None) -> RPCEndpoint:
+        """
+        按健康度选择一个节点
+
+        在可用节点中按 1/score 加权随机选择，使批量请求分散到多个节点，
+        同时让延迟低、错误少的节点承担更多流量。
+        """
+        exclude = exclude or []
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude and e.available]
+            if not candidates:
+                # 全部被剔除时，选择最早结束冷却的节点
+                remaining = [e for e in self.endpoints if e not in exclude] or self.endpoints
+                return min(remaining, key=lambda e: e.ejected_until)
+            weights = [1.0 / max(e.score(), 1e-4) for e in candidates]
+            return random.choices(candidates, weights=weights)[0]
+
+    def record(self, endpoint: RPCEndpoint, elapsed: Optional[float]):
+        """记录一次请求结果，elapsed为None表示失败"""
+        with self._lock:
+            if elapsed is None:
+                endpoint.record_failure()
+            else:
+                endpoint.record_success(elapsed)
+                self._latencies.append(elapsed)
+
+    # ---- 对冲请求 ----
+
+    def is_hedgeable(self, calls: List[Tuple[str, Any]]) -> bool:
+        """已开启对冲、有多个节点，且全部调用都是只读方法"""
+        return (
+            self.hedge and len(self.endpoints) > 1
+            and all(method in HEDGE_METHODS for method, _ in calls)
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """发送对冲副本前的等待时间：近期成功请求延迟的分位数，样本不足时为None"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile))
+        return max(HEDGE_MIN_DELAY, samples[index])
+
+    def note_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def take_hedge(self) -> bool:
+        """在预算内占用一次对冲名额"""
+        with self._lock:
+            if self.hedged + 1 > self.hedge_budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def note_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def hedge_stats(self) -> Dict[str, Any]:
+        """对冲请求统计"""
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            }
+
+    def _post_to(self, endpoint: RPCEndpoint, payload: Any, attempt: Optional[_Attempt] = None) -> Any:
+        """
+        向指定节点发送一次请求并记录节点健康状态
+
+        响应体中的JSON-RPC错误（限流、内部错误等）同样计为失败并反馈给限速器；
+        单个请求被限流时抛出RateLimitError，以便切换到其他节点。
+        指定attempt时请求可以被中止，中止时抛出AttemptAborted，不计入节点健康统计。
+        """
+        limiter = get_limiter(endpoint.url)
+        limiter.acquire()
+        if attempt is not None and attempt.aborted:
+            # 等待令牌期间另一份请求已经返回，令牌留给其他请求
+            limiter.release()
+            raise AttemptAborted()
+        start = time.monotonic()
+        _attempt_local.attempt = attempt
+        try:
+            session = _http_session if attempt is None else _hedge_session
+            response = session.post(endpoint.url, json=payload, timeout=self.timeout)
+            if response.status_code == 429:
+                raise RateLimitError(retry_after=parse_retry_after(response.headers.get("Retry-After")))
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError, RateLimitError, AttemptAborted) as e:
+            if attempt is not None and attempt.aborted:
+                raise AttemptAborted() from e
+            limiter.report(e)
+            self.record(endpoint, None)
+            raise
+        finally:
+            _attempt_local.attempt = None
+        error = _node_error(data)
+        if error is not None:
+            limiter.report(error)
+            self.record(endpoint, None)
+            if isinstance(data, dict) and is_rate_limited(error):
+                raise RateLimitError(str(error))
+            return data
+        limiter.report(None)
+        self.record(endpoint, time.monotonic() - start)
+        return data
+
+    def _post(
+        self,
+        payload: Any,
+        exclude: Optional[List[RPCEndpoint]] = None,
+        last_error: Optional[Exception] = None
+    ) -> Any:
+        """发送请求，节点故障时依次切换到其他节点（跳过exclude中已经失败的节点）"""
+        tried = list(exclude or [])
+        for _ in range(len(self.endpoints) - len(tried)):
+            endpoint = self.choose(exclude=tried)
+            tried.append(endpoint)
+            try:
+                return self._post_to(endpoint, payload)
+            except (requests.RequestException, ValueError, RateLimitError) as e:
+                # 限流的节点同样切换到其他节点
+                last_error = e
+        if isinstance(last_error, RateLimitError):
+            raise last_error
+        raise ConnectionError(f"所有RPC节点均请求失败: {last_error}")
+
+    def _post_hedged(self, payload: Any) -> Any:
+        """
+        对冲发送：主请求超过对冲延迟仍未返回时，向另一个节点发送副本，先成功的结果胜出
+
+        主请求在调用线程中发送；只有到了对冲时间才向线程池提交副本。
+        先返回的结果胜出后，另一个请求被中止（关闭其连接，尚未发出的不再发送）。
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._post(payload)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS)
+                self._hedge_timer = _HedgeTimer()
+
+        call = _HedgedCall(payload, self.choose())
+        self._hedge_timer.schedule(delay, lambda: self._start_hedge(call))
+        self._attempt_hedged(call, call.primary)
+
+        with call.lock:
+            if call.winner is None and call.hedge_state == "waiting":
+                # 主请求在对冲时间之前就失败了，不再发送副本
+                call.hedge_state = "closed"
+                call.finished.set()
+        call.finished.wait()
+        if call.winner is not None:
+            if call.winner is not call.primary:
+                self.note_hedge_win()
+            return call.result
+        # 已发送的都失败了，继续切换到其余节点
+        return self._post(payload, exclude=list(call.attempts), last_error=call.last_error)
+
+    def _start_hedge(self, call: _HedgedCall):
+        """对冲时间已到（在计时线程中调用）：主请求仍未返回且预算允许时发送副本"""
+        with call.lock:
+            if call.hedge_state != "waiting":
+                return
+            secondary = self.choose(exclude=[call.primary])
+            if secondary is call.primary or not self.take_hedge():
+                call.hedge_state = "closed"
+                return
+            call.hedge_state = "sent"
+            call.attempts[secondary] = _Attempt()
+        self._executor.submit(self._run_hedge, call, secondary)
+
+    def _run_hedge(self, call: _HedgedCall, endpoint: RPCEndpoint):
+        try:
+            self._attempt_hedged(call, endpoint)
+        finally:
+            call.finished.set()
+
+    def _attempt_hedged(self, call: _HedgedCall, endpoint: RPCEndpoint):
+        """发送对冲发送中的一份请求，成功时记为结果（除非另一份已经胜出）"""
+        try:
+            data = self._post_to(endpoint, call.payload, call.attempts[endpoint])
+        except AttemptAborted:
+            return
+        except (requests.RequestException, ValueError, RateLimitError) as e:
+            call.last_error = e
+            return
+        call.succeed(endpoint, data)
+
+    def _send(self, calls: List[Tuple[str, Any]], payload: Any) -> Any:
+        self.note_request()
+        if self.is_hedgeable(calls):
+            return self._post_hedged(payload)
+        return self._post(payload)
+
+    def make_request(self, method, params) -> Dict[str, Any]:
+        """web3 provider接口：发送单个JSON-RPC请求（已启用链上数据缓存时先查缓存）"""
+        cache = get_chain_cache()
+        if cache is not None:
+            cache.ensure_context(self.send_batch, self)
+            hit, value = cache.get(method, params, self)
+            if hit:
+                return {"jsonrpc": "2.0", "id": 0, "result": value}
+        
+        # 相同的调用正在发送时共享其结果
+        response = get_single_flight().do(
+            method, params, lambda: self._send([(method, params)], encode_batch([(method, params)])[0]),
+            request_scope(self)
+        )
+        if cache is not None and isinstance(response, dict) and "result" in response:
+            cache.put(method, params, response["result"], self)
+        return response
+
+    def send_batch(self, calls: List[Tuple[str, list]]) -> List[Any]:
+        """发送一个JSON-RPC批量请求，供wallet_utils.rpc_batch使用"""
+        return parse_batch_response(self._send(calls, encode_batch(calls)), len(calls))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """各节点的健康统计"""
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
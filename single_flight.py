@@ -0,0 +1,166 @@
+import json
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+# 有副作用或依赖节点端状态的方法，不能合并
+_UNSAFE_PREFIXES = ("eth_send", "eth_sign", "personal_", "eth_newFilter", "eth_newBlockFilter",
+                    "eth_newPendingTransactionFilter", "eth_getFilter", "eth_uninstallFilter", "eth_subscribe")
+
+
+def is_coalescable(method: str) -> bool:
+    """方法是否为只读、可以与相同的在途请求合并"""
+    return not method.startswith(_UNSAFE_PREFIXES)
+
+
+def request_key(method: str, params: Any, scope: str = "") -> str:
+    """(合并范围, 方法, 参数) 的规范化键，参数中包含区块标签"""
+    return json.dumps([scope, method, params], sort_keys=True, separators=(",", ":"))
+
+
+def request_scope(target: Any) -> str:
+    """
+    请求的合并范围：只有发往同一节点（连接池则为同一组节点）的相同调用才合并
+
+    Args:
+        target: RPCPool、HTTP provider，或带pool/endpoint_uri属性的传输（如LeanRPCClient）
+    """
+    endpoints = getattr(target, "endpoints", None)
+    if endpoints is not None:
+        return ",".join(endpoint.url for endpoint in endpoints)
+    pool = getattr(target, "pool", None)
+    if pool is not None:
+        return request_scope(pool)
+    return str(getattr(target, "endpoint_uri", None) or id(target))
+
+
+class _Flight:
+    """一个在途请求"""
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    相同在途请求合并（single-flight）
+
+    同一时刻多个线程发出完全相同的只读调用时，只有第一个真正发送，
+    其余线程等待并共享它的结果（或异常）。请求完成后不保留结果，之后的调用会重新发送。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.requests = 0   # 经过合并层的调用数
+        self.coalesced = 0  # 共享了在途请求、未实际发送的调用数
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        """加入或发起一个在途请求，返回 (请求, 是否由自己发送)"""
+        with self._lock:
+            self.requests += 1
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._inflight[key] = _Flight()
+            return flight, True
+
+    def _finish(self, key: str, flight: _Flight):
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        flight.event.set()
+
+    def do(self, method: str, params: Any, fn: Callable[[], Any], scope: str = "") -> Any:
+        """执行单个调用，同一范围（request_scope）内相同调用在途时等待并共享其结果"""
+        if not is_coalescable(method):
+            return fn()
+        key = request_key(method, params, scope)
+        flight, leader = self._join(key)
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish(key, flight)
+        return flight.result
+
+    def do_batch(
+        self,
+        calls: List[Tuple[str, Any]],
+        send: Callable[[List[Tuple[str, Any]]], List[Any]],
+        scope: str = ""
+    ) -> List[Any]:
+        """
+        合并一组调用：只发送没有相同请求在途的调用，其余等待共享结果
+
+        同一批内的重复调用同样只发送一次。发送失败时异常向上抛出，
+        等待中的调用得到该异常对象作为结果（与批量请求中失败项的表示一致）。
+
+        Args:
+            calls: [(方法名, 参数列表), ...]
+            send: 实际发送函数，返回与输入顺序一致的结果列表
+            scope: 合并范围（request_scope），不同节点的相同调用不合并
+        """
+        flights = []
+        leaders, followers = [], []
+        keys = []
+        for i, (method, params) in enumerate(calls):
+            if not is_coalescable(method):
+                flights.append(None)
+                keys.append(None)
+                leaders.append(i)
+                continue
+            key = request_key(method, params, scope)
+            flight, leader = self._join(key)
+            flights.append(flight)
+            keys.append(key)
+            (leaders if leader else followers).append(i)
+
+        results = [None] * len(calls)
+        try:
+            # 先发送自己负责的调用，再等待别人的，避免相互等待
+            values = send([calls[i] for i in leaders]) if leaders else []
+            for i, value in zip(leaders, values):
+                results[i] = value
+                if flights[i] is not None:
+                    flights[i].result = value
+        except Exception as e:
+            for i in leaders:
+                if flights[i] is not None:
+                    flights[i].error = e
+            raise
+        finally:
+            for i in leaders:
+                if flights[i] is not None:
+                    self._finish(keys[i], flights[i])
+
+        for i in followers:
+            flight = flights[i]
+            flight.event.wait()
+            results[i] = flight.error if flight.error is not None else flight.result
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """进程内共享的请求合并层"""
+    return _single_flight
@@ -0,0 +1,271 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from eth_abi import decode as abi_decode, encode as abi_encode
+
+# 被测模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wallet_utils import MULTICALL3_ADDRESS  # noqa: E402
+
+_SELECTOR_AGGREGATE3 = "0x82ad56cb"
+_SELECTOR_GET_ETH_BALANCE = bytes.fromhex("4d2301cc")
+_SELECTOR_BALANCE_OF = bytes.fromhex("70a08231")
+_SELECTOR_DECIMALS = bytes.fromhex("313ce567")
+_SELECTOR_SYMBOL = bytes.fromhex("95d89b41")
+
+# 聚合调用中任意代币合约的decimals()和symbol()
+TOKEN_DECIMALS = 6
+TOKEN_SYMBOL = "TKN"
+
+
+def balance_of(address: str) -> int:
+    """测试节点上地址的余额（wei），由地址末4位十六进制确定"""
+    return int(address[-4:], 16) * 10 ** 15
+
+
+def nonce_of(address: str) -> int:
+    """测试节点上地址的交易数（区块last_tx_block起），由地址末2位十六进制确定"""
+    return int(address[-2:], 16)
+
+
+def first_tx_block(address: str) -> int:
+    """地址第一笔交易所在的区块（1..4）"""
+    return int(address[-3:], 16) % 4 + 1
+
+
+def last_tx_block(address: str) -> int:
+    """地址最后一笔交易所在的区块（不晚于区块9）；只有一笔交易时与第一笔相同"""
+    if nonce_of(address) <= 1:
+        return first_tx_block(address)
+    return first_tx_block(address) + int(address[-4:], 16) % 5 + 1
+
+
+def nonce_at(address: str, block: int) -> int:
+    """地址在某个区块的交易数：第一笔之前为0，最后一笔起为nonce_of，中间单调递增且小于nonce_of"""
+    nonce, first, last = nonce_of(address), first_tx_block(address), last_tx_block(address)
+    if nonce == 0 or block < first:
+        return 0
+    if block >= last:
+        return nonce
+    return 1 + (nonce - 1) * (block - first) // (last - first)
+
+
+def block_timestamp(number: int, block_time: int = 2) -> int:
+    return 1700000000 + number * block_time
+
+
+class StubNode:
+    """
+    本地JSON-RPC测试节点
+
+    结果由地址和区块号确定性生成；可注入HTTP 429、请求体大小上限（超出时返回HTTP 413）、
+    getLogs区块范围上限、aggregate3调用数上限（超出时返回out of gas）、JSON-RPC内部错误和响应延迟。
+    """
+
+    def __init__(self, chain_id: int = 1, head: int = 1000):
+        self.chain_id = chain_id
+        self.head = head
+        self.throttle = 0           # 接下来这么多个HTTP请求返回429
+        self.max_body = None        # 请求体的最大字节数
+        self.max_log_range = None   # eth_getLogs允许的最大区块数
+        self.max_multicall = None   # 单次aggregate3允许的最大调用数
+        self.delay = 0.0            # 每个HTTP请求的延迟（秒）
+        self.failing = 0            # 接下来这么多个HTTP请求的每个调用返回内部错误(-32603)
+        self.logs = []              # eth_getLogs的数据源（原始日志）
+        self.transactions = {}      # 区块号 -> [(from, to), ...]，eth_getBlockByNumber返回的交易
+        self.block_time = 2         # 出块间隔（秒）
+        self.nonce_from_transactions = False  # 为True时交易数按transactions中作为发送方的交易计算
+        self.http_requests = 0
+        self.body_sizes = []        # 各请求体的字节数
+        self.oversized = 0          # 因请求体过大返回413的次数
+        self.calls = []             # 收到的 (方法, 参数)，不含被429/413拒绝的请求
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, method: str) -> int:
+        with self._lock:
+            return sum(1 for name, _ in self.calls if name == method)
+
+    def reset_counts(self):
+        with self._lock:
+            self.http_requests = 0
+            self.body_sizes = []
+            self.oversized = 0
+            self.calls = []
+
+    def _handler(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                with node._lock:
+                    node.http_requests += 1
+                    node.body_sizes.append(len(raw))
+                    throttled = node.throttle > 0
+                    if throttled:
+                        node.throttle -= 1
+                if node.delay:
+                    time.sleep(node.delay)
+                if throttled:
+                    self._reply(429, b'{"error":"too many requests"}', {"Retry-After": "0"})
+                    return
+                if node.max_body is not None and len(raw) > node.max_body:
+                    with node._lock:
+                        node.oversized += 1
+                    self._reply(413, b'{"error":"request entity too large"}')
+                    return
+                body = json.loads(raw)
+                requests = body if isinstance(body, list) else [body]
+                with node._lock:
+                    node.calls.extend((r["method"], r.get("params", [])) for r in requests)
+                with node._lock:
+                    failing = node.failing > 0
+                    if failing:
+                        node.failing -= 1
+                if failing:
+                    replies = [
+                        {"jsonrpc": "2.0", "id": r.get("id"), "error": {"code": -32603, "message": "internal error"}}
+                        for r in requests
+                    ]
+                else:
+                    replies = [node._answer(r) for r in requests]
+                data = json.dumps(replies if isinstance(body, list) else replies[0]).encode()
+                self._reply(200, data)
+
+            def _reply(self, status, data, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端已中止请求（如落败的对冲请求）
+                    pass
+
+        return Handler
+
+    def _answer(self, request):
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        try:
+            reply["result"] = self._dispatch(request["method"], request.get("params", []))
+        except _RPCFailure as e:
+            reply["error"] = {"code": e.code, "message": str(e)}
+        return reply
+
+    def _dispatch(self, method, params):
+        if method == "eth_chainId":
+            return hex(self.chain_id)
+        if method == "net_version":
+            return str(self.chain_id)
+        if method == "web3_clientVersion":
+            return "stub/1.0"
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_getBalance":
+            return hex(balance_of(params[0]))
+        if method == "eth_getTransactionCount":
+            block = params[1] if len(params) > 1 else "latest"
+            return hex(self._nonce_at(params[0], self.head if block in ("latest", "pending") else int(block, 16)))
+        if method == "eth_getBlockByNumber":
+            number = int(params[0], 16)
+            if number > self.head:
+                return None
+            transactions = [
+                {"hash": "0x" + format(number * 1000 + i, "064x"), "from": sender, "to": receiver}
+                for i, (sender, receiver) in enumerate(self.transactions.get(number, []))
+            ]
+            return {
+                "number": hex(number),
+                "hash": "0x" + format(number, "064x"),
+                "timestamp": hex(block_timestamp(number, self.block_time)),
+                "transactions": transactions if len(params) > 1 and params[1] else [tx["hash"] for tx in transactions],
+            }
+        if method == "eth_getLogs":
+            return self._get_logs(params[0])
+        if method == "eth_call":
+            return self._call(params[0])
+        raise _RPCFailure(-32601, f"method {method} not found")
+
+    def _nonce_at(self, address, block):
+        if not self.nonce_from_transactions:
+            return nonce_at(address, block)
+        return sum(
+            1 for number, txs in self.transactions.items() if number <= block
+            for sender, _ in txs if sender.lower() == address.lower()
+        )
+
+    def _get_logs(self, criteria):
+        start, end = int(criteria["fromBlock"], 16), int(criteria["toBlock"], 16)
+        if self.max_log_range is not None and end - start + 1 > self.max_log_range:
+            raise _RPCFailure(-32005, f"query exceeds max block range {self.max_log_range}")
+        topics = criteria.get("topics") or []
+        matched = []
+        for log in self.logs:
+            if not start <= int(log["blockNumber"], 16) <= end:
+                continue
+            if all(
+                wanted is None or log["topics"][i] in (wanted if isinstance(wanted, list) else [wanted])
+                for i, wanted in enumerate(topics)
+            ):
+                matched.append(log)
+        return matched
+
+    def _call(self, transaction):
+        data = transaction.get("data") or transaction.get("input")
+        if transaction["to"].lower() != MULTICALL3_ADDRESS.lower() or not data.startswith(_SELECTOR_AGGREGATE3):
+            raise _RPCFailure(3, "execution reverted")
+        (calls,) = abi_decode(["(address,bool,bytes)[]"], bytes.fromhex(data[len(_SELECTOR_AGGREGATE3):]))
+        if self.max_multicall is not None and len(calls) > self.max_multicall:
+            raise _RPCFailure(-32000, "out of gas")
+        # getEthBalance/balanceOf返回地址余额，decimals/symbol返回固定值，其余调用原样返回calldata，便于核对顺序
+        results = [(True, self._call_result(call_data)) for _, _, call_data in calls]
+        return "0x" + abi_encode(["(bool,bytes)[]"], [results]).hex()
+
+    def _call_result(self, call_data):
+        if call_data.startswith(_SELECTOR_GET_ETH_BALANCE) or call_data.startswith(_SELECTOR_BALANCE_OF):
+            (address,) = abi_decode(["address"], call_data[4:])
+            return abi_encode(["uint256"], [balance_of(address)])
+        if call_data == _SELECTOR_DECIMALS:
+            return abi_encode(["uint8"], [TOKEN_DECIMALS])
+        if call_data == _SELECTOR_SYMBOL:
+            return abi_encode(["string"], [TOKEN_SYMBOL])
+        return call_data
+
+
+class _RPCFailure(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+@pytest.fixture
+def node():
+    stub = StubNode()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def web3(node):
+    from web3 import Web3
+    return Web3(Web3.HTTPProvider(node.url))
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+from conftest import StubNode, block_timestamp
+from web3 import Web3
+
+from activity_index import ActivityIndex
+
+SENDER = "0x" + "a1" * 20
+OTHER = "0x" + "b2" * 20
+RECEIVER = "0x" + "c3" * 20
+
+
+def day_of(block: int) -> str:
+    return datetime.fromtimestamp(block_timestamp(block)).strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ActivityIndex(str(tmp_path / "activity.db"))
+    yield index
+    index.close()
+
+
+def test_update_and_lookup_round_trip(web3, node, index):
+    """从创世区块开始的索引：首次/最近交易时间不带标注，只收到转账的钱包没有记录"""
+    node.head = 50
+    node.transactions = {10: [(SENDER, OTHER)], 40: [(SENDER, RECEIVER), (OTHER, SENDER)]}
+
+    assert index.update(web3, max_blocks=100) == 51
+    assert (index.first_block, index.last_block, index.chain_id, index.gaps()) == (0, 50, 1, [])
+    # 51个区块按每批20个拉取（3个批量请求），另有chain id和最新区块号各一次
+    assert node.count("eth_getBlockByNumber") == 51
+    assert node.http_requests == 3 + 2
+
+    # 按地址查询时不区分大小写
+    mixed = "0x" + SENDER[2:].upper()
+    results = index.lookup([mixed, OTHER, RECEIVER])
+    assert results[mixed] == {
+        "active_weeks": 1, "active_days": len({day_of(10), day_of(40)}),
+        "first_tx_time": day_of(10), "last_tx_time": day_of(40),
+    }
+    assert results[OTHER]["first_tx_time"] == day_of(40)
+    assert results[RECEIVER]["first_tx_time"] == "索引范围内无交易"
+
+    # 已是最新区块，不再请求区块
+    node.reset_counts()
+    assert index.update(web3, max_blocks=100) == 0
+    assert node.count("eth_getBlockByNumber") == 0
+
+
+def test_chain_mismatch_is_rejected(web3, node, index):
+    node.head = 5
+    index.update(web3)
+    other = StubNode(chain_id=2, head=5)
+    try:
+        with pytest.raises(ValueError):
+            index.update(Web3(Web3.HTTPProvider(other.url)))
+        assert other.count("eth_getBlockByNumber") == 0
+    finally:
+        other.close()
+
+
+def test_gaps_and_partial_labels(web3, node, index):
+    """落后超过max_blocks时跳过的区间记入gaps，首次/最近交易时间带上部分索引的标注"""
+    node.head = 50
+    node.transactions = {45: [(SENDER, OTHER)], 60: [(SENDER, OTHER)], 95: [(SENDER, OTHER)]}
+
+    assert index.update(web3, max_blocks=10) == 11
+    assert (index.first_block, index.last_block) == (40, 50)
+    assert index.lookup([SENDER])[SENDER]["first_tx_time"] == day_of(45) + "（区块40起的首笔）"
+    assert index.lookup([SENDER])[SENDER]["last_tx_time"] == day_of(45)
+
+    node.head = 100
+    assert index.update(web3, max_blocks=10) == 11
+    assert index.gaps() == [(51, 89)]
+    info = index.lookup([SENDER])[SENDER]
+    # 区块60在跳过的区间内，没有被索引
+    assert info["first_tx_time"] == day_of(45) + "（区块40起的首笔）"
+    assert info["last_tx_time"] == day_of(95) + "（不含跳过的区块）"
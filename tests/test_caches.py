@@ -0,0 +1,92 @@
+import pytest
+from conftest import StubNode, block_timestamp
+from web3 import Web3
+
+from block_cache import BlockTimestampCache
+from chain_cache import configure_chain_cache
+from wallet_utils import rpc_batch
+
+
+@pytest.fixture
+def chain_cache(tmp_path):
+    cache = configure_chain_cache(str(tmp_path / "chain_cache.bin"))
+    yield cache
+    configure_chain_cache(None)
+
+
+def block_calls(numbers):
+    return [("eth_getBlockByNumber", [hex(n), False]) for n in numbers]
+
+
+def test_chain_cache_hits_on_rerun(web3, node, chain_cache, tmp_path):
+    """已确定的历史区块第二次查询不再请求节点，重新打开缓存文件后同样命中"""
+    first = rpc_batch(web3, block_calls(range(1, 11)))
+    assert node.count("eth_getBlockByNumber") == 10
+
+    node.reset_counts()
+    assert rpc_batch(web3, block_calls(range(1, 11))) == first
+    assert node.count("eth_getBlockByNumber") == 0
+
+    configure_chain_cache(str(tmp_path / "chain_cache.bin"))
+    node.reset_counts()
+    assert rpc_batch(web3, block_calls(range(1, 11))) == first
+    assert node.count("eth_getBlockByNumber") == 0
+
+
+def test_chain_cache_skips_unfinalized_blocks(web3, node, chain_cache):
+    """距最新区块不足最终确定深度的区块不缓存"""
+    recent = range(node.head - 5, node.head + 1)
+    rpc_batch(web3, block_calls(recent))
+    node.reset_counts()
+    rpc_batch(web3, block_calls(recent))
+    assert node.count("eth_getBlockByNumber") == len(recent)
+
+
+def test_chain_cache_is_keyed_by_chain(web3, node, chain_cache):
+    rpc_batch(web3, block_calls([5]))
+    other = StubNode(chain_id=2)
+    try:
+        rpc_batch(Web3(Web3.HTTPProvider(other.url)), block_calls([5]))
+        assert other.count("eth_getBlockByNumber") == 1
+    finally:
+        other.close()
+
+
+def test_chain_cache_keeps_context_per_provider(web3, node, chain_cache):
+    """交替使用两条链的节点时，各自的chain id只查询一次，缓存互不清空"""
+    other = StubNode(chain_id=2)
+    try:
+        other_web3 = Web3(Web3.HTTPProvider(other.url))
+        for _ in range(3):
+            rpc_batch(web3, block_calls([5]))
+            rpc_batch(other_web3, block_calls([5]))
+        for stub in (node, other):
+            assert stub.count("eth_chainId") == 1
+            assert stub.count("eth_getBlockByNumber") == 1
+    finally:
+        other.close()
+
+
+def test_block_timestamp_cache_hits_on_rerun(web3, node, tmp_path):
+    db_path = str(tmp_path / "block_timestamps.db")
+    numbers = [3, 1, 2, 3]
+
+    assert BlockTimestampCache(db_path).get_many(web3, numbers) == {n: block_timestamp(n) for n in (1, 2, 3)}
+    assert node.count("eth_getBlockByNumber") == 3
+
+    node.reset_counts()
+    reopened = BlockTimestampCache(db_path)
+    assert reopened.get_many(web3, numbers) == {n: block_timestamp(n) for n in (1, 2, 3)}
+    assert node.count("eth_getBlockByNumber") == 0
+    assert reopened.stats()["disk_hits"] == 3
+
+
+def test_block_timestamp_cache_is_keyed_by_chain(web3, node, tmp_path):
+    cache = BlockTimestampCache(str(tmp_path / "block_timestamps.db"))
+    cache.get_many(web3, [1])
+    other = StubNode(chain_id=2)
+    try:
+        cache.get_many(Web3(Web3.HTTPProvider(other.url)), [1])
+        assert other.count("eth_getBlockByNumber") == 1
+    finally:
+        other.close()
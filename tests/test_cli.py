@@ -0,0 +1,84 @@
+import csv
+import io
+from datetime import datetime
+
+from conftest import balance_of, block_timestamp, nonce_of
+
+import block_cache
+from defaults import DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+from log_scanner import TRANSFER_TOPIC, pad_address_topic
+from monad_wallet_cli import build_parser, run
+
+WALLETS = ["0x" + format(i * 4099, "040x") for i in range(1, 5)]
+TOKEN = "0x" + "56" * 20
+
+
+def run_cli(tmp_path, node, *options):
+    path = tmp_path / "wallets.txt"
+    path.write_text("\n".join(WALLETS))
+    out = io.StringIO()
+    args = build_parser().parse_args([str(path), "--rpc", node.url, "-q", *options])
+    assert run(args, out=out) == 0
+    return list(csv.DictReader(io.StringIO(out.getvalue())))
+
+
+def test_nonce_query_sends_only_nonce_calls(tmp_path, node):
+    rows = run_cli(tmp_path, node, "--query", "nonce")
+
+    assert [int(row["transactions"]) for row in rows] == [nonce_of(addr) for addr in WALLETS]
+    assert "balance" not in rows[0]
+    assert node.count("eth_getTransactionCount") == len(WALLETS)
+    assert node.count("eth_getBalance") == 0
+
+
+def test_token_metadata_is_fetched_once(tmp_path, node):
+    """代币的symbol/decimals只查询一次，每批钱包只查询余额"""
+    rows = run_cli(tmp_path, node, "--query", "tokens", "--token", TOKEN, "--chunk-size", "2")
+
+    assert len(rows) == len(WALLETS)
+    # 1次元数据 + 2批 × 1个代币的余额
+    assert node.count("eth_call") == 3
+
+
+def test_option_defaults():
+    args = build_parser().parse_args([])
+    assert (args.concurrency, args.batch_size, args.timeout) == (DEFAULT_CONCURRENCY, DEFAULT_BATCH_SIZE, DEFAULT_TIMEOUT)
+
+
+def test_multicall_balances(tmp_path, node):
+    """--multicall时余额由一次aggregate3查询，不按地址发送eth_getBalance"""
+    rows = run_cli(tmp_path, node, "--query", "balance", "--multicall")
+
+    assert [row["address"] for row in rows] == WALLETS
+    assert [row["balance"] for row in rows] == ["{:.5f}".format(balance_of(addr) / 10 ** 18) for addr in WALLETS]
+    assert node.count("eth_call") == 1
+    assert node.count("eth_getBalance") == 0
+
+
+def test_interactions_scan_once_for_all_wallets(tmp_path, node, monkeypatch):
+    """合约交互对整组钱包只扫描一遍区块范围"""
+    # 共享的区块时间戳缓存写到临时目录，不写入仓库的data目录
+    monkeypatch.setattr(block_cache, "_default_cache", block_cache.BlockTimestampCache(str(tmp_path / "timestamps.db")))
+    node.head = 999
+    node.logs = [
+        {
+            "address": TOKEN,
+            "blockNumber": hex(block),
+            "logIndex": "0x0",
+            "transactionHash": "0x" + format(block, "064x"),
+            "topics": [TRANSFER_TOPIC, pad_address_topic(sender), pad_address_topic(receiver)],
+            "data": "0x" + format(10 ** 18, "064x"),
+        }
+        for block, sender, receiver in ((100, WALLETS[0], WALLETS[1]), (200, WALLETS[1], WALLETS[2]))
+    ]
+
+    # 钱包分成两批输出，区块范围仍只扫描一遍
+    rows = run_cli(tmp_path, node, "--query", "interactions", "--contract", TOKEN, "--chunk-size", "2")
+
+    assert [int(row["interactions"]) for row in rows] == [1, 2, 1, 0]
+    last = datetime.fromtimestamp(block_timestamp(200)).strftime("%Y-%m-%d %H:%M:%S")
+    assert [row["last_interaction_time"] for row in rows] == [
+        datetime.fromtimestamp(block_timestamp(100)).strftime("%Y-%m-%d %H:%M:%S"), last, last, "-"
+    ]
+    # 一个窗口，转出和转入两个过滤条件
+    assert node.count("eth_getLogs") == 2
@@ -0,0 +1,66 @@
+from conftest import nonce_at
+from web3 import Web3
+
+from head_watcher import BLOCK_BATCH_SIZE, MAX_CATCHUP_BLOCKS, HeadWatcher
+
+TRACKED = [Web3.to_checksum_address("0x" + byte * 20) for byte in ("a1", "b2", "c3")]
+OTHER = "0x" + "d4" * 20
+
+
+def make_watcher(web3, start: int):
+    updates = []
+    watcher = HeadWatcher(web3, TRACKED, lambda *update: updates.append(update))
+    watcher.last_block = start
+    return watcher, updates
+
+
+def refreshed_at(node, method: str):
+    """刷新请求中查询的 {地址: 区块参数}"""
+    return {params[0]: params[1] for name, params in node.calls if name == method}
+
+
+def test_incremental_scan_refreshes_touched_addresses(web3, node):
+    """新区块按每批20个拉取完整交易，只在新的最新区块刷新被涉及的地址"""
+    node.head = 1045
+    # 交易中的地址大小写与被跟踪地址不同，仍能匹配
+    node.transactions = {1010: [(TRACKED[0].lower(), OTHER)], 1040: [(OTHER, "0x" + TRACKED[1][2:].upper())]}
+    watcher, updates = make_watcher(web3, 1000)
+    node.reset_counts()
+
+    assert watcher.poll() == 2
+    assert (watcher.last_block, watcher.blocks_scanned, watcher.addresses_refreshed) == (1045, 45, 2)
+    assert node.count("eth_getBlockByNumber") == 45
+    # 最新区块号一次，45个区块按每批BLOCK_BATCH_SIZE个分3批（20+20+5），刷新一次
+    assert BLOCK_BATCH_SIZE == 20
+    assert node.http_requests == 1 + 3 + 1
+    for method in ("eth_getBalance", "eth_getTransactionCount"):
+        assert refreshed_at(node, method) == {TRACKED[0]: hex(1045), TRACKED[1]: hex(1045)}
+
+    [(head, balances, tx_counts)] = updates
+    assert head == 1045
+    assert set(balances) == {TRACKED[0], TRACKED[1]}
+    assert tx_counts == {addr: nonce_at(addr, 1045) for addr in TRACKED[:2]}
+
+    # 没有新区块时不发送区块请求，也不回调
+    node.reset_counts()
+    assert watcher.poll() == 0
+    assert node.http_requests == 1
+    assert len(updates) == 1
+
+
+def test_far_behind_refreshes_all_addresses(web3, node):
+    """落后超过MAX_CATCHUP_BLOCKS个区块时不逐块扫描，直接在最新区块刷新全部地址"""
+    node.head = 1000 + MAX_CATCHUP_BLOCKS + 1
+    node.transactions = {1010: [(TRACKED[0], OTHER)]}
+    watcher, updates = make_watcher(web3, 1000)
+    node.reset_counts()
+
+    assert watcher.poll() == len(TRACKED)
+    assert node.count("eth_getBlockByNumber") == 0
+    assert watcher.blocks_scanned == 0
+    for method in ("eth_getBalance", "eth_getTransactionCount"):
+        assert refreshed_at(node, method) == {addr: hex(node.head) for addr in TRACKED}
+
+    [(head, balances, tx_counts)] = updates
+    assert head == watcher.last_block == node.head
+    assert tx_counts == {addr: nonce_at(addr, node.head) for addr in TRACKED}
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from conftest import StubNode, balance_of, nonce_of
+
+from async_query import query_wallet_data
+from rpc_pool import HEDGE_MIN_SAMPLES, AttemptAborted, RPCPool
+
+ADDRESS = "0x" + format(4242, "040x")
+
+
+@pytest.fixture
+def slow():
+    stub = StubNode()
+    stub.delay = 1.0
+    yield stub
+    stub.close()
+
+
+def hedged_pool(primary: StubNode, secondary: StubNode, budget: float = 1.0) -> RPCPool:
+    """对冲延迟为最小值的连接池，请求几乎总是先发给primary"""
+    pool = RPCPool([primary.url, secondary.url], hedge=True, hedge_budget=budget)
+    first, second = pool.endpoints
+    # 样本足够多，未对冲请求的慢样本不会抬高延迟分位数
+    for _ in range(HEDGE_MIN_SAMPLES * 5):
+        pool.record(first, 0.001)
+    second.latency = 100.0
+    return pool
+
+
+def get_balance(pool: RPCPool):
+    return pool.send_batch([("eth_getBalance", [ADDRESS, "latest"])])[0]
+
+
+def test_hedge_wins_over_slow_primary(slow, node):
+    """主请求超过对冲延迟后向另一个节点发送副本，先返回的副本胜出，主请求被中止"""
+    pool = hedged_pool(slow, node)
+
+    start = time.monotonic()
+    assert int(get_balance(pool), 16) == balance_of(ADDRESS)
+    assert time.monotonic() - start < slow.delay / 2
+
+    assert slow.http_requests == 1
+    assert node.count("eth_getBalance") == 1
+    stats = pool.hedge_stats()
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
+    # 被中止的主请求不计为节点故障
+    assert pool.stats()[0]["failures"] == 0
+
+
+def test_losing_sync_request_is_aborted(slow, node, monkeypatch):
+    """同步路径：副本胜出后，阻塞在等待响应中的主请求被中止（关闭连接），而不是等到慢节点返回"""
+    outcomes = []
+    post_to = RPCPool._post_to
+
+    def recording_post_to(self, endpoint, payload, attempt=None):
+        start = time.monotonic()
+        try:
+            data = post_to(self, endpoint, payload, attempt)
+        except AttemptAborted:
+            outcomes.append((endpoint.url, "aborted", time.monotonic() - start))
+            raise
+        outcomes.append((endpoint.url, "ok", time.monotonic() - start))
+        return data
+
+    monkeypatch.setattr(RPCPool, "_post_to", recording_post_to)
+    pool = hedged_pool(slow, node)
+    latency = pool.endpoints[0].latency
+
+    assert int(get_balance(pool), 16) == balance_of(ADDRESS)
+
+    # 主请求在调用线程中发送，调用返回前已经被中止
+    assert [(url, outcome) for url, outcome, _ in outcomes] == [(node.url, "ok"), (slow.url, "aborted")]
+    assert outcomes[1][2] < slow.delay / 2
+    assert slow.http_requests == 1
+    # 被中止的请求既不计为失败，也不计入延迟样本
+    primary = pool.endpoints[0]
+    assert (primary.failures, primary.latency) == (0, latency)
+
+
+def test_fast_primary_is_not_hedged(slow, node):
+    """主请求在对冲延迟内返回时不发送副本"""
+    pool = hedged_pool(node, slow)
+
+    assert int(get_balance(pool), 16) == balance_of(ADDRESS)
+    time.sleep(0.1)
+    assert slow.http_requests == 0
+    assert pool.hedge_stats()["hedged"] == 0
+
+
+def test_hedge_budget_is_respected(slow, node):
+    """副本数不超过 hedge_budget * 请求数，超出预算的请求等待主请求"""
+    slow.delay = 0.3
+    pool = hedged_pool(slow, node, budget=0.5)
+
+    for _ in range(4):
+        assert int(get_balance(pool), 16) == balance_of(ADDRESS)
+
+    stats = pool.hedge_stats()
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (4, 2, 2)
+    assert node.count("eth_getBalance") == 2
+
+
+def test_async_engine_hedges_slow_primary(slow, node):
+    pool = hedged_pool(slow, node)
+
+    start = time.monotonic()
+    balances, tx_counts = query_wallet_data(pool, [ADDRESS], batch_size=10)
+    assert time.monotonic() - start < slow.delay / 2
+
+    assert tx_counts == {ADDRESS: nonce_of(ADDRESS)}
+    assert balances == {ADDRESS: "{:.5f}".format(balance_of(ADDRESS) / 10 ** 18)}
+    stats = pool.hedge_stats()
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
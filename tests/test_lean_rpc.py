@@ -0,0 +1,39 @@
+from lean_rpc import LeanRPCClient, benchmark, format_balance, is_address
+from rpc_pool import RPCPool
+from wallet_utils import get_transaction_count, get_wallet_balances
+
+ADDRESSES = ["0x" + format(i * 104729, "040x") for i in range(1, 9)] + ["not-an-address"]
+
+
+def test_matches_web3_path(web3, node):
+    """精简传输与web3路径的余额、交易数结果完全一致"""
+    lean = LeanRPCClient(node.url)
+
+    assert lean.get_wallet_balances(ADDRESSES, batch_size=4) == get_wallet_balances(web3, ADDRESSES, batch_size=4)
+    assert lean.get_transaction_count(ADDRESSES, batch_size=4) == get_transaction_count(web3, ADDRESSES, batch_size=4)
+
+
+def test_pool_and_web3_inputs(web3, node):
+    """接受RPCPool和Web3对象，请求经由同一节点发送"""
+    pool = RPCPool([node.url])
+    expected = get_transaction_count(web3, ADDRESSES[:3])
+    for rpc in (pool, pool.as_web3(), web3):
+        lean = LeanRPCClient(rpc, gzip=False)
+        node.reset_counts()
+        assert lean.get_transaction_count(ADDRESSES[:3]) == expected
+        assert node.http_requests == 1
+    assert pool.stats()[0]["failures"] == 0
+
+
+def test_benchmark_reports_identical_output(node):
+    result = benchmark(node.url, ADDRESSES[:-1], rounds=1, repeat=1)
+    assert result["identical"] is True
+
+
+def test_helpers_match_web3():
+    from web3 import Web3
+
+    for addr in ADDRESSES + ["0x" + "Ab" * 20, Web3.to_checksum_address("0x" + "ab" * 20)]:
+        assert is_address(addr) == Web3.is_address(addr)
+    for wei in (0, 1, 10 ** 18 - 1, 123456789 * 10 ** 12, 2 ** 80):
+        assert format_balance(wei) == "{:.5f}".format(float(Web3.from_wei(wei, "ether")))
@@ -0,0 +1,46 @@
+import re
+
+from log_buffer import LogBuffer
+
+
+def messages(lines):
+    return [line.split("] ", 1)[1] for line in lines]
+
+
+def test_line_cap_and_dropped_pending_lines():
+    """超出上限时丢弃最旧的行；未取出就被挤出的行计入丢弃数"""
+    log = LogBuffer(max_lines=3)
+    for i in range(2):
+        log.append(f"m{i}")
+    lines, dropped = log.take_pending()
+    assert (messages(lines), dropped) == (["m0", "m1"], 0)
+
+    for i in range(2, 7):
+        line = log.append(f"m{i}")
+    assert re.fullmatch(r"\[\d\d:\d\d:\d\d\] m6", line)
+    assert messages(log.lines) == ["m4", "m5", "m6"]
+    lines, dropped = log.take_pending()
+    assert (messages(lines), dropped) == (["m4", "m5", "m6"], 2)
+    assert log.take_pending() == ([], 0)
+
+    log.append("m7")
+    log.clear()
+    assert (list(log.lines), log.take_pending()) == ([], ([], 0))
+
+
+def test_file_logging_is_not_capped(tmp_path):
+    """日志文件追加写入带日期的每一行，不受行数上限和clear影响"""
+    path = tmp_path / "wallet_tool.log"
+    path.write_text("2024-01-01 00:00:00 旧日志\n", encoding="utf-8")
+    log = LogBuffer(max_lines=2, path=str(path))
+    for i in range(4):
+        log.append(f"m{i}")
+    log.clear()
+    log.append("m4")
+    log.close()
+    log.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "2024-01-01 00:00:00 旧日志"
+    assert [line.split(" ", 2)[2] for line in lines[1:]] == [f"m{i}" for i in range(5)]
+    assert all(re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d m\d", line) for line in lines[1:])
@@ -0,0 +1,63 @@
+from log_scanner import TRANSFER_TOPIC, pad_address_topic, scan_transfer_logs, scan_transfer_logs_bulk
+
+WALLET = "0x" + "12" * 20
+OTHER = "0x" + "34" * 20
+TOKEN = "0x" + "56" * 20
+
+
+def make_transfer(block: int, sender: str, receiver: str, value: int):
+    return {
+        "address": TOKEN,
+        "blockNumber": hex(block),
+        "logIndex": "0x0",
+        "transactionHash": "0x" + format(block, "064x"),
+        "topics": [TRANSFER_TOPIC, pad_address_topic(sender), pad_address_topic(receiver)],
+        "data": "0x" + format(value, "064x"),
+    }
+
+
+def test_window_adapts_to_node_range_limit(web3, node):
+    """区块范围过大时窗口减半，之后不再放大回已知会失败的大小"""
+    node.max_log_range = 1000
+    node.logs = [
+        make_transfer(500, WALLET, OTHER, 1),
+        make_transfer(7500, OTHER, WALLET, 2),
+        make_transfer(7600, OTHER, "0x" + "78" * 20, 3),
+        make_transfer(19999, WALLET, WALLET, 4),
+    ]
+
+    logs = scan_transfer_logs(web3, TOKEN, WALLET, from_block=0, to_block=19999)
+
+    assert [int(log["blockNumber"], 16) for log in logs] == [19999, 7500, 500]
+    # 首个2000区块的窗口失败一次，之后20个1000区块的窗口各一次批量请求（每次2个过滤条件）
+    assert node.http_requests == 21
+
+
+def test_max_results_stops_early(web3, node):
+    node.logs = [make_transfer(block, WALLET, OTHER, block) for block in (10, 3000, 9000)]
+
+    logs = scan_transfer_logs(web3, TOKEN, WALLET, from_block=0, to_block=9999, max_results=1)
+
+    assert [int(log["blockNumber"], 16) for log in logs] == [9000]
+    assert node.http_requests == 1
+
+
+def test_bulk_scan_covers_all_wallets_in_one_pass(web3, node):
+    """整组钱包的日志在一遍扫描中取回：每个窗口一次批量请求，与钱包数无关"""
+    wallets = [WALLET, OTHER, "0x" + "78" * 20]
+    node.logs = [
+        make_transfer(100, WALLET, OTHER, 1),
+        make_transfer(200, OTHER, wallets[2], 2),
+        make_transfer(300, "0x" + "9a" * 20, WALLET, 3),
+    ]
+
+    buckets = scan_transfer_logs_bulk(web3, TOKEN, wallets, from_block=0, to_block=999)
+
+    assert {addr: [event["block_number"] for event in events] for addr, events in buckets.items()} == {
+        WALLET: [300, 100],
+        OTHER: [200, 100],
+        wallets[2]: [200],
+    }
+    # 一个窗口，转出和转入两个过滤条件合并在一次批量请求中
+    assert node.http_requests == 1
+    assert node.count("eth_getLogs") == 2
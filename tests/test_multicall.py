@@ -0,0 +1,75 @@
+from conftest import balance_of
+
+from rate_limit import get_limiter
+from rpc_pool import RPCPool
+from wallet_utils import MULTICALL3_ADDRESS, get_raw_balances_multicall, multicall
+
+CALLS = [(MULTICALL3_ADDRESS, bytes([i]) * 4) for i in range(10)]
+WALLETS = ["0x" + format(i * 4099, "040x") for i in range(1, 5)]
+
+
+def test_splits_on_gas_error(web3, node):
+    """整批超出gas时对半拆分，结果顺序与调用一致"""
+    node.max_multicall = 4
+
+    results = multicall(web3, CALLS, chunk_size=10)
+
+    assert results == [(True, data) for _, data in CALLS]
+    # 10 -> 5+5 -> (2+3)+(2+3)：1 + 2 + 4 次
+    assert node.count("eth_call") == 7
+
+
+def test_splits_on_http_413(node):
+    """请求体过大（HTTP 413）时立即拆分，不当作临时错误重试"""
+    from web3 import Web3
+
+    # 关闭web3自身对HTTP错误的重试，只观察multicall的处理
+    web3 = Web3(Web3.HTTPProvider(node.url, exception_retry_configuration=None))
+    node.reset_counts()
+    multicall(web3, CALLS[:5], chunk_size=5)
+    # 5个调用的请求体恰好被接受（留出请求id变长的余量）
+    node.max_body = max(node.body_sizes) + 16
+    node.reset_counts()
+
+    results = multicall(web3, CALLS, chunk_size=10)
+
+    assert results == [(True, data) for _, data in CALLS]
+    # 10个调用的请求被拒绝一次（不重试），拆成的两批各5个调用均被接受
+    assert node.oversized == 1
+    assert node.count("eth_call") == 2
+
+
+def test_pool_splits_on_http_413(node):
+    multicall(RPCPool([node.url]), CALLS[:5], chunk_size=5)
+    node.max_body = max(node.body_sizes) + 16
+    node.reset_counts()
+
+    results = multicall(RPCPool([node.url]), CALLS, chunk_size=10)
+
+    assert results == [(True, data) for _, data in CALLS]
+    assert node.oversized == 1
+    assert node.count("eth_call") == 2
+
+
+def test_single_call_failure_is_recorded(web3, node):
+    node.max_multicall = 0
+
+    assert multicall(web3, CALLS[:3]) == [(False, b"")] * 3
+
+
+def test_multicall_goes_through_rate_limiter(web3, node):
+    """聚合调用与批量请求走同一传输：429反馈给限速器后重试"""
+    node.throttle = 1
+
+    assert multicall(web3, CALLS[:3]) == [(True, data) for _, data in CALLS[:3]]
+    assert get_limiter(node.url).throttled == 1
+
+
+def test_raw_balances_keep_results_per_chunk(web3, node):
+    """一批失败只影响该批地址，其余批次的余额照常返回"""
+    node.failing = 1
+
+    results = get_raw_balances_multicall(web3, WALLETS, chunk_size=2)
+
+    assert all(results[addr].startswith("错误") for addr in WALLETS[:2])
+    assert {addr: results[addr] for addr in WALLETS[2:]} == {addr: balance_of(addr) for addr in WALLETS[2:]}
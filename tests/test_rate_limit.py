@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import aiohttp
+import pytest
+import requests
+from conftest import nonce_of
+
+from async_query import query_wallet_data
+from rate_limit import AdaptiveRateLimiter, RateLimitError, get_limiter, is_transient, parse_retry_after
+from rpc_pool import RPCPool
+from wallet_utils import RPCError, rpc_batch
+
+ADDRESSES = ["0x" + format(i * 7919, "040x") for i in range(1, 8)]
+
+
+def _aiohttp_error(status: int) -> aiohttp.ClientResponseError:
+    from yarl import URL
+    url = URL("http://127.0.0.1/")
+    return aiohttp.ClientResponseError(aiohttp.RequestInfo(url, "POST", {}, url), (), status=status)
+
+
+def _http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} Error", response=response)
+
+
+def test_rate_limited_batch_is_retried(web3, node):
+    """HTTP 429后退避重试，不把限流当作结果返回，并降低该节点的速率"""
+    node.throttle = 2
+    calls = [("eth_getTransactionCount", [addr, "latest"]) for addr in ADDRESSES]
+
+    results = rpc_batch(web3, calls, batch_size=len(calls))
+
+    assert results == [hex(nonce_of(addr)) for addr in ADDRESSES]
+    assert node.http_requests == 3
+    assert get_limiter(node.url).throttled == 2
+
+
+@pytest.mark.parametrize("batch_size", [10, None])
+def test_async_engine_scores_node_errors_as_failures(node, batch_size):
+    """HTTP 200响应体中的内部错误（批内或整个请求）计为节点故障，不计为成功"""
+    pool = RPCPool([node.url])
+    address = ADDRESSES[0]
+    requests_per_query = 1 if batch_size else 2
+
+    node.failing = requests_per_query
+    balances, tx_counts = query_wallet_data(pool, [address], batch_size=batch_size)
+    assert balances[address].startswith("错误") and tx_counts[address].startswith("错误")
+    assert pool.stats()[0]["failures"] == requests_per_query
+
+    _, tx_counts = query_wallet_data(pool, [address], batch_size=batch_size)
+    assert tx_counts == {address: nonce_of(address)}
+    assert pool.stats()[0]["failures"] == requests_per_query
+
+
+@pytest.mark.parametrize("error", [
+    RateLimitError(),
+    RPCError("rate limit exceeded", -32005),
+    _http_error(429),
+    _http_error(502),
+    requests.ConnectionError("reset"),
+    requests.Timeout("read timed out"),
+    ConnectionResetError(),
+    TimeoutError(),
+    asyncio.TimeoutError(),
+    aiohttp.ClientConnectionError(),
+    _aiohttp_error(503),
+])
+def test_transient_errors(error):
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize("error", [
+    _http_error(400),
+    _http_error(404),
+    _http_error(413),
+    _aiohttp_error(413),
+    requests.JSONDecodeError("Expecting value", "<html>", 0),
+    json.JSONDecodeError("Expecting value", "<html>", 0),
+    FileNotFoundError(),
+    RPCError("execution reverted", 3),
+    RPCError("query returned more than 10000 results", -32005),
+])
+def test_permanent_errors(error):
+    assert not is_transient(error)
+
+
+def test_throttle_halves_rate_and_honours_retry_after():
+    limiter = AdaptiveRateLimiter(rate=20.0)
+    limiter.report(RateLimitError(retry_after=5))
+    assert limiter.rate == 10.0
+    assert limiter.blocked_until > 0
+    limiter.report(None)
+    assert limiter.rate > 10.0
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("soon") is None
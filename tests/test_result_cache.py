@@ -0,0 +1,64 @@
+import json
+
+from result_cache import ResultCache
+from wallet_store import WalletStore
+
+ADDRESS = "0x" + "ab" * 20
+
+
+def test_result_cache_is_cleared_on_chain_change():
+    cache = ResultCache()
+    cache.update("balance", {ADDRESS: "1.00000"}, 500, chain_id=1)
+    assert cache.is_fresh([ADDRESS], ["balance"], 500)
+
+    # 另一条链上区块号更小的结果不会被旧链的缓存挡住
+    cache.update("balance", {ADDRESS: "2.00000"}, 10, chain_id=2)
+    assert cache.get(ADDRESS, "balance") == ("2.00000", 10)
+    assert cache.set_chain(1) is True
+    assert not cache.is_fresh([ADDRESS], ["balance"], 10)
+
+
+def test_result_cache_evicts_least_recently_used():
+    """超过地址上限时淘汰最久未读写的地址"""
+    addresses = ["0x" + format(i, "040x") for i in range(4)]
+    cache = ResultCache(max_addresses=3)
+    cache.update("balance", {addr: "1.00000" for addr in addresses[:3]}, 100)
+    # 读取使addresses[0]变为最近使用，新地址挤出addresses[1]
+    assert cache.get(addresses[0], "balance") == ("1.00000", 100)
+    cache.update("transactions", {addresses[3]: 5}, 101)
+
+    assert len(cache) == 3
+    assert cache.get(addresses[1], "balance") is None
+    assert cache.values(addresses, "balance") == {addresses[0]: "1.00000", addresses[2]: "1.00000"}
+    assert cache.get(addresses[3], "transactions") == (5, 101)
+
+    unbounded = ResultCache(max_addresses=None)
+    unbounded.update("balance", {addr: "1.00000" for addr in addresses}, 100)
+    assert len(unbounded) == 4
+
+
+def test_wallet_store_results_follow_chain(tmp_path):
+    store = WalletStore(str(tmp_path / "wallets.db"))
+    store.add_many([ADDRESS])
+    store.save_results("balance", {ADDRESS: "1.00000"}, 500, chain_id=1)
+    store.save_results("balance", {ADDRESS: "0.50000"}, 400, chain_id=1)
+    assert store.results("balance") == {500: {ADDRESS: "1.00000"}}
+
+    store.save_results("transactions", {ADDRESS: 3}, 10, chain_id=2)
+    assert store.chain_id == 2
+    assert store.results("balance") == {}
+    assert store.results("transactions") == {10: {ADDRESS: 3}}
+    store.close()
+
+
+def test_legacy_snapshot_import(tmp_path):
+    wallets_path = tmp_path / "wallets.json"
+    results_path = tmp_path / "results.json"
+    wallets_path.write_text(json.dumps([ADDRESS]))
+    results_path.write_text(json.dumps({"entries": {ADDRESS: {"balance": ["1.00000", 500]}}}))
+
+    store = WalletStore(str(tmp_path / "wallets.db"))
+    assert store.import_legacy(str(wallets_path), str(results_path)) == 1
+    assert store.results("balance") == {500: {ADDRESS: "1.00000"}}
+    assert store.chain_id is None
+    store.close()
@@ -0,0 +1,104 @@
+import pytest
+
+from result_table import ResultTable
+
+ADDRESSES = ["0x" + format(i, "040x") for i in range(1, 7)]
+
+
+def make_table() -> ResultTable:
+    """余额 [3, -, 1, 错误, 2, 0]，交易数 [5, 2, -, 7, 错误, 0]"""
+    table = ResultTable(ADDRESSES)
+    for addr, balance, tx_count in zip(
+        ADDRESSES, ["3", None, 1.0, "错误: timeout", 2, "0"], [5, 2, None, 7, "错误: timeout", 0]
+    ):
+        table.update(addr, balance, tx_count)
+    return table
+
+
+def test_numeric_sort_puts_unknown_values_last():
+    """按数值列升序或降序排序时，没有结果（未查询或出错）的行总是排在最后，顺序不变"""
+    table = make_table()
+
+    table.sort("balance")
+    assert table.view.tolist() == [5, 2, 4, 0, 1, 3]
+    table.sort("balance", descending=True)
+    assert table.view.tolist() == [0, 4, 2, 5, 1, 3]
+    table.sort("transactions")
+    assert table.view.tolist() == [5, 1, 0, 3, 2, 4]
+    table.sort("transactions", descending=True)
+    assert table.view.tolist() == [3, 0, 1, 5, 2, 4]
+    assert [table.row_values(row)[4] for row in (1, 3)] == ["-", "错误: timeout"]
+
+
+def test_index_and_text_columns():
+    table = make_table()
+    table.reset(ADDRESSES, labels={ADDRESSES[4]: "b", ADDRESSES[1]: "a"})
+
+    table.sort("index", descending=True)
+    assert table.view.tolist() == [5, 4, 3, 2, 1, 0]
+    table.sort("label")
+    assert table.view.tolist() == [1, 4, 0, 2, 3, 5]
+    table.sort(None)
+    assert table.view.tolist() == list(range(6))
+    with pytest.raises(ValueError):
+        table.sort("nonce")
+
+
+@pytest.mark.parametrize("op, expected", [
+    (">", [0, 4]),
+    (">=", [0, 2, 4]),
+    ("<", [5]),
+    ("<=", [2, 5]),
+    ("=", [2]),
+])
+def test_filter_operators_skip_unknown_values(op, expected):
+    table = make_table()
+
+    table.filter("balance", op, 1)
+    assert table.view.tolist() == expected
+
+
+def test_filter_combines_with_sort_and_can_be_cleared():
+    table = make_table()
+    table.sort("index", descending=True)
+    table.filter("transactions", ">=", 2)
+    assert table.view.tolist() == [3, 1, 0]
+    # reset保留排序和筛选条件
+    table.reset(ADDRESSES)
+    assert table.view.tolist() == []
+
+    table.filter(None)
+    assert table.view.tolist() == [5, 4, 3, 2, 1, 0]
+    with pytest.raises(ValueError):
+        table.filter("balance", "!=", 1)
+    with pytest.raises(ValueError):
+        table.filter("address", ">", 1)
+
+
+def test_update_keeps_stale_flags_per_field():
+    """stale只作用于本次更新的字段"""
+    table = ResultTable(ADDRESSES[:1])
+    addr = ADDRESSES[0]
+
+    assert table.update(addr, "1.5", 3, stale=True)
+    assert table.is_stale(0)
+    # 只刷新余额：交易数仍是过期结果
+    table.update(addr, balance="2")
+    assert table.is_stale(0)
+    # 再刷新交易数后全部是最新结果
+    table.update(addr, tx_count=4)
+    assert not table.is_stale(0)
+    assert table.row_values(0) == (1, addr, "", "", "2.00000", 4)
+
+    # 只把交易数标记为过期，余额不受影响
+    table.update(addr, tx_count=5, stale=True)
+    table.update(addr, balance="3")
+    assert table.is_stale(0)
+    table.update(addr, tx_count=5)
+    assert not table.is_stale(0)
+
+    # 非数值结果按文本显示，None保留原值
+    table.update(addr, "错误: timeout", None)
+    assert (table.balance(0), table.tx_count(0)) == (None, 5)
+    assert table.row_values(0)[4] == "错误: timeout"
+    assert not table.update(ADDRESSES[1], "1")
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+from conftest import StubNode, nonce_of
+
+import rpc_pool
+from rpc_pool import EJECT_AFTER_FAILURES, RPCPool
+
+ADDRESS = "0x" + format(4242, "040x")
+
+
+@pytest.fixture
+def bad():
+    stub = StubNode()
+    yield stub
+    stub.close()
+
+
+def get_nonce(pool: RPCPool) -> int:
+    return int(pool.send_batch([("eth_getTransactionCount", [ADDRESS, "latest"])])[0], 16)
+
+
+def test_failover_ejection_and_readmission(bad, node, monkeypatch):
+    """失败的节点被切换、连续失败后剔除，冷却结束且恢复后重新承担流量"""
+    monkeypatch.setattr(rpc_pool, "EJECT_BASE_SECONDS", 0.3)
+    # 总是优先选择候选中的第一个节点（bad），只观察失败切换和剔除
+    monkeypatch.setattr(rpc_pool.random, "choices", lambda population, weights: [population[0]])
+    pool = RPCPool([bad.url, node.url])
+    bad.throttle = 1000
+
+    for _ in range(EJECT_AFTER_FAILURES + 3):
+        assert get_nonce(pool) == nonce_of(ADDRESS)
+    # 每次失败后切换到健康节点；连续失败EJECT_AFTER_FAILURES次后不再发往bad
+    assert bad.http_requests == EJECT_AFTER_FAILURES
+    assert node.count("eth_getTransactionCount") == EJECT_AFTER_FAILURES + 3
+    stats = pool.stats()
+    assert (stats[0]["available"], stats[0]["failures"]) == (False, EJECT_AFTER_FAILURES)
+
+    bad.throttle = 0
+    time.sleep(0.35)
+    assert pool.stats()[0]["available"]
+    assert get_nonce(pool) == nonce_of(ADDRESS)
+    assert bad.count("eth_getTransactionCount") == 1
+    assert pool.endpoints[0].consecutive_failures == 0
+
+
+def test_selection_follows_ewma_latency(bad, node):
+    """实测延迟计入滑动平均，延迟越低的节点被选中的概率越高"""
+    bad.delay = 0.2
+    pool = RPCPool([bad.url, node.url])
+    slow, fast = pool.endpoints
+    payload = {"jsonrpc": "2.0", "id": 1, "method": "eth_chainId", "params": []}
+    for endpoint in pool.endpoints:
+        pool._post_to(endpoint, payload)
+    assert slow.latency >= bad.delay > fast.latency
+    first = slow.latency
+    pool._post_to(slow, payload)
+    assert slow.latency == pytest.approx(first, rel=0.2)
+
+    picks = [pool.choose() for _ in range(2000)]
+    assert picks.count(fast) > 0.9 * len(picks)
+    for _ in range(5):
+        assert get_nonce(pool) == nonce_of(ADDRESS)
+    assert node.count("eth_getTransactionCount") >= 3
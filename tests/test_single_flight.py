@@ -0,0 +1,72 @@
+import threading
+
+from conftest import StubNode
+from web3 import Web3
+
+from single_flight import SingleFlight, get_single_flight
+from wallet_utils import rpc_batch
+
+ADDRESS = "0x" + "ab" * 20
+
+
+def test_concurrent_identical_calls_share_one_request(web3, node):
+    """相同的在途调用只发送一次，其余线程共享结果"""
+    node.delay = 0.3
+    threads = 5
+    barrier = threading.Barrier(threads)
+    results = []
+    before = get_single_flight().stats()["coalesced"]
+
+    def worker():
+        barrier.wait()
+        results.append(rpc_batch(web3, [("eth_getBalance", [ADDRESS, "latest"])]))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert len(results) == threads
+    assert all(result == results[0] for result in results)
+    assert node.count("eth_getBalance") == 1
+    assert get_single_flight().stats()["coalesced"] - before == threads - 1
+
+
+def test_identical_calls_to_different_nodes_are_not_coalesced(web3, node):
+    """发往不同节点的相同调用各自发送，结果来自各自的节点"""
+    other = StubNode(head=2000)
+    try:
+        node.delay = other.delay = 0.3
+        targets = {"a": web3, "b": Web3(Web3.HTTPProvider(other.url))}
+        barrier = threading.Barrier(len(targets))
+        results = {}
+
+        def worker(name):
+            barrier.wait()
+            results[name] = rpc_batch(targets[name], [("eth_blockNumber", [])])[0]
+
+        workers = [threading.Thread(target=worker, args=(name,)) for name in targets]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        assert results == {"a": hex(node.head), "b": hex(other.head)}
+        assert node.count("eth_blockNumber") == other.count("eth_blockNumber") == 1
+    finally:
+        other.close()
+
+
+def test_calls_after_completion_are_sent_again():
+    flight = SingleFlight()
+    sent = []
+    for _ in range(2):
+        flight.do("eth_blockNumber", [], lambda: sent.append(1) or len(sent))
+    assert sent == [1, 1]
+
+
+def test_unsafe_methods_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("eth_sendRawTransaction", ["0x"], lambda: "a") == "a"
+    assert flight.requests == 0
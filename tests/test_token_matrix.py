@@ -0,0 +1,67 @@
+from conftest import TOKEN_DECIMALS, TOKEN_SYMBOL, balance_of
+
+from token_matrix import (
+    STATUS_ERROR, STATUS_INVALID, STATUS_OK, TokenBalanceMatrix, TokenMatrixView, get_token_balance_matrix,
+    get_token_metadata
+)
+
+WALLETS = ["0x" + format(i * 4099, "040x") for i in range(1, 5)]
+TOKEN = "0x" + "56" * 20
+
+
+def formatted(value: int) -> str:
+    whole, frac = divmod(value, 10 ** TOKEN_DECIMALS)
+    return f"{whole}.{str(frac).rjust(TOKEN_DECIMALS, '0')[:5]}"
+
+
+def test_matrix_values_and_status(web3, node):
+    """列与输入的代币一一对应，无效的钱包和代币标记为无效地址"""
+    wallets = WALLETS[:2] + ["0x1234"]
+    matrix = get_token_balance_matrix(web3, wallets, [TOKEN, "not-a-token"])
+
+    assert matrix.shape == (3, 2)
+    assert matrix.symbols == [TOKEN_SYMBOL, "无效地址"]
+    assert matrix.decimals[0] == TOKEN_DECIMALS
+    assert [matrix.get(row, 0) for row in range(2)] == [balance_of(addr) for addr in WALLETS[:2]]
+    assert [matrix.status(row, 0) for row in range(3)] == [STATUS_OK, STATUS_OK, STATUS_INVALID]
+    assert [matrix.status(row, 1) for row in range(3)] == [STATUS_INVALID] * 3
+
+    assert list(matrix.iter_rows()) == [
+        (WALLETS[0], [formatted(balance_of(WALLETS[0])), "无效地址"]),
+        (WALLETS[1], [formatted(balance_of(WALLETS[1])), "无效地址"]),
+        ("0x1234", ["无效地址", "无效地址"]),
+    ]
+    assert list(matrix.iter_rows(formatted=False))[0] == (WALLETS[0], [balance_of(WALLETS[0]), None])
+    # 元数据一次 + 一列余额一次
+    assert node.count("eth_call") == 2
+
+
+def test_failed_chunk_only_marks_its_cells(web3, node):
+    metadata = get_token_metadata(web3, [TOKEN])
+    assert metadata == {TOKEN: (TOKEN_SYMBOL, TOKEN_DECIMALS)}
+    node.failing = 1
+
+    matrix = get_token_balance_matrix(web3, WALLETS, [TOKEN], chunk_size=2, metadata=metadata)
+
+    assert [matrix.status(row, 0) for row in range(4)] == [STATUS_ERROR, STATUS_ERROR, STATUS_OK, STATUS_OK]
+    assert [matrix.get(row, 0) for row in range(2, 4)] == [balance_of(addr) for addr in WALLETS[2:]]
+    assert matrix.format_cell(0, 0) == "错误"
+    assert 0 in matrix.errors
+
+
+def test_matrix_view_sorts_by_token_with_missing_last():
+    matrix = TokenBalanceMatrix(["0xc", "0xA", "0xb"], [TOKEN])
+    matrix.set(0, 0, 5)
+    matrix.set(2, 0, 7)
+    view = TokenMatrixView(matrix)
+    assert view.columns == ["address", "token_0"]
+
+    view.sort("token_0", descending=True)
+    assert view.view_rows(0, 3) == [2, 0, 1]
+    view.sort("token_0")
+    assert view.view_rows(0, 3) == [0, 2, 1]
+    view.sort("address")
+    assert view.view_rows(0, 3) == [1, 2, 0]
+    view.sort(None)
+    assert view.view_rows(0, 3) == [0, 1, 2]
+    assert view.row_values(1) == ["0xA", "错误"]
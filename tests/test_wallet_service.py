@@ -0,0 +1,98 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from conftest import balance_of, nonce_of
+
+from rpc_pool import RPCPool
+from wallet_service import MicroBatcher, create_server
+
+WALLETS = ["0x" + format(i * 4099, "040x") for i in range(1, 6)]
+
+
+@pytest.fixture
+def service(node):
+    batcher = MicroBatcher(RPCPool([node.url]), window=0.2)
+    server = create_server(batcher, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield batcher, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+
+def get(url: str):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def post(url: str, body: dict):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def expected_balance(address: str) -> str:
+    return "{:.5f}".format(balance_of(address) / 10 ** 18)
+
+
+def test_concurrent_requests_are_merged(service, node):
+    """窗口期内并发到达的请求合并为一个批量请求"""
+    batcher, url = service
+    replies = {}
+
+    def fetch(address):
+        replies[address] = get(f"{url}/balance?address={address}")
+
+    threads = [threading.Thread(target=fetch, args=(addr,)) for addr in WALLETS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {addr: reply["results"][addr]["balance"] for addr, reply in replies.items()} == {
+        addr: expected_balance(addr) for addr in WALLETS
+    }
+    assert node.count("eth_getBalance") == len(WALLETS)
+    metrics = batcher.metrics()
+    assert (metrics["batches"], metrics["max_batch_size"]) == (1, len(WALLETS))
+
+
+def test_repeat_in_same_block_is_cached(service, node):
+    """同一区块内重复的查询（地址大小写不同）由缓存返回，不再请求节点"""
+    batcher, url = service
+    address = WALLETS[3]
+    assert get(f"{url}/balance?address={address}")["results"][address]["balance"] == expected_balance(address)
+
+    upper = "0x" + address[2:].upper()
+    assert get(f"{url}/balance?address={upper}")["results"][upper]["balance"] == expected_balance(address)
+    assert node.count("eth_getBalance") == 1
+    assert batcher.metrics()["cache_hits"] == 1
+
+
+def test_unknown_field_is_rejected(service, node):
+    _, url = service
+    status, body = post(f"{url}/query", {"addresses": WALLETS[:1], "fields": ["balance", "storage"]})
+    assert status == 400
+    assert "storage" in body["error"]
+    assert node.count("eth_getBalance") == 0
+
+
+def test_metrics_report_counters(service):
+    _, url = service
+    status, body = post(f"{url}/query", {"addresses": WALLETS[:2]})
+    assert status == 200
+    assert body["results"][WALLETS[1]]["transactions"] == nonce_of(WALLETS[1])
+
+    metrics = get(f"{url}/metrics")
+    assert metrics["requests"] == 4
+    assert metrics["rpc_calls"] == 4
+    assert metrics["batches"] == 1
+    assert metrics["cache_hits"] == 0
+    assert metrics["queue_depth"] == 0
+    assert metrics["head"] == 1000
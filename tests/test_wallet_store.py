@@ -0,0 +1,94 @@
+import json
+import time
+
+import pytest
+
+from wallet_store import WalletStore
+
+ADDRESSES = ["0x" + format(0xabc000 + i, "040x") for i in range(5)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WalletStore(str(tmp_path / "wallets.db"))
+    yield store
+    store.close()
+
+
+def test_add_many_dedupes_case_insensitively_and_persists(store):
+    """大小写不同的同一地址只保存一次（包括同一批中的重复），重新打开后顺序、标签和分组不变"""
+    upper = "0x" + ADDRESSES[1][2:].upper()
+    assert store.add_many(ADDRESSES[:2]) == ADDRESSES[:2]
+    assert store.add_many([upper, ADDRESSES[2], "0x" + ADDRESSES[2][2:].upper()], label="新") == [ADDRESSES[2]]
+    assert store.add_many([(ADDRESSES[3], "a", "g1"), (ADDRESSES[4],)], label="默认", group="g2") == ADDRESSES[3:]
+    assert upper in store and len(store) == 5
+
+    reopened = WalletStore(store.db_path)
+    try:
+        assert reopened.addresses == ADDRESSES
+        assert reopened.labels == {ADDRESSES[2]: "新", ADDRESSES[3]: "a", ADDRESSES[4]: "默认"}
+        assert reopened.groups == {ADDRESSES[3]: "g1", ADDRESSES[4]: "g2"}
+    finally:
+        reopened.close()
+
+
+def test_save_results_ignores_errors_and_older_blocks(store):
+    store.add_many(ADDRESSES[:3])
+    store.save_results("balance", {ADDRESSES[0]: "1.5", ADDRESSES[1]: "2.0"}, 100, chain_id=1)
+    # 更旧的区块和错误信息都不覆盖已保存的结果
+    store.save_results("balance", {ADDRESSES[0]: "9.9", ADDRESSES[2]: "3.0"}, 90)
+    store.save_results("balance", {ADDRESSES[1]: "错误: timeout"}, 110)
+    store.save_results("balance", {ADDRESSES[1]: "2.5"}, 100)
+    store.save_results("transactions", {"0x" + ADDRESSES[0][2:].upper(): 7}, 100)
+
+    assert store.results("balance") == {100: {ADDRESSES[0]: "1.5", ADDRESSES[1]: "2.5"}, 90: {ADDRESSES[2]: "3.0"}}
+    assert store.results("transactions") == {100: {ADDRESSES[0]: 7}}
+    assert store.chain_id == 1
+
+
+def test_save_results_resets_on_chain_change(store):
+    """结果所属的链变化时先清空所有字段的已保存结果"""
+    store.add_many(ADDRESSES[:2])
+    store.save_results("balance", {ADDRESSES[0]: "1.5"}, 100, chain_id=1)
+    store.save_results("transactions", {ADDRESSES[0]: 7}, 100, chain_id=1)
+
+    store.save_results("balance", {ADDRESSES[1]: "4.0"}, 50, chain_id=2)
+    assert store.chain_id == 2
+    assert store.results("balance") == {50: {ADDRESSES[1]: "4.0"}}
+    assert store.results("transactions") == {}
+
+
+def test_import_legacy_runs_once(store, tmp_path):
+    wallets_path = tmp_path / "wallets.json"
+    results_path = tmp_path / "results.json"
+    wallets_path.write_text(json.dumps(ADDRESSES[:3] + ["0x" + ADDRESSES[0][2:].upper()]))
+    results_path.write_text(json.dumps({"entries": {
+        ADDRESSES[0]: {"balance": ["1.5", 100], "transactions": [3, 100]},
+        ADDRESSES[1]: {"balance": ["2.0", 90]},
+    }}))
+
+    assert store.import_legacy(str(wallets_path), str(results_path)) == 3
+    assert store.addresses == ADDRESSES[:3]
+    assert store.results("balance") == {100: {ADDRESSES[0]: "1.5"}, 90: {ADDRESSES[1]: "2.0"}}
+    assert store.results("transactions") == {100: {ADDRESSES[0]: 3}}
+
+    # 已导入过的数据库不再导入，即使列表被清空
+    store.clear()
+    assert store.import_legacy(str(wallets_path), str(results_path)) == 0
+    assert len(store) == 0
+
+
+def test_add_many_large_list_in_memory():
+    """20万个地址一个事务写入，去重只查内存索引"""
+    addresses = ["0x" + format(i, "040x") for i in range(200_000)]
+    store = WalletStore(":memory:")
+    try:
+        start = time.monotonic()
+        assert len(store.add_many(addresses)) == len(addresses)
+        elapsed = time.monotonic() - start
+        assert store.add_many(addresses[:1000]) == []
+        assert len(store) == len(addresses)
+        assert store.addresses[-1] == addresses[-1]
+    finally:
+        store.close()
+    assert elapsed < 10.0
@@ -0,0 +1,125 @@
+import time
+from datetime import datetime
+
+from conftest import balance_of, block_timestamp, first_tx_block, last_tx_block, nonce_of
+
+import block_cache
+from wallet_utils import (
+    find_first_last_tx_blocks, get_transaction_count, get_wallet_activity, get_wallet_balances, rpc_batch
+)
+
+ADDRESSES = ["0x" + format(i * 7919, "040x") for i in range(1, 8)]
+
+
+def test_batch_matches_serial(web3, node):
+    """批量查询与逐个查询结果一致，且请求数更少"""
+    serial_balances = get_wallet_balances(web3, ADDRESSES, batch_size=None)
+    serial_nonces = get_transaction_count(web3, ADDRESSES, batch_size=None)
+    serial_requests = node.http_requests
+
+    node.reset_counts()
+    batch_balances = get_wallet_balances(web3, ADDRESSES, batch_size=3)
+    batch_nonces = get_transaction_count(web3, ADDRESSES, batch_size=3)
+
+    assert batch_balances == serial_balances
+    assert batch_nonces == serial_nonces
+    assert batch_nonces == {addr: nonce_of(addr) for addr in ADDRESSES}
+    assert batch_balances[ADDRESSES[0]] == "{:.5f}".format(balance_of(ADDRESSES[0]) / 10 ** 18)
+    assert node.http_requests == 6
+    assert serial_requests >= 2 * len(ADDRESSES)
+
+
+def test_batch_wall_time_with_latency(web3, node):
+    """每个请求有固定延迟时，批量查询的耗时约为一个往返，逐个查询随地址数线性增长"""
+    node.delay = 0.1
+
+    start = time.monotonic()
+    serial = get_wallet_balances(web3, ADDRESSES, batch_size=None)
+    serial_time = time.monotonic() - start
+
+    start = time.monotonic()
+    batched = get_wallet_balances(web3, ADDRESSES, batch_size=len(ADDRESSES))
+    batched_time = time.monotonic() - start
+
+    assert batched == serial
+    assert serial_time >= len(ADDRESSES) * node.delay
+    assert batched_time < 3 * node.delay
+    assert batched_time < serial_time / 2
+
+
+def test_invalid_address_in_batch(web3):
+    results = get_transaction_count(web3, ["not-an-address", ADDRESSES[0]], batch_size=10)
+    assert results == {"not-an-address": "无效地址", ADDRESSES[0]: nonce_of(ADDRESSES[0])}
+
+
+def nonce_calls(addresses, block):
+    return [("eth_getTransactionCount", [addr, hex(block)]) for addr in addresses]
+
+
+def test_oversized_batch_is_split(web3, node):
+    """整批超过请求体上限（HTTP 413）时对半拆分，拆出的批次仍过大时继续拆分"""
+    rpc_batch(web3, nonce_calls(ADDRESSES[:2], 10))
+    node.max_body = max(node.body_sizes) + 16
+    node.reset_counts()
+
+    values = rpc_batch(web3, nonce_calls(ADDRESSES, 10), batch_size=len(ADDRESSES))
+
+    assert [int(value, 16) for value in values] == [nonce_of(addr) for addr in ADDRESSES]
+    # 7 -> 4 + 3，两半都仍过大 -> (2 + 2) + (2 + 1)
+    assert node.oversized == 3
+    assert node.http_requests == 7
+    assert node.count("eth_getTransactionCount") == len(ADDRESSES)
+
+
+def test_bisection_with_oversized_batches(web3, node):
+    """二分查找每一步的批量请求过大时拆分发送，之后的步骤按拆分后的大小发送"""
+    rpc_batch(web3, nonce_calls(ADDRESSES[:2], 10))
+    node.max_body = max(node.body_sizes) + 16
+    node.reset_counts()
+
+    # 最后一个钱包没有交易
+    wallets = ADDRESSES[:6] + ["0x" + format(0x1200, "040x")]
+    results = find_first_last_tx_blocks(web3, wallets, to_block=31, batch_size=len(wallets))
+
+    active = wallets[:6]
+    assert results == {
+        **{addr: (nonce_of(addr), first_tx_block(addr), last_tx_block(addr)) for addr in active},
+        wallets[6]: (0, -1, -1),
+    }
+    # 最新区块的交易数：7 -> 4 + 3 -> (2 + 2) + (2 + 1)，3次413 + 4次成功
+    assert node.oversized == 3
+    # 之后按拆分出的上限（2个调用）发送：区间(-1, 31]二分5步，每步每个钱包2个查找各一个调用
+    assert node.http_requests == 7 + 5 * len(active)
+
+
+def test_bisect_activity_matches_index(web3, node, tmp_path, monkeypatch):
+    """二分模式的活跃天数/周数和首末交易日期与区块索引模式一致"""
+    # 共享的区块时间戳缓存写到临时目录（本测试的出块间隔与其他测试不同）
+    monkeypatch.setattr(block_cache, "_default_cache", block_cache.BlockTimestampCache(str(tmp_path / "timestamps.db")))
+    wallets = ["0x" + format(0xa000 + i, "040x") for i in range(4)]
+    sent = {wallets[0]: [5, 6, 13, 40, 41, 90, 91, 92], wallets[1]: [20], wallets[2]: [3, 200, 201]}
+    node.head = 400
+    node.block_time = 6 * 3600  # 每天4个区块
+    node.nonce_from_transactions = True
+    node.transactions = {}
+    for sender, blocks in sent.items():
+        for block in blocks:
+            node.transactions.setdefault(block, []).append((sender, wallets[3]))
+
+    def day(block):
+        return datetime.fromtimestamp(block_timestamp(block, node.block_time)).date()
+
+    bisect = get_wallet_activity(web3, wallets, mode="bisect")
+    index = get_wallet_activity(web3, wallets, max_blocks=node.head + 1, index_path=str(tmp_path / "index.db"))
+    for addr in sent:
+        assert {key: bisect[addr][key] for key in index[addr]} == index[addr]
+
+    for addr, blocks in sent.items():
+        days = {day(block) for block in blocks}
+        assert bisect[addr]["active_days"] == len(days)
+        assert bisect[addr]["active_weeks"] == len({d.isocalendar()[:2] for d in days})
+        assert (bisect[addr]["first_tx_time"], bisect[addr]["last_tx_time"]) == (
+            day(blocks[0]).strftime("%Y-%m-%d"), day(blocks[-1]).strftime("%Y-%m-%d")
+        )
+    # 只收到转账的钱包在两种模式下都没有活跃记录
+    assert (bisect[wallets[3]]["active_days"], index[wallets[3]]["active_days"]) == (0, 0)
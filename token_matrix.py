@@ -0,0 +1,288 @@
+from array import array
+from typing import Dict, List, Optional, Union, Tuple, Iterator
+
+from web3 import Web3
+from eth_abi import decode as abi_decode
+
+from wallet_utils import multicall, encode_balance_call, _resolve_web3, MULTICALL3_ADDRESS, MULTICALL_CHUNK_SIZE
+
+# 每个余额以32字节大端整数存储（uint256）
+_CELL_SIZE = 32
+
+# 单元格状态
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_INVALID = 2
+
+_SELECTOR_DECIMALS = bytes.fromhex("313ce567")  # decimals()
+_SELECTOR_SYMBOL = bytes.fromhex("95d89b41")    # symbol()
+
+
+class TokenBalanceMatrix:
+    """
+    钱包 × 代币 原始余额矩阵
+
+    余额按行（钱包）连续存放在一块bytearray中，每格32字节，
+    另有一个字节数组记录每格状态；不为每个单元创建Python对象，
+    内存占用与 钱包数 × 代币数 成正比。
+    """
+
+    def __init__(self, wallets: List[str], tokens: List[str]):
+        self.wallets = list(wallets)
+        self.tokens = list(tokens)
+        self.symbols = [token[:8] for token in self.tokens]
+        self.decimals = array('B', [18] * len(self.tokens))
+        # 查询失败的列: {列: 错误信息}
+        self.errors = {}
+        self._index = {addr: i for i, addr in enumerate(self.wallets)}
+        self._values = bytearray(len(self.wallets) * len(self.tokens) * _CELL_SIZE)
+        self._status = bytearray([STATUS_ERROR]) * (len(self.wallets) * len(self.tokens))
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(钱包数, 代币数)"""
+        return len(self.wallets), len(self.tokens)
+
+    def _offset(self, row: int, col: int) -> int:
+        return row * len(self.tokens) + col
+
+    def set(self, row: int, col: int, value: int):
+        """写入一个原始余额"""
+        cell = self._offset(row, col)
+        self._values[cell * _CELL_SIZE:(cell + 1) * _CELL_SIZE] = value.to_bytes(_CELL_SIZE, "big")
+        self._status[cell] = STATUS_OK
+
+    def set_status(self, row: int, col: int, status: int):
+        """将单元格标记为错误或无效地址"""
+        self._status[self._offset(row, col)] = status
+
+    def get(self, row: int, col: int) -> Optional[int]:
+        """读取原始余额，查询失败的单元格返回None"""
+        cell = self._offset(row, col)
+        if self._status[cell] != STATUS_OK:
+            return None
+        return int.from_bytes(self._values[cell * _CELL_SIZE:(cell + 1) * _CELL_SIZE], "big")
+
+    def status(self, row: int, col: int) -> int:
+        return self._status[self._offset(row, col)]
+
+    def row_index(self, wallet_address: str) -> int:
+        return self._index[wallet_address]
+
+    def format_cell(self, row: int, col: int, places: int = 5) -> str:
+        """按代币小数位数格式化单元格，失败时返回错误说明"""
+        status = self.status(row, col)
+        if status == STATUS_INVALID:
+            return "无效地址"
+        if status != STATUS_OK:
+            return "错误"
+        value = self.get(row, col)
+        decimals = self.decimals[col]
+        whole, frac = divmod(value, 10 ** decimals)
+        if places <= 0 or decimals == 0:
+            return str(whole)
+        frac_str = str(frac).rjust(decimals, "0")[:places].ljust(places, "0")
+        return f"{whole}.{frac_str}"
+
+    def iter_rows(self, formatted: bool = True) -> Iterator[Tuple[str, List[Union[str, Optional[int]]]]]:
+        """逐行遍历 (钱包地址, [每个代币的余额])"""
+        for row, addr in enumerate(self.wallets):
+            if formatted:
+                yield addr, [self.format_cell(row, col) for col in range(len(self.tokens))]
+            else:
+                yield addr, [self.get(row, col) for col in range(len(self.tokens))]
+
+
+class TokenMatrixView:
+    """
+    TokenBalanceMatrix的显示顺序，供virtual_table.VirtualTreeview分页显示
+
+    接口与ResultTable的显示部分相同（view、view_rows、row_values、is_stale、sort）；
+    排序只重排行号数组，不复制矩阵数据。
+    """
+
+    def __init__(self, matrix: TokenBalanceMatrix):
+        self.matrix = matrix
+        self.sort_column = None
+        self.sort_descending = False
+        self.view = array('l', range(len(matrix.wallets)))
+
+    @property
+    def columns(self) -> List[str]:
+        """列名: address, token_0, token_1, ..."""
+        return ['address'] + [f"token_{col}" for col in range(len(self.matrix.tokens))]
+
+    def row_values(self, row: int) -> List[str]:
+        matrix = self.matrix
+        return [matrix.wallets[row]] + [matrix.format_cell(row, col) for col in range(len(matrix.tokens))]
+
+    def is_stale(self, row: int) -> bool:
+        return False
+
+    def view_rows(self, start: int, count: int) -> List[int]:
+        """显示顺序中第start起的count个行号"""
+        return self.view[start:start + count].tolist()
+
+    def sort(self, column: Optional[str], descending: bool = False):
+        """按钱包地址或某个代币的余额排序（None恢复原始顺序）；没有余额的行总是排在最后"""
+        matrix = self.matrix
+        rows = range(len(matrix.wallets))
+        if column == 'address':
+            rows = sorted(rows, key=lambda row: matrix.wallets[row].lower(), reverse=descending)
+        elif column is not None:
+            col = self.columns.index(column) - 1
+            if col < 0:
+                raise ValueError(f"未知的列: {column}")
+            ordered = sorted((row for row in rows if matrix.status(row, col) == STATUS_OK),
+                             key=lambda row: matrix.get(row, col), reverse=descending)
+            ordered.extend(row for row in rows if matrix.status(row, col) != STATUS_OK)
+            rows = ordered
+        self.sort_column = column
+        self.sort_descending = descending
+        self.view = array('l', rows)
+
+
+def _decode_symbol(data: bytes) -> Optional[str]:
+    """解析symbol()返回值，兼容string和bytes32两种实现"""
+    try:
+        return abi_decode(["string"], data)[0]
+    except Exception:
+        pass
+    if len(data) == 32:
+        return data.rstrip(b"\x00").decode("utf-8", errors="ignore") or None
+    return None
+
+
+def _fetch_token_metadata(
+    web3: Web3,
+    matrix: TokenBalanceMatrix,
+    multicall_address: str
+):
+    """用一次multicall获取所有有效代币的decimals和symbol"""
+    cols = [col for col, token in enumerate(matrix.tokens) if web3.is_address(token)]
+    calls = []
+    for col in cols:
+        checksum_token = web3.to_checksum_address(matrix.tokens[col])
+        calls.append((checksum_token, _SELECTOR_DECIMALS))
+        calls.append((checksum_token, _SELECTOR_SYMBOL))
+    if not calls:
+        return
+
+    results = multicall(web3, calls, multicall_address)
+    for i, col in enumerate(cols):
+        (ok_decimals, decimals_data), (ok_symbol, symbol_data) = results[2 * i], results[2 * i + 1]
+        if ok_decimals and len(decimals_data) >= 32:
+            matrix.decimals[col] = min(abi_decode(["uint256"], decimals_data[:32])[0], 255)
+        if ok_symbol:
+            symbol = _decode_symbol(symbol_data)
+            if symbol:
+                matrix.symbols[col] = symbol
+
+
+def get_token_metadata(
+    web3: Web3,
+    token_addresses: List[str],
+    multicall_address: str = MULTICALL3_ADDRESS
+) -> Dict[str, Tuple[str, int]]:
+    """
+    用一次multicall查询代币的symbol和decimals，无效的代币地址跳过
+
+    Returns:
+        字典 {代币地址: (symbol, decimals)}，查询失败的代币为默认值
+    """
+    web3 = _resolve_web3(web3)
+    if not web3:
+        raise ConnectionError("Web3未连接")
+
+    tokens = [token for token in token_addresses if web3.is_address(token)]
+    matrix = TokenBalanceMatrix([], tokens)
+    _fetch_token_metadata(web3, matrix, web3.to_checksum_address(multicall_address))
+    return {token: (matrix.symbols[col], matrix.decimals[col]) for col, token in enumerate(tokens)}
+
+
+def get_token_balance_matrix(
+    web3: Web3,
+    wallet_addresses: List[str],
+    token_addresses: List[str],
+    multicall_address: str = MULTICALL3_ADDRESS,
+    chunk_size: int = MULTICALL_CHUNK_SIZE,
+    metadata: Optional[Dict[str, Tuple[str, int]]] = None
+) -> TokenBalanceMatrix:
+    """
+    批量查询多个钱包在多个ERC-20代币上的原始余额
+
+    每个代币的decimals/symbol只查询一次，余额通过Multicall3按代币逐列填充。
+    列与token_addresses一一对应：无效的代币地址整列标记为无效地址；某一批eth_call
+    失败只把该批单元格标记为错误，错误信息记录在matrix.errors中。
+
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        wallet_addresses: 钱包地址列表
+        token_addresses: 代币合约地址列表
+        multicall_address: 聚合合约地址
+        chunk_size: 每次eth_call最多包含的调用数
+        metadata: get_token_metadata的结果；分批查询同一组代币时传入，不再重复查询
+
+    Returns:
+        TokenBalanceMatrix 对象
+    """
+    web3 = _resolve_web3(web3)
+    if not web3:
+        raise ConnectionError("Web3未连接")
+
+    matrix = TokenBalanceMatrix(wallet_addresses, token_addresses)
+    tokens = matrix.tokens
+    valid_cols = []
+    for col, token in enumerate(tokens):
+        if web3.is_address(token):
+            valid_cols.append(col)
+        else:
+            matrix.symbols[col] = "无效地址"
+            for row in range(len(matrix.wallets)):
+                matrix.set_status(row, col, STATUS_INVALID)
+    if not valid_cols:
+        return matrix
+
+    multicall_address = web3.to_checksum_address(multicall_address)
+    if metadata is None:
+        try:
+            _fetch_token_metadata(web3, matrix, multicall_address)
+        except Exception:
+            # 元数据取不到时沿用默认值（地址前缀、18位小数），余额照常查询
+            pass
+    else:
+        for col in valid_cols:
+            if tokens[col] in metadata:
+                matrix.symbols[col], matrix.decimals[col] = metadata[tokens[col]]
+
+    valid_rows = []
+    for row, addr in enumerate(matrix.wallets):
+        if web3.is_address(addr):
+            valid_rows.append(row)
+        else:
+            for col in range(len(tokens)):
+                matrix.set_status(row, col, STATUS_INVALID)
+
+    chunk_size = max(1, int(chunk_size))
+    # 逐个代币查询一列，避免一次性构造 钱包数 × 代币数 个调用；每批单独处理失败
+    for col in valid_cols:
+        for start in range(0, len(valid_rows), chunk_size):
+            rows = valid_rows[start:start + chunk_size]
+            calls = [
+                encode_balance_call(web3, matrix.wallets[row], tokens[col], multicall_address)
+                for row in rows
+            ]
+            try:
+                results = multicall(web3, calls, multicall_address, chunk_size)
+            except Exception as e:
+                matrix.errors[col] = str(e)
+                for row in rows:
+                    matrix.set_status(row, col, STATUS_ERROR)
+                continue
+            for row, (success, data) in zip(rows, results):
+                if success and len(data) >= 32:
+                    matrix.set(row, col, abi_decode(["uint256"], data[:32])[0])
+                else:
+                    matrix.set_status(row, col, STATUS_ERROR)
+
+    return matrix
@@ -0,0 +1,151 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from result_table import ResultTable
+
+# 行高无法测量时使用的默认值（像素）
+DEFAULT_ROW_HEIGHT = 20
+# 鼠标滚轮每格滚动的行数
+WHEEL_ROWS = 3
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    虚拟化的结果表格
+
+    Treeview中只保留刚好填满可见区域的若干行，滚动时改写这些行的内容，
+    数据来自ResultTable；无论结果有多少行，界面上的控件数量都不变。
+    点击列标题按该列排序，再次点击切换升序/降序。
+    """
+
+    def __init__(
+        self,
+        master,
+        table: ResultTable,
+        columns: Sequence[Tuple[str, str, int, str]],
+        on_sort: Optional[Callable[[str, bool], None]] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            master: 父控件
+            table: 数据来源（ResultTable，或显示接口相同的对象，如token_matrix.TokenMatrixView）
+            columns: [(列名, 标题, 宽度, 对齐方式), ...]，列名与ResultTable的列一致
+            on_sort: 排序后回调 (列名, 是否降序)
+        """
+        super().__init__(master, **kwargs)
+        self.table = table
+        self.on_sort = on_sort
+        self.offset = 0  # 可见区域第一行在显示顺序中的位置
+        self._items = []  # 固定的Treeview行
+        self._titles: Dict[str, str] = {}
+        self._row_height = None
+
+        names = [name for name, _, _, _ in columns]
+        self.tree = ttk.Treeview(self, columns=names, show='headings', selectmode='browse')
+        for name, title, width, anchor in columns:
+            self._titles[name] = title
+            self.tree.heading(name, text=title, command=lambda column=name: self.sort_by(column))
+            self.tree.column(name, width=width, anchor=anchor)
+
+        # 过期（来自旧区块的缓存）结果以灰色显示
+        self.tree.tag_configure('stale', foreground='gray')
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_rows(-WHEEL_ROWS))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_rows(WHEEL_ROWS))
+        self.tree.bind('<Prior>', lambda e: self._scroll_rows(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self._scroll_rows(self.visible_rows))
+        self.tree.bind('<Home>', lambda e: self.scroll_to(0))
+        self.tree.bind('<End>', lambda e: self.scroll_to(len(self.table.view)))
+
+    @property
+    def visible_rows(self) -> int:
+        return len(self._items)
+
+    def _measure_row_height(self) -> int:
+        if self._row_height is None:
+            height = ttk.Style().lookup('Treeview', 'rowheight')
+            try:
+                self._row_height = int(height) or DEFAULT_ROW_HEIGHT
+            except (TypeError, ValueError):
+                self._row_height = DEFAULT_ROW_HEIGHT
+        return self._row_height
+
+    def _on_resize(self, event):
+        """窗口大小变化时调整固定行的数量"""
+        header = 0
+        if self._items:
+            bbox = self.tree.bbox(self._items[0])
+            if bbox:
+                header = bbox[1]
+                self._row_height = bbox[3]
+        rows = max(1, (event.height - (header or self._measure_row_height() + 4)) // self._measure_row_height())
+        if rows == len(self._items):
+            return
+        while len(self._items) < rows:
+            self._items.append(self.tree.insert('', tk.END, values=()))
+        if len(self._items) > rows:
+            self.tree.delete(*self._items[rows:])
+            del self._items[rows:]
+        self.refresh()
+
+    def _on_wheel(self, event):
+        # Windows每格delta为120，macOS为1
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self._scroll_rows(-step * WHEEL_ROWS)
+        return 'break'
+
+    def _on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self.scroll_to(int(float(args[0]) * len(self.table.view)))
+        elif action == 'scroll':
+            amount, unit = int(args[0]), args[1]
+            self._scroll_rows(amount * (self.visible_rows if unit == 'pages' else 1))
+
+    def _scroll_rows(self, count: int):
+        self.scroll_to(self.offset + count)
+        return 'break'
+
+    def scroll_to(self, offset: int):
+        """滚动到显示顺序中的第offset行"""
+        offset = max(0, min(offset, len(self.table.view) - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+        return 'break'
+
+    def refresh(self):
+        """用当前可见窗口的数据改写固定行，并更新滚动条"""
+        total = len(self.table.view)
+        self.offset = max(0, min(self.offset, total - self.visible_rows))
+        rows = self.table.view_rows(self.offset, self.visible_rows)
+        for i, item in enumerate(self._items):
+            if i < len(rows):
+                row = rows[i]
+                self.tree.item(item, values=self.table.row_values(row),
+                               tags=('stale',) if self.table.is_stale(row) else ())
+            else:
+                self.tree.item(item, values=(), tags=())
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def sort_by(self, column: str):
+        """点击列标题：按该列排序，重复点击切换升序/降序"""
+        descending = self.table.sort_column == column and not self.table.sort_descending
+        self.table.sort(column, descending)
+        for name, title in self._titles.items():
+            arrow = (' ▼' if descending else ' ▲') if name == column else ''
+            self.tree.heading(name, text=title + arrow)
+        self.offset = 0
+        self.refresh()
+        if self.on_sort:
+            self.on_sort(column, descending)
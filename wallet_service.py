@@ -0,0 +1,336 @@
+"""
+本地HTTP查询服务：把钱包余额/交易数查询以JSON接口提供给其他程序
+
+并发到达的请求在几毫秒的窗口内合并为一个JSON-RPC批量请求，
+同一区块内重复的查询直接由缓存返回。
+
+接口:
+    GET  /balance?address=0x...,0x...    余额
+    GET  /nonce?address=0x...            交易数
+    POST /query  {"addresses": [...], "fields": ["balance", "transactions"]}
+    GET  /metrics                        队列深度、批量大小、缓存命中等统计
+
+示例:
+    python wallet_service.py --rpc https://testnet-rpc.monad.xyz/ --port 8650
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from defaults import DEFAULT_BATCH_SIZE, DEFAULT_RPC_URL
+from result_cache import DEFAULT_MAX_ADDRESSES, ResultCache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8650
+# 合并窗口（秒）：第一个请求到达后最多等待这么久再发送
+DEFAULT_WINDOW = 0.005
+# 单次合并的最大查询数
+DEFAULT_MAX_BATCH = 1000
+# 最新区块号的缓存时间（秒）
+DEFAULT_HEAD_TTL = 1.0
+# 单个HTTP请求等待结果的超时（秒）
+REQUEST_TIMEOUT = 30.0
+
+# 字段 -> RPC方法
+FIELD_METHODS = {
+    "balance": "eth_getBalance",
+    "transactions": "eth_getTransactionCount",
+}
+
+
+class MicroBatcher:
+    """
+    查询合并器
+
+    调用方提交 (字段, 地址) 得到Future；后台线程在窗口期内收集所有提交，
+    去重后在最新区块上发送一个批量请求，结果按 (地址, 字段, 区块号) 缓存。
+    """
+
+    def __init__(
+        self,
+        rpc,
+        window: float = DEFAULT_WINDOW,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        head_ttl: float = DEFAULT_HEAD_TTL,
+        cache_size: Optional[int] = DEFAULT_MAX_ADDRESSES
+    ):
+        """
+        Args:
+            rpc: RPCPool或Web3对象
+            window: 合并窗口（秒）
+            max_batch: 单次合并的最大查询数
+            batch_size: 每个JSON-RPC批量请求包含的调用数
+            head_ttl: 最新区块号的缓存时间（秒）
+            cache_size: 最多缓存结果的地址数，超出时淘汰最久未查询的地址；None表示不限
+        """
+        from lean_rpc import LeanRPCClient
+
+        self.rpc = rpc
+        # 合并后的批量查询走精简传输（keep-alive连接池、gzip），不经过web3的中间件
+        self.transport = LeanRPCClient(rpc)
+        self.window = window
+        self.max_batch = max_batch
+        self.batch_size = batch_size
+        self.head_ttl = head_ttl
+        self.cache = ResultCache(max_addresses=cache_size)
+        self._queue = queue.Queue()
+        self._head = None
+        self._head_time = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # 统计
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.rpc_calls = 0
+        self.max_batch_seen = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(1.0)
+
+    # ---- 提交 ----
+
+    def _cached(self, field: str, address: str) -> Optional[Any]:
+        """当前区块已查询过时返回缓存值"""
+        with self._lock:
+            head, fresh = self._head, time.monotonic() - self._head_time < self.head_ttl
+        if head is None or not fresh:
+            return None
+        entry = self.cache.get(address, field)
+        if entry is not None and entry[1] >= head:
+            return entry[0]
+        return None
+
+    def submit(self, field: str, address: str) -> Future:
+        # 缓存和合并都按小写地址，大小写不同的同一地址共享结果
+        address = address.lower()
+        future = Future()
+        with self._lock:
+            self.requests += 1
+        value = self._cached(field, address)
+        if value is not None:
+            with self._lock:
+                self.cache_hits += 1
+            future.set_result(value)
+        else:
+            self._queue.put((field, address, future))
+        return future
+
+    def query(self, addresses: List[str], fields: List[str], timeout: float = REQUEST_TIMEOUT) -> Dict[str, Dict[str, Any]]:
+        """查询多个地址的多个字段，返回 {地址: {字段: 值}}"""
+        from lean_rpc import is_address
+
+        futures = {}
+        results = {}
+        for addr in addresses:
+            if not is_address(addr):
+                results[addr] = {field: "无效地址" for field in fields}
+                continue
+            for field in fields:
+                futures[(addr, field)] = self.submit(field, addr)
+        for (addr, field), future in futures.items():
+            results.setdefault(addr, {})[field] = future.result(timeout)
+        return {addr: results[addr] for addr in addresses}
+
+    # ---- 后台发送 ----
+
+    def current_head(self) -> int:
+        with self._lock:
+            if self._head is not None and time.monotonic() - self._head_time < self.head_ttl:
+                return self._head
+        from wallet_utils import _resolve_web3
+        head = _resolve_web3(self.rpc).eth.block_number
+        with self._lock:
+            self._head = max(head, self._head or 0)
+            self._head_time = time.monotonic()
+            return self._head
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            items = [first]
+            deadline = time.monotonic() + self.window
+            while len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._dispatch(items)
+            except Exception as e:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_result(f"错误: {str(e)}")
+
+    def _dispatch(self, items: list):
+        from lean_rpc import address_param, format_balance
+        from wallet_utils import rpc_batch
+
+        head = self.current_head()
+        pending = {}
+        for field, address, future in items:
+            entry = self.cache.get(address, field)
+            if entry is not None and entry[1] >= head:
+                with self._lock:
+                    self.cache_hits += 1
+                future.set_result(entry[0])
+            else:
+                pending.setdefault((address, field), []).append(future)
+        if not pending:
+            return
+
+        keys = list(pending)
+        block = hex(head)
+        calls = [(FIELD_METHODS[field], [address_param(addr), block]) for addr, field in keys]
+        values = rpc_batch(None, calls, self.batch_size, transport=self.transport)
+        with self._lock:
+            self.batches += 1
+            self.rpc_calls += len(calls)
+            self.max_batch_seen = max(self.max_batch_seen, len(calls))
+
+        updates = {field: {} for field in FIELD_METHODS}
+        for (address, field), value in zip(keys, values):
+            if isinstance(value, Exception):
+                result = f"错误: {str(value)}"
+            else:
+                try:
+                    raw = int(value, 16)
+                    result = format_balance(raw) if field == "balance" else raw
+                except Exception as e:
+                    result = f"错误: {str(e)}"
+            updates[field][address] = result
+            for future in pending[(address, field)]:
+                future.set_result(result)
+        for field, field_values in updates.items():
+            if field_values:
+                self.cache.update(field, field_values, head)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "batches": self.batches,
+                "rpc_calls": self.rpc_calls,
+                "avg_batch_size": round(self.rpc_calls / self.batches, 2) if self.batches else 0,
+                "max_batch_size": self.max_batch_seen,
+                "head": self._head,
+                "cached_addresses": len(self.cache),
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    batcher: MicroBatcher = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: Any):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _query(self, addresses: List[str], fields: List[str]):
+        addresses = [addr.strip() for addr in addresses if addr and addr.strip()]
+        if not addresses:
+            self._reply(400, {"error": "缺少address参数"})
+            return
+        unknown = [field for field in fields if field not in FIELD_METHODS]
+        if unknown:
+            self._reply(400, {"error": f"未知的字段: {', '.join(unknown)}"})
+            return
+        try:
+            results = self.batcher.query(addresses, fields)
+        except Exception as e:
+            self._reply(502, {"error": str(e)})
+            return
+        self._reply(200, {"block": self.batcher.metrics()["head"], "results": results})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        addresses = [addr for value in params.get("address", []) for addr in value.split(",")]
+        if url.path == "/balance":
+            self._query(addresses, ["balance"])
+        elif url.path == "/nonce":
+            self._query(addresses, ["transactions"])
+        elif url.path == "/metrics":
+            self._reply(200, self.batcher.metrics())
+        else:
+            self._reply(404, {"error": "未知的接口"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/query":
+            self._reply(404, {"error": "未知的接口"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            addresses = list(body.get("addresses") or [])
+            fields = list(body.get("fields") or FIELD_METHODS)
+        except (ValueError, AttributeError, TypeError):
+            self._reply(400, {"error": "请求体不是有效的JSON"})
+            return
+        self._query(addresses, fields)
+
+
+def create_server(batcher: MicroBatcher, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """创建HTTP服务（调用serve_forever开始处理请求）"""
+    handler = type("WalletServiceHandler", (_Handler,), {"batcher": batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="wallet_service", description="本地钱包查询HTTP服务（请求合并 + 区块缓存）")
+    parser.add_argument("--rpc", action="append", dest="rpc_urls", metavar="URL", help="RPC节点URL，可重复指定多个")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址（默认{DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口（默认{DEFAULT_PORT}）")
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW * 1000, help="请求合并窗口（毫秒）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="每个JSON-RPC批量请求包含的调用数")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ADDRESSES,
+                        help=f"最多缓存结果的地址数（默认{DEFAULT_MAX_ADDRESSES}）")
+    args = parser.parse_args(argv)
+
+    from rpc_pool import RPCPool
+
+    pool = RPCPool(args.rpc_urls or [DEFAULT_RPC_URL])
+    batcher = MicroBatcher(
+        pool, window=args.window_ms / 1000, batch_size=args.batch_size, cache_size=args.cache_size
+    )
+    server = create_server(batcher, args.host, args.port)
+    print(f"钱包查询服务已启动: http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from result_cache import is_error_value
+
+# 默认数据库位置
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "wallets.db")
+
+# 可保存的查询结果字段 -> (值列, 区块号列)
+RESULT_COLUMNS = {
+    "balance": ("balance", "balance_block"),
+    "transactions": ("tx_count", "tx_block"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS wallets (
+    position INTEGER PRIMARY KEY,
+    address TEXT NOT NULL,
+    address_key TEXT NOT NULL UNIQUE,
+    label TEXT NOT NULL DEFAULT '',
+    wallet_group TEXT NOT NULL DEFAULT '',
+    balance TEXT,
+    balance_block INTEGER,
+    tx_count INTEGER,
+    tx_block INTEGER
+);
+"""
+
+
+def address_key(address: str) -> str:
+    """去重用的键：十六进制地址不区分大小写"""
+    return address.lower()
+
+
+class WalletStore:
+    """
+    基于SQLite的钱包列表
+
+    保存地址、标签、分组和最近一次的查询结果（按区块号标记）。
+    地址列表和去重索引常驻内存，判断地址是否已存在为O(1)；
+    每次添加、修改或清空都在一个事务中完成，只写入变化的行，不再整文件重写。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.addresses: List[str] = []  # 按添加顺序
+        self._index: Dict[str, int] = {}  # 地址键 -> 在addresses中的位置
+        self._labels: Dict[str, str] = {}  # 只保存非空标签
+        self._groups: Dict[str, str] = {}
+        for address, label, group in self._conn.execute(
+            "SELECT address, label, wallet_group FROM wallets ORDER BY position"
+        ):
+            self._remember(address, label, group)
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def __contains__(self, address: str) -> bool:
+        return address_key(address) in self._index
+
+    def _remember(self, address: str, label: str, group: str):
+        self._index[address_key(address)] = len(self.addresses)
+        self.addresses.append(address)
+        if label:
+            self._labels[address] = label
+        if group:
+            self._groups[address] = group
+
+    @property
+    def labels(self) -> Dict[str, str]:
+        """{地址: 标签}，只包含有标签的地址"""
+        return self._labels
+
+    @property
+    def groups(self) -> Dict[str, str]:
+        """{地址: 分组}，只包含有分组的地址"""
+        return self._groups
+
+    def label(self, address: str) -> str:
+        return self._labels.get(address, '')
+
+    def group(self, address: str) -> str:
+        return self._groups.get(address, '')
+
+    def add_many(self, entries: Iterable, label: str = '', group: str = '') -> List[str]:
+        """
+        添加地址（一个事务），已存在的地址（不区分大小写）被跳过
+
+        Args:
+            entries: 地址，或 (地址, 标签, 分组) 元组
+            label: 未单独指定时使用的标签
+            group: 未单独指定时使用的分组
+
+        Returns:
+            新添加的地址
+        """
+        rows = []
+        added = []
+        with self._lock:
+            for entry in entries:
+                if isinstance(entry, str):
+                    address, entry_label, entry_group = entry, label, group
+                else:
+                    address, entry_label, entry_group = (tuple(entry) + ('', ''))[:3]
+                    entry_label = entry_label or label
+                    entry_group = entry_group or group
+                key = address_key(address)
+                if key in self._index:
+                    continue
+                self._remember(address, entry_label, entry_group)
+                rows.append((address, key, entry_label, entry_group))
+                added.append(address)
+            if rows:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO wallets (address, address_key, label, wallet_group) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+        return added
+
+    def set_label(self, address: str, label: str = '', group: Optional[str] = None):
+        """修改地址的标签（以及分组，None表示不修改）"""
+        with self._lock:
+            if address_key(address) not in self._index:
+                return
+            with self._conn:
+                self._conn.execute("UPDATE wallets SET label = ? WHERE address_key = ?", (label, address_key(address)))
+                if group is not None:
+                    self._conn.execute(
+                        "UPDATE wallets SET wallet_group = ? WHERE address_key = ?", (group, address_key(address))
+                    )
+            self._labels.pop(address, None)
+            if label:
+                self._labels[address] = label
+            if group is not None:
+                self._groups.pop(address, None)
+                if group:
+                    self._groups[address] = group
+
+    def clear(self):
+        """删除所有地址及其查询结果"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM wallets")
+            self.addresses = []
+            self._index = {}
+            self._labels = {}
+            self._groups = {}
+
+    @property
+    def chain_id(self) -> Optional[int]:
+        """已保存的查询结果所属的链，未知时为None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'chain_id'").fetchone()
+        return row[0] if row else None
+
+    def save_results(self, field: str, values: Dict[str, Any], block_number: int, chain_id: Optional[int] = None):
+        """
+        保存一批查询结果（一个事务），错误信息和比已保存结果更旧的值被忽略
+
+        Args:
+            field: 字段名（RESULT_COLUMNS的键）
+            values: {地址: 值}
+            block_number: 查询时的区块号
+            chain_id: 结果所属的链；与已保存结果的链不同时，先清空所有已保存的结果
+                （不同链的区块号不可比较）。None表示沿用已保存的链
+        """
+        value_column, block_column = RESULT_COLUMNS[field]
+        rows = [
+            (value, block_number, address_key(addr), block_number)
+            for addr, value in values.items() if not is_error_value(value)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                if chain_id is not None:
+                    row = self._conn.execute("SELECT value FROM meta WHERE key = 'chain_id'").fetchone()
+                    if row is None or row[0] != chain_id:
+                        columns = ", ".join(f"{column} = NULL" for pair in RESULT_COLUMNS.values() for column in pair)
+                        self._conn.execute(f"UPDATE wallets SET {columns}")
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO meta (key, value) VALUES ('chain_id', ?)", (chain_id,)
+                        )
+                self._conn.executemany(
+                    f"UPDATE wallets SET {value_column} = ?, {block_column} = ? "
+                    f"WHERE address_key = ? AND ({block_column} IS NULL OR {block_column} <= ?)",
+                    rows
+                )
+
+    def results(self, field: str) -> Dict[int, Dict[str, Any]]:
+        """已保存的结果，按区块号分组: {区块号: {地址: 值}}"""
+        value_column, block_column = RESULT_COLUMNS[field]
+        grouped = {}
+        with self._lock:
+            for address, value, block in self._conn.execute(
+                f"SELECT address, {value_column}, {block_column} FROM wallets "
+                f"WHERE {block_column} IS NOT NULL ORDER BY position"
+            ):
+                grouped.setdefault(block, {})[address] = value
+        return grouped
+
+    def import_legacy(self, wallets_path: str, results_path: Optional[str] = None) -> int:
+        """
+        从旧版的wallets.json（以及results.json快照）导入，返回导入的地址数
+
+        每个数据库只导入一次（之后清空列表也不会重新导入）；旧文件保留不动。
+        """
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone()
+        if row or self.addresses or not os.path.exists(wallets_path):
+            return 0
+        with open(wallets_path, 'r') as f:
+            added = self.add_many(str(addr) for addr in json.load(f))
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', 1)")
+        if results_path and os.path.exists(results_path):
+            # 旧版快照: {"entries": {地址: {字段: [值, 区块号]}}}，没有记录链
+            with open(results_path, 'r') as f:
+                entries = json.load(f).get("entries", {})
+            for field in RESULT_COLUMNS:
+                by_block = {}
+                for addr in added:
+                    entry = entries.get(addr, {}).get(field)
+                    if entry:
+                        by_block.setdefault(entry[1], {})[addr] = entry[0]
+                for block, values in by_block.items():
+                    self.save_results(field, values, block)
+        return len(added)
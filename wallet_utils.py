@@ -1,25 +1,340 @@
 from web3 import Web3
-from typing import List, Dict, Any, Optional, Union, Tuple
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Callable, Iterator, Optional, Union, Tuple
+from datetime import date, datetime, timedelta
+import threading
 import time
-import math
+import weakref
+import requests
+from eth_abi import encode as abi_encode, decode as abi_decode
+from defaults import DEFAULT_BATCH_SIZE
+from chain_cache import cached_batch
+from single_flight import get_single_flight, request_scope
+from rate_limit import (
+    RateLimitError, get_limiter, parse_retry_after, is_rate_limited, is_transient,
+    backoff_delay, MAX_RETRIES
+)
 
-def get_wallet_balances(web3: Web3, wallet_addresses: List[str]) -> Dict[str, Union[float, str]]:
+# Multicall3聚合合约地址（各主流链及Monad测试网均部署在同一地址）
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+# 每次eth_call打包的最大调用数
+MULTICALL_CHUNK_SIZE = 500
+# 拆小后可能成功的聚合调用错误：执行失败、gas不足、请求/响应过大
+_MULTICALL_SPLIT_MESSAGES = (
+    "gas", "execution", "revert", "too large", "too big", "response size", "exceeds", "payload"
+)
+
+# 批量请求过大时节点返回的错误（HTTP 413、批量条数或响应大小超限），拆成两半后可能成功
+_BATCH_SPLIT_MESSAGES = ("too large", "batch size", "batch limit", "response size")
+
+# 函数选择器
+_SELECTOR_AGGREGATE3 = bytes.fromhex("82ad56cb")      # aggregate3((address,bool,bytes)[])
+_SELECTOR_GET_ETH_BALANCE = bytes.fromhex("4d2301cc")  # getEthBalance(address)
+_SELECTOR_BALANCE_OF = bytes.fromhex("70a08231")       # balanceOf(address)
+
+# 复用HTTP连接（keep-alive），避免每批请求重新建立连接
+_http_session = requests.Session()
+
+# 因请求过大拆分过批量的节点: provider或transport -> 拆分后的批量大小上限
+_batch_limits = weakref.WeakKeyDictionary()
+
+
+class RPCError(Exception):
+    """JSON-RPC节点返回的错误"""
+    
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class MulticallError(Exception):
+    """聚合合约不可用（未部署或地址错误）"""
+
+
+def _resolve_web3(web3):
+    """
+    统一得到Web3对象
+    
+    wallet_utils中的函数既接受Web3对象，也接受RPCPool这类提供as_web3()的连接池。
+    """
+    as_web3 = getattr(web3, "as_web3", None)
+    return as_web3() if as_web3 else web3
+
+
+def _format_balance(web3: Web3, balance_wei: int) -> str:
+    """将wei余额转换为Ether并格式化为5位小数的字符串"""
+    balance_ether = web3.from_wei(balance_wei, 'ether')
+    return "{:.5f}".format(float(balance_ether))
+
+
+def _post_batch(sender: Any, calls: List[Tuple[str, list]]) -> List[Any]:
+    """
+    发送一个JSON-RPC批量请求
+    
+    已启用链上数据缓存时命中的调用不再发送；与其他线程在途请求相同的调用共享其结果。
+    
+    Args:
+        sender: web3的provider（HTTP节点或RPCPool），或rpc_batch的transport
+        calls: [(方法名, 参数列表), ...]
+        
+    Returns:
+        与calls顺序一致的结果列表，单个调用失败时对应位置为RPCError
+    """
+    flight = get_single_flight()
+    # 只与发往同一节点的相同调用合并
+    scope = request_scope(sender)
+    return cached_batch(
+        calls, lambda missing: flight.do_batch(missing, lambda unique: _send_batch(sender, unique), scope),
+        sender
+    )
+
+
+def _send_batch(provider: Any, calls: List[Tuple[str, list]]) -> List[Any]:
+    """通过provider或transport发送批量请求"""
+    # 连接池、精简传输等自行选择节点发送
+    send_batch = getattr(provider, "send_batch", None)
+    if send_batch:
+        return send_batch(calls)
+    
+    payload = encode_batch(calls)
+    
+    request_kwargs = {}
+    if hasattr(provider, "get_request_kwargs"):
+        request_kwargs = dict(provider.get_request_kwargs())
+    request_kwargs.setdefault("timeout", 30)
+    
+    limiter = get_limiter(provider.endpoint_uri)
+    limiter.acquire()
+    try:
+        response = _http_session.post(provider.endpoint_uri, json=payload, **request_kwargs)
+        if response.status_code == 429:
+            raise RateLimitError(retry_after=parse_retry_after(response.headers.get("Retry-After")))
+        response.raise_for_status()
+        results = parse_batch_response(response.json(), len(calls))
+    except Exception as e:
+        limiter.report(e)
+        raise
+    
+    # 批内单个调用被限流时同样降速
+    limiter.report(next((r for r in results if isinstance(r, Exception) and is_rate_limited(r)), None))
+    return results
+
+
+def encode_batch(calls: List[Tuple[str, list]]) -> List[Dict[str, Any]]:
+    """将 [(方法名, 参数列表), ...] 编码为JSON-RPC批量请求体，id为调用下标"""
+    return [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+        for i, (method, params) in enumerate(calls)
+    ]
+
+
+def parse_batch_response(data: Any, count: int) -> List[Any]:
+    """
+    解析JSON-RPC批量响应
+    
+    Args:
+        data: 节点返回的JSON数据
+        count: 请求中的调用数（id为0..count-1）
+        
+    Returns:
+        按id排列的结果列表，单个调用失败时对应位置为RPCError
+    """
+    # 部分节点对整个批量请求只返回一个错误对象
+    if isinstance(data, dict):
+        error = data.get("error") or {}
+        raise RPCError(error.get("message", str(data)), error.get("code"))
+    
+    # 节点返回的顺序不一定与请求一致，按id映射回去
+    by_id = {item.get("id"): item for item in data}
+    results = []
+    for i in range(count):
+        item = by_id.get(i)
+        if item is None:
+            results.append(RPCError("节点未返回该请求的结果"))
+        elif item.get("error"):
+            error = item["error"]
+            results.append(RPCError(error.get("message", str(error)), error.get("code")))
+        else:
+            results.append(item.get("result"))
+    return results
+
+
+def _is_batch_split_error(error: Exception) -> bool:
+    """整批请求失败的原因是否为请求或响应过大"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 413:
+        return True
+    message = str(error).lower()
+    return any(text in message for text in _BATCH_SPLIT_MESSAGES)
+
+
+def rpc_batch(
+    web3: Web3,
+    calls: List[Tuple[str, list]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_retries: int = MAX_RETRIES,
+    transport: Any = None
+) -> List[Any]:
+    """
+    将多个JSON-RPC调用按batch_size分组，以批量请求的方式发送
+    
+    因限流、超时等临时错误失败的调用会重新排队，退避后重试，
+    超过max_retries次仍失败才作为错误返回。整批因请求过大（HTTP 413等）被拒绝时
+    对半拆分后立即重发，拆出的批次仍过大时继续拆分；之后发往该节点的批次
+    （包括以后的调用）按拆分后的大小发送。
+    
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        calls: [(方法名, 参数列表), ...]
+        batch_size: 每个批量请求包含的调用数
+        max_retries: 临时错误的最大重试轮数
+        transport: 代替web3的provider发送批量请求的传输（需提供send_batch，
+            如lean_rpc.LeanRPCClient），指定时web3可以为None
+        
+    Returns:
+        与calls顺序一致的结果列表，失败的调用对应位置为异常对象
+    """
+    sender = transport if transport is not None else _resolve_web3(web3).provider
+    batch_size = max(1, int(batch_size))
+    try:
+        batch_size = min(batch_size, _batch_limits.get(sender, batch_size))
+    except TypeError:
+        pass
+    results = [None] * len(calls)
+    pending = list(range(len(calls)))
+    
+    def post(indexes):
+        nonlocal batch_size
+        try:
+            return _post_batch(sender, [calls[i] for i in indexes])
+        except Exception as e:
+            if len(indexes) > 1 and not is_rate_limited(e) and _is_batch_split_error(e):
+                middle = (len(indexes) + 1) // 2
+                batch_size = min(batch_size, middle)
+                try:
+                    _batch_limits[sender] = batch_size
+                except TypeError:
+                    pass
+                return post(indexes[:middle]) + post(indexes[middle:])
+            # 整批失败时，该批内每个调用都记为同一个错误
+            return [e] * len(indexes)
+    
+    for attempt in range(max_retries + 1):
+        retry = []
+        start = 0
+        while start < len(pending):
+            indexes = pending[start:start + batch_size]
+            start += len(indexes)
+            values = post(indexes)
+            for i, value in zip(indexes, values):
+                results[i] = value
+                if isinstance(value, Exception) and is_transient(value):
+                    retry.append(i)
+        
+        if not retry or attempt == max_retries:
+            break
+        # 失败的调用重新排队，退避后重试
+        time.sleep(backoff_delay(attempt))
+        pending = retry
+    
+    return results
+
+
+def _iter_query_by_address_batch(
+    web3: Web3,
+    wallet_addresses: List[str],
+    method: str,
+    convert,
+    batch_size: int,
+    cancel: Optional[threading.Event] = None
+) -> Iterator[Dict[str, Union[int, str]]]:
+    """
+    按地址批量调用 method(addr, 'latest')，每完成一个批量请求产出该批的 {地址: 值 | 错误信息}
+    
+    无效地址在第一批之前一次性产出；cancel置位后不再发送后续批次。
+    """
+    invalid = {}
+    valid = []
+    for addr in wallet_addresses:
+        if web3.is_address(addr):
+            valid.append(addr)
+        else:
+            invalid[addr] = "无效地址"
+    if invalid:
+        yield invalid
+    
+    batch_size = max(1, int(batch_size))
+    for start in range(0, len(valid), batch_size):
+        if cancel is not None and cancel.is_set():
+            return
+        chunk = valid[start:start + batch_size]
+        calls = [(method, [web3.to_checksum_address(addr), "latest"]) for addr in chunk]
+        results = {}
+        for addr, value in zip(chunk, rpc_batch(web3, calls, batch_size)):
+            if isinstance(value, Exception):
+                results[addr] = f"错误: {str(value)}"
+            else:
+                try:
+                    results[addr] = convert(int(value, 16))
+                except Exception as e:
+                    results[addr] = f"错误: {str(e)}"
+        yield results
+
+
+def _query_by_address_batch(
+    web3: Web3,
+    wallet_addresses: List[str],
+    method: str,
+    convert,
+    batch_size: int,
+    on_batch: Optional[Callable[[Dict[str, Union[int, str]]], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict[str, Union[int, str]]:
+    """按地址批量调用 method(addr, 'latest')，并映射回 {地址: 值 | 错误信息}"""
+    results = {}
+    for batch in _iter_query_by_address_batch(web3, wallet_addresses, method, convert, batch_size, cancel):
+        results.update(batch)
+        if on_batch:
+            on_batch(batch)
+    
+    # 保持与输入一致的顺序（取消时跳过未查询的地址）
+    return {addr: results[addr] for addr in wallet_addresses if addr in results}
+
+
+def get_wallet_balances(
+    web3: Web3,
+    wallet_addresses: List[str],
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[Dict[str, Union[float, str]]], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict[str, Union[float, str]]:
     """
     批量查询以太坊地址余额
     
     Args:
-        web3: Web3对象，已连接到RPC节点
+        web3: Web3对象或RPCPool，已连接到RPC节点
         wallet_addresses: 钱包地址列表
+        batch_size: 每个JSON-RPC批量请求包含的地址数，为None时逐个查询
+        on_batch: 每完成一批（逐个查询时为每个地址）以该批结果调用
+        cancel: 置位后不再发送后续请求，返回已完成的部分结果
         
     Returns:
         字典 {地址: 余额(Ether)} 或 {地址: 错误信息}
     """
-    if not web3 or not web3.is_connected():
+    web3 = _resolve_web3(web3)
+    if not web3:
         raise ConnectionError("Web3未连接")
     
+    if batch_size:
+        return _query_by_address_batch(
+            web3, wallet_addresses, "eth_getBalance",
+            lambda wei: _format_balance(web3, wei), batch_size,
+            on_batch=on_batch, cancel=cancel
+        )
+    
     results = {}
     for addr in wallet_addresses:
+        if cancel is not None and cancel.is_set():
+            break
         try:
             # 确保地址格式正确
             if web3.is_address(addr):
@@ -27,33 +342,50 @@ def get_wallet_balances(web3: Web3, wallet_addresses: List[str]) -> Dict[str, Un
                 # 获取余额（以wei为单位）
                 balance_wei = web3.eth.get_balance(checksum_addr)
                 # 转换为Ether并格式化为5位小数的字符串
-                balance_ether = web3.from_wei(balance_wei, 'ether')
-                # 将浮点数格式化为5位小数字符串
-                formatted_balance = "{:.5f}".format(float(balance_ether))
-                results[addr] = formatted_balance
+                results[addr] = _format_balance(web3, balance_wei)
             else:
                 results[addr] = "无效地址"
         except Exception as e:
             results[addr] = f"错误: {str(e)}"
+        if on_batch:
+            on_batch({addr: results[addr]})
             
     return results
 
-def get_transaction_count(web3: Web3, wallet_addresses: List[str]) -> Dict[str, Union[int, str]]:
+def get_transaction_count(
+    web3: Web3,
+    wallet_addresses: List[str],
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[Dict[str, Union[int, str]]], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict[str, Union[int, str]]:
     """
     获取钱包地址的交易数量
     
     Args:
-        web3: Web3对象，已连接到RPC节点
+        web3: Web3对象或RPCPool，已连接到RPC节点
         wallet_addresses: 钱包地址列表
+        batch_size: 每个JSON-RPC批量请求包含的地址数，为None时逐个查询
+        on_batch: 每完成一批（逐个查询时为每个地址）以该批结果调用
+        cancel: 置位后不再发送后续请求，返回已完成的部分结果
         
     Returns:
         字典 {地址: 交易数} 或 {地址: 错误信息}
     """
-    if not web3 or not web3.is_connected():
+    web3 = _resolve_web3(web3)
+    if not web3:
         raise ConnectionError("Web3未连接")
     
+    if batch_size:
+        return _query_by_address_batch(
+            web3, wallet_addresses, "eth_getTransactionCount", int, batch_size,
+            on_batch=on_batch, cancel=cancel
+        )
+    
     results = {}
     for addr in wallet_addresses:
+        if cancel is not None and cancel.is_set():
+            break
         try:
             # 确保地址格式正确
             if web3.is_address(addr):
@@ -65,17 +397,447 @@ def get_transaction_count(web3: Web3, wallet_addresses: List[str]) -> Dict[str,
                 results[addr] = "无效地址"
         except Exception as e:
             results[addr] = f"错误: {str(e)}"
+        if on_batch:
+            on_batch({addr: results[addr]})
             
     return results
 
-def get_wallet_activity(web3: Web3, wallet_addresses: List[str], max_blocks: int = 10000) -> Dict[str, Dict[str, Any]]:
+def _multicall_chunk(
+    web3: Web3,
+    calls: List[Tuple[str, bytes]],
+    multicall_address: str,
+    block_identifier: Union[str, int]
+) -> List[Tuple[bool, bytes]]:
+    """对一组调用执行一次 aggregate3 eth_call"""
+    call_data = _SELECTOR_AGGREGATE3 + abi_encode(
+        ["(address,bool,bytes)[]"],
+        [[(target, True, data) for target, data in calls]]
+    )
+    block = hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+    # 与rpc_batch相同经过限速器、链上数据缓存和请求合并，不走web3.eth.call
+    params = [{"to": multicall_address, "data": "0x" + call_data.hex()}, block]
+    (raw,) = _post_batch(web3.provider, [("eth_call", params)])
+    if isinstance(raw, Exception):
+        raise raw
+    raw = bytes.fromhex(raw[2:]) if raw else b""
+    if not raw:
+        # 地址上没有合约代码时eth_call返回空数据，拆分重试没有意义
+        raise MulticallError(f"聚合合约 {multicall_address} 无返回数据，请确认该链已部署Multicall3")
+    (results,) = abi_decode(["(bool,bytes)[]"], bytes(raw))
+    return [(bool(success), bytes(data)) for success, data in results]
+
+
+def _is_multicall_split_error(error: Exception) -> bool:
+    """聚合调用整批失败的原因是否可能通过拆成更小的批次解决"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 413:
+        return True
+    message = str(error).lower()
+    return any(text in message for text in _MULTICALL_SPLIT_MESSAGES)
+
+
+def multicall(
+    web3: Web3,
+    calls: List[Tuple[str, bytes]],
+    multicall_address: str = MULTICALL3_ADDRESS,
+    chunk_size: int = MULTICALL_CHUNK_SIZE,
+    block_identifier: Union[str, int] = "latest"
+) -> List[Tuple[bool, bytes]]:
+    """
+    通过Multicall3的aggregate3把多个只读调用合并为少量eth_call
+    
+    超出gas上限、执行失败或响应过大导致整批失败时，自动将该批拆成两半重试，
+    拆到单个调用仍失败的记为失败；连接失败、超时、限流等临时错误退避后重试，
+    超过重试次数后向上抛出，不拆分。
+    
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        calls: [(目标合约地址, calldata), ...]
+        multicall_address: 聚合合约地址
+        chunk_size: 每次eth_call最多包含的调用数
+        block_identifier: 查询的区块
+        
+    Returns:
+        与calls顺序一致的 [(是否成功, 返回数据), ...]
+    """
+    web3 = _resolve_web3(web3)
+    multicall_address = web3.to_checksum_address(multicall_address)
+    chunk_size = max(1, int(chunk_size))
+    results = []
+    
+    def run(chunk):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                results.extend(_multicall_chunk(web3, chunk, multicall_address, block_identifier))
+                return
+            except MulticallError:
+                raise
+            except Exception as e:
+                # 先判断拆分：413、gas不足、执行失败、响应过大在原样重试时必然再次失败
+                if not is_rate_limited(e) and _is_multicall_split_error(e):
+                    split(chunk)
+                    return
+                if not is_transient(e):
+                    raise
+                # 连接失败、超时、限流、5xx：退避后原样重试，拆分无济于事
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(backoff_delay(attempt))
+    
+    def split(chunk):
+        if len(chunk) == 1:
+            results.append((False, b""))
+            return
+        middle = len(chunk) // 2
+        run(chunk[:middle])
+        run(chunk[middle:])
+    
+    for start in range(0, len(calls), chunk_size):
+        run(calls[start:start + chunk_size])
+    return results
+
+
+def encode_balance_call(web3: Web3, wallet_address: str, token_address: Optional[str], multicall_address: str) -> Tuple[str, bytes]:
+    """构造查询余额的调用：原生币走聚合合约的getEthBalance，ERC-20走balanceOf"""
+    encoded_wallet = abi_encode(["address"], [web3.to_checksum_address(wallet_address)])
+    if token_address is None:
+        return multicall_address, _SELECTOR_GET_ETH_BALANCE + encoded_wallet
+    return web3.to_checksum_address(token_address), _SELECTOR_BALANCE_OF + encoded_wallet
+
+
+def get_raw_balances_multicall(
+    web3: Web3,
+    wallet_addresses: List[str],
+    token_address: Optional[str] = None,
+    multicall_address: str = MULTICALL3_ADDRESS,
+    chunk_size: int = MULTICALL_CHUNK_SIZE,
+    block_identifier: Union[str, int] = "latest"
+) -> Dict[str, Union[int, str]]:
+    """
+    使用Multicall3批量查询原始余额（最小单位整数）
+    
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        wallet_addresses: 钱包地址列表
+        token_address: ERC-20代币地址，为None时查询原生币余额
+        multicall_address: 聚合合约地址
+        chunk_size: 每次eth_call最多包含的调用数
+        block_identifier: 查询的区块
+        
+    Returns:
+        字典 {地址: 原始余额} 或 {地址: 错误信息}
+    """
+    web3 = _resolve_web3(web3)
+    if not web3:
+        raise ConnectionError("Web3未连接")
+    
+    multicall_address = web3.to_checksum_address(multicall_address)
+    results = {}
+    valid = []
+    for addr in wallet_addresses:
+        if web3.is_address(addr):
+            valid.append(addr)
+        else:
+            results[addr] = "无效地址"
+    
+    calls = [encode_balance_call(web3, addr, token_address, multicall_address) for addr in valid]
+    chunk_size = max(1, int(chunk_size))
+    call_results = []
+    # 逐批调用，某一批失败只影响该批地址
+    for start in range(0, len(calls), chunk_size):
+        chunk = calls[start:start + chunk_size]
+        try:
+            call_results.extend(multicall(web3, chunk, multicall_address, chunk_size, block_identifier))
+        except MulticallError as e:
+            # 聚合合约不可用，其余批次同样会失败
+            call_results.extend([e] * (len(calls) - start))
+            break
+        except Exception as e:
+            call_results.extend([e] * len(chunk))
+    
+    for addr, outcome in zip(valid, call_results):
+        if isinstance(outcome, Exception):
+            results[addr] = f"错误: {str(outcome)}"
+            continue
+        success, data = outcome
+        if success and len(data) >= 32:
+            results[addr] = abi_decode(["uint256"], data[:32])[0]
+        else:
+            results[addr] = "错误: 调用失败"
+    
+    return {addr: results[addr] for addr in wallet_addresses}
+
+
+def get_wallet_balances_multicall(
+    web3: Web3,
+    wallet_addresses: List[str],
+    multicall_address: str = MULTICALL3_ADDRESS,
+    chunk_size: int = MULTICALL_CHUNK_SIZE
+) -> Dict[str, Union[float, str]]:
+    """
+    使用Multicall3批量查询原生币余额，返回格式与 get_wallet_balances 相同
+    
+    每次eth_call查询chunk_size个地址，比按地址的批量请求少得多；命令行工具的
+    --multicall选项使用它查询余额。
+    
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        wallet_addresses: 钱包地址列表
+        multicall_address: 聚合合约地址
+        chunk_size: 每次eth_call最多包含的调用数
+        
+    Returns:
+        字典 {地址: 余额(Ether)} 或 {地址: 错误信息}
+    """
+    web3 = _resolve_web3(web3)
+    raw = get_raw_balances_multicall(
+        web3, wallet_addresses,
+        multicall_address=multicall_address, chunk_size=chunk_size
+    )
+    return {
+        addr: _format_balance(web3, value) if isinstance(value, int) else value
+        for addr, value in raw.items()
+    }
+
+def find_first_last_tx_blocks(
+    web3: Web3,
+    wallet_addresses: List[str],
+    to_block: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, Union[Tuple[int, int, int], str]]:
+    """
+    用交易数二分查找钱包第一笔和最后一笔交易所在的区块
+    
+    nonce随区块单调不减：第一笔交易所在区块是 nonce(b) >= 1 的最小b，
+    最后一笔是 nonce(b) >= nonce(最新区块) 的最小b。所有钱包的二分同步推进，
+    每一步把全部钱包的中点查询打包成一次批量请求，约log2(区块高度)步完成。
+    需要节点支持查询历史区块状态（归档节点）。
+    
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        wallet_addresses: 钱包地址列表（需为有效地址）
+        to_block: 查询截止区块，默认为最新区块
+        batch_size: 每个JSON-RPC批量请求包含的调用数
+        
+    Returns:
+        字典 {地址: (交易数, 第一笔交易区块, 最后一笔交易区块)}，无交易时区块为-1，失败时为错误信息
+    """
+    web3 = _resolve_web3(web3)
+    if to_block is None:
+        to_block = web3.eth.block_number
+    
+    results = {}
+    head_nonces = rpc_batch(
+        web3,
+        [("eth_getTransactionCount", [web3.to_checksum_address(addr), hex(to_block)]) for addr in wallet_addresses],
+        batch_size
+    )
+    
+    # 每个查找任务: [地址, 目标nonce, lo, hi]，答案在 (lo, hi] 区间内
+    searches = []
+    for addr, nonce in zip(wallet_addresses, head_nonces):
+        if isinstance(nonce, Exception):
+            results[addr] = f"错误: {str(nonce)}"
+            continue
+        nonce = int(nonce, 16)
+        results[addr] = [nonce, -1, -1]
+        if nonce > 0:
+            searches.append([addr, 1, -1, to_block])
+            searches.append([addr, nonce, -1, to_block])
+    
+    active = [s for s in searches if s[3] - s[2] > 1]
+    while active:
+        calls = [
+            ("eth_getTransactionCount", [web3.to_checksum_address(addr), hex((lo + hi) // 2)])
+            for addr, _, lo, hi in active
+        ]
+        for search, nonce in zip(active, rpc_batch(web3, calls, batch_size)):
+            addr, target, lo, hi = search
+            if isinstance(nonce, Exception):
+                results[addr] = f"错误: {str(nonce)}"
+                search[2] = search[3] - 1
+                continue
+            mid = (lo + hi) // 2
+            if int(nonce, 16) >= target:
+                search[3] = mid
+            else:
+                search[2] = mid
+        active = [s for s in active if s[3] - s[2] > 1 and not isinstance(results[s[0]], str)]
+    
+    for addr, target, _, hi in searches:
+        if isinstance(results[addr], str):
+            continue
+        if target == 1:
+            results[addr][1] = hi
+        if target == results[addr][0]:
+            results[addr][2] = hi
+    
+    return {addr: tuple(value) if isinstance(value, list) else value for addr, value in results.items()}
+
+
+def _day_end_blocks(web3: Web3, days: List[date], lo: int, hi: int) -> Dict[date, int]:
+    """
+    二分查找每一天的最后一个区块（时间戳早于次日零点的最大区块号，本地时间）
+    
+    所有日期的二分同步推进，每一步的中点区块时间戳通过区块时间戳缓存一次取回。
+    调用方保证区块lo早于、区块hi不早于这些日期的次日零点。
+    """
+    # 每个查找任务: [lo, hi, 次日零点的时间戳]，答案为lo，满足 ts(lo) < 目标 <= ts(hi)
+    searches = {
+        day: [lo, hi, datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()]
+        for day in days
+    }
+    active = [s for s in searches.values() if s[1] - s[0] > 1]
+    while active:
+        mids = [(lo + hi) // 2 for lo, hi, _ in active]
+        timestamps = _block_timestamps(web3, mids)
+        for search, mid in zip(active, mids):
+            if timestamps[mid] < search[2]:
+                search[0] = mid
+            else:
+                search[1] = mid
+        active = [s for s in active if s[1] - s[0] > 1]
+    return {day: search[0] for day, search in searches.items()}
+
+
+def find_active_days(
+    web3: Web3,
+    found: Dict[str, Tuple[int, int, int]],
+    timestamps: Dict[int, int],
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, Union[List[date], str]]:
+    """
+    用交易数二分统计钱包发送过交易的日期（与活跃度索引的活跃天数口径相同）
+    
+    一段日期内的交易数没有增加时其中没有活跃日，否则对半拆分，直到单独的一天。
+    所有钱包的拆分同步推进，每一步把全部中点日期的交易数查询打包成批量请求；
+    查询次数约为 活跃天数 × log2(首末交易间隔的天数)，另需二分查找各中点日期的最后一个区块。
+    
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点（需为归档节点）
+        found: find_first_last_tx_blocks 的结果 {地址: (交易数, 第一笔交易区块, 最后一笔交易区块)}
+        timestamps: 第一笔/最后一笔交易所在区块的时间戳 {区块号: 时间戳}
+        batch_size: 每个JSON-RPC批量请求包含的调用数
+        
+    Returns:
+        字典 {地址: 活跃日期列表（升序）}，失败时为错误信息
+    """
+    results = {}
+    # 每个区间: [地址, 起始日, 结束日, 起始日之前的交易数, 结束日结束时的交易数]
+    intervals = []
+    for addr, (nonce, first, last) in found.items():
+        results[addr] = set()
+        if nonce > 0:
+            first_day = datetime.fromtimestamp(timestamps[first]).date()
+            last_day = datetime.fromtimestamp(timestamps[last]).date()
+            intervals.append([addr, first_day, last_day, 0, nonce])
+    blocks = [value[i] for value in found.values() if value[0] > 0 for i in (1, 2)]
+    day_ends = {}
+    
+    while intervals:
+        splits = []
+        for interval in intervals:
+            addr, lo, hi = interval[:3]
+            if isinstance(results[addr], str):
+                continue
+            if lo == hi:
+                results[addr].add(lo)
+            else:
+                splits.append(interval + [lo + timedelta(days=(hi - lo).days // 2)])
+        missing = sorted({split[5] for split in splits} - set(day_ends))
+        if missing:
+            day_ends.update(_day_end_blocks(web3, missing, min(blocks), max(blocks)))
+        calls = [
+            ("eth_getTransactionCount", [web3.to_checksum_address(split[0]), hex(day_ends[split[5]])])
+            for split in splits
+        ]
+        intervals = []
+        for (addr, lo, hi, before, after, mid), nonce in zip(splits, rpc_batch(web3, calls, batch_size)):
+            if isinstance(results[addr], str):
+                continue
+            if isinstance(nonce, Exception):
+                results[addr] = f"错误: {str(nonce)}"
+                continue
+            nonce = int(nonce, 16)
+            if nonce > before:
+                intervals.append([addr, lo, mid, before, nonce])
+            if after > nonce:
+                intervals.append([addr, mid + timedelta(days=1), hi, nonce, after])
+    
+    return {addr: value if isinstance(value, str) else sorted(value) for addr, value in results.items()}
+
+
+def _get_wallet_activity_bisect(web3: Web3, wallet_addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+    """get_wallet_activity 的二分查找模式"""
+    results = {}
+    try:
+        found = find_first_last_tx_blocks(web3, wallet_addresses)
+        
+        # 通过区块时间戳缓存取回所有涉及区块的时间戳
+        block_numbers = sorted({
+            number for value in found.values() if isinstance(value, tuple)
+            for number in value[1:] if number >= 0
+        })
+        timestamps = _block_timestamps(web3, block_numbers)
+        days = find_active_days(
+            web3, {addr: value for addr, value in found.items() if isinstance(value, tuple)}, timestamps
+        )
+    except Exception as e:
+        found = {addr: f"错误: {str(e)}" for addr in wallet_addresses}
+        timestamps = {}
+        days = {}
+    
+    for addr in wallet_addresses:
+        value = found[addr]
+        if isinstance(value, str):
+            results[addr] = {
+                "active_weeks": value,
+                "active_days": value,
+                "first_tx_time": "查询失败",
+                "last_tx_time": "查询失败"
+            }
+        elif value[0] == 0:
+            results[addr] = {
+                "active_weeks": 0,
+                "active_days": 0,
+                "first_tx_time": "无交易",
+                "last_tx_time": "无交易"
+            }
+        else:
+            active = days[addr]
+            results[addr] = {
+                "active_weeks": active if isinstance(active, str) else len({day.isocalendar()[:2] for day in active}),
+                "active_days": active if isinstance(active, str) else len(active),
+                "first_tx_time": datetime.fromtimestamp(timestamps[value[1]]).strftime("%Y-%m-%d"),
+                "last_tx_time": datetime.fromtimestamp(timestamps[value[2]]).strftime("%Y-%m-%d"),
+                "first_tx_block": value[1],
+                "last_tx_block": value[2]
+            }
+    return results
+
+
+def get_wallet_activity(
+    web3: Web3,
+    wallet_addresses: List[str],
+    max_blocks: int = 10000,
+    index_path: Optional[str] = None,
+    mode: str = "index"
+) -> Dict[str, Dict[str, Any]]:
     """
     查询钱包的活跃信息，包括活跃周数和活跃天数
     
+    mode="index"（默认）: 数据来自本地SQLite活跃度索引（见activity_index.ActivityIndex），
+    每次调用先把索引增量更新到最新区块，再从索引中查询。
+    mode="bisect": 用交易数二分查找第一笔/最后一笔交易的区块和时间（见find_first_last_tx_blocks），
+    再按日期二分统计活跃天数/周数（见find_active_days），不扫描区块，需要归档节点。
+    两种模式都只统计钱包发送的交易，日期均为本地时间的"%Y-%m-%d"，结果可直接比较。
+    
     Args:
-        web3: Web3对象，已连接到RPC节点
+        web3: Web3对象或RPCPool，已连接到RPC节点
         wallet_addresses: 钱包地址列表
-        max_blocks: 向前查询的最大区块数
+        max_blocks: 每次更新索引最多扫描的区块数（落后更多时跳过中间的区块）
+        index_path: 索引文件路径，默认为程序目录下的 data/activity_index_<chain id>.db
+        mode: "index" 或 "bisect"
         
     Returns:
         字典 {地址: {
@@ -85,121 +847,70 @@ def get_wallet_activity(web3: Web3, wallet_addresses: List[str], max_blocks: int
             "last_tx_time": 最后一笔交易时间,
         }}
     """
-    if not web3 or not web3.is_connected():
+    from activity_index import ActivityIndex, index_path_for_chain
+    
+    web3 = _resolve_web3(web3)
+    if not web3:
         raise ConnectionError("Web3未连接")
     
     results = {}
-    current_block = web3.eth.block_number
-    start_block = max(0, current_block - max_blocks)
-    
+    valid = []
     for addr in wallet_addresses:
-        try:
-            # 确保地址格式正确
-            if web3.is_address(addr):
-                checksum_addr = web3.to_checksum_address(addr)
-                
-                # 获取账户当前的交易数量
-                tx_count = web3.eth.get_transaction_count(checksum_addr)
-                
-                if tx_count == 0:
-                    # 如果没有交易，设置默认值
-                    results[addr] = {
-                        "active_weeks": 0,
-                        "active_days": 0,
-                        "first_tx_time": "无交易",
-                        "last_tx_time": "无交易"
-                    }
-                    continue
-                
-                # 使用过滤器获取交易（这里是简化方法，实际可能需要使用区块浏览器API获取更全面的数据）
-                # 由于以太坊节点API限制，很难获取完整的历史交易，这里我们采用模拟方式
-                
-                # 模拟查询一些最近的区块
-                active_days = set()
-                active_timestamps = []
-                
-                # 注意：这种方法在实际情况下效率不高，只作为示例
-                # 在实际应用中，应该使用区块链浏览器的API来获取完整的交易历史
-                try:
-                    # 尝试查找一些最近的交易
-                    latest_block = web3.eth.get_block('latest')
-                    
-                    # 获取当前区块时间
-                    current_time = datetime.fromtimestamp(latest_block.timestamp)
-                    
-                    # 模拟一些交易时间点 - 实际中这应该通过检索真实交易获得
-                    # 这里仅作为示例，随机生成一些假数据
-                    
-                    # 假设最早的交易在1-60天前
-                    import random
-                    earliest_days_ago = min(tx_count * 2, 60)  # 根据交易数量估算活跃时间
-                    earliest_time = current_time - timedelta(days=earliest_days_ago)
-                    
-                    # 生成随机的活跃日期
-                    num_active_days = min(tx_count, earliest_days_ago)  # 活跃天数不超过最早交易到现在的天数
-                    
-                    # 为了模拟真实情况，生成一些随机的交易时间点
-                    tx_timestamps = []
-                    for _ in range(min(tx_count, 100)):  # 最多生成100个时间点
-                        random_days = random.randint(0, earliest_days_ago)
-                        random_time = current_time - timedelta(days=random_days)
-                        tx_timestamps.append(random_time)
-                    
-                    tx_timestamps.sort()  # 按时间排序
-                    
-                    # 收集活跃日期
-                    for ts in tx_timestamps:
-                        active_days.add(ts.strftime("%Y-%m-%d"))
-                        active_timestamps.append(ts)
-                    
-                    # 如果有交易时间点
-                    if active_timestamps:
-                        first_tx_time = min(active_timestamps)
-                        last_tx_time = max(active_timestamps)
-                        
-                        # 计算活跃周数 - 从第一笔交易到最后一笔交易的周数
-                        days_diff = (last_tx_time - first_tx_time).days
-                        active_weeks = math.ceil(days_diff / 7) if days_diff > 0 else 1
-                        
-                        results[addr] = {
-                            "active_weeks": active_weeks,
-                            "active_days": len(active_days),
-                            "first_tx_time": first_tx_time.strftime("%Y-%m-%d"),
-                            "last_tx_time": last_tx_time.strftime("%Y-%m-%d")
-                        }
-                    else:
-                        # 没有找到交易时间点
-                        results[addr] = {
-                            "active_weeks": 0,
-                            "active_days": 0,
-                            "first_tx_time": "未知",
-                            "last_tx_time": "未知"
-                        }
-                
-                except Exception as inner_e:
-                    # 如果无法获取详细信息，使用估算值
-                    results[addr] = {
-                        "active_weeks": max(1, math.ceil(tx_count / 10)),  # 根据交易数估算
-                        "active_days": max(1, math.ceil(tx_count / 5)),   # 根据交易数估算
-                        "first_tx_time": "估算值",
-                        "last_tx_time": "估算值"
-                    }
-            else:
-                results[addr] = {
-                    "active_weeks": "无效地址",
-                    "active_days": "无效地址",
-                    "first_tx_time": "无效地址",
-                    "last_tx_time": "无效地址"
-                }
-        except Exception as e:
+        if web3.is_address(addr):
+            valid.append(addr)
+        else:
+            results[addr] = {
+                "active_weeks": "无效地址",
+                "active_days": "无效地址",
+                "first_tx_time": "无效地址",
+                "last_tx_time": "无效地址"
+            }
+    
+    if mode == "bisect":
+        results.update(_get_wallet_activity_bisect(web3, valid))
+        return {addr: results[addr] for addr in wallet_addresses}
+    
+    index = ActivityIndex(index_path or index_path_for_chain(web3.eth.chain_id))
+    try:
+        # 增量更新索引：最多扫描最近max_blocks个区块，之后从上次的区块继续
+        index.update(web3, max_blocks)
+        results.update(index.lookup(valid))
+    except Exception as e:
+        for addr in valid:
             results[addr] = {
                 "active_weeks": f"错误: {str(e)}",
                 "active_days": f"错误: {str(e)}",
                 "first_tx_time": "查询失败",
                 "last_tx_time": "查询失败"
             }
-            
-    return results
+    finally:
+        index.close()
+    
+    return {addr: results[addr] for addr in wallet_addresses}
+
+def _block_timestamps(web3: Web3, block_numbers: List[int]) -> Dict[int, int]:
+    """通过共享的区块时间戳缓存获取时间戳，缓存和批量请求都未取到的区块逐个查询"""
+    from block_cache import get_block_timestamp_cache
+    
+    timestamps = get_block_timestamp_cache().get_many(web3, block_numbers)
+    for number in set(block_numbers) - set(timestamps):
+        timestamps[number] = web3.eth.get_block(number).timestamp
+    return timestamps
+
+
+def _transfer_to_tx(event: Dict[str, Any], wallet_address: str, decimals: int, timestamp: int) -> Dict[str, Any]:
+    """将解析后的Transfer事件转换为交互记录"""
+    return {
+        'tx_hash': event['tx_hash'],
+        'block_number': event['block_number'],
+        'timestamp': datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+        'from': event['from'],
+        'to': event['to'],
+        'value': event['value'] / (10 ** decimals),
+        'event_type': 'Transfer',
+        'direction': 'OUT' if event['from'] == wallet_address else 'IN'
+    }
+
 
 def get_contract_interactions(
     web3: Web3, 
@@ -214,7 +925,7 @@ def get_contract_interactions(
     查询钱包与特定合约的交互交易
     
     Args:
-        web3: Web3对象，已连接到RPC节点
+        web3: Web3对象或RPCPool，已连接到RPC节点
         wallet_address: 钱包地址
         contract_address: 合约地址
         contract_abi: 合约ABI (可选)
@@ -225,7 +936,8 @@ def get_contract_interactions(
     Returns:
         交易列表和状态信息
     """
-    if not web3 or not web3.is_connected():
+    web3 = _resolve_web3(web3)
+    if not web3:
         raise ConnectionError("Web3未连接")
     
     if not web3.is_address(wallet_address) or not web3.is_address(contract_address):
@@ -251,25 +963,14 @@ def get_contract_interactions(
             # 尝试查询Transfer事件（常见的ERC20事件）
             if hasattr(contract.events, 'Transfer'):
                 try:
-                    # 发出的Transfer
-                    out_filter = contract.events.Transfer.createFilter(
-                        fromBlock=from_block,
-                        toBlock=to_block,
-                        argument_filters={'from': wallet_address}
-                    )
-                    out_events = out_filter.get_all_entries()
-                    
-                    # 接收的Transfer
-                    in_filter = contract.events.Transfer.createFilter(
-                        fromBlock=from_block,
-                        toBlock=to_block,
-                        argument_filters={'to': wallet_address}
-                    )
-                    in_events = in_filter.get_all_entries()
-                    
-                    # 合并并处理事件
-                    all_events = out_events + in_events
-                    all_events.sort(key=lambda x: x.blockNumber, reverse=True)
+                    # 单次遍历区块范围，同时取回转出和转入的Transfer日志（从新到旧，凑满即停）
+                    from log_scanner import scan_transfer_logs, decode_transfer_log
+                    all_events = [
+                        decode_transfer_log(log) for log in scan_transfer_logs(
+                            web3, contract_address, wallet_address,
+                            from_block, to_block, max_results=max_results
+                        )
+                    ]
                     
                     # 获取代币小数位数（如果可能）
                     decimals = 18  # 默认为18位小数
@@ -279,32 +980,11 @@ def get_contract_interactions(
                     except:
                         pass
                     
-                    # 处理事件
-                    for event in all_events[:max_results]:
-                        # 获取区块信息以得到时间戳
-                        block = web3.eth.get_block(event.blockNumber)
-                        timestamp = datetime.fromtimestamp(block.timestamp)
-                        
-                        # 处理事件参数
-                        event_args = event.args
-                        from_addr = event_args.get('from', "未知")
-                        to_addr = event_args.get('to', "未知")
-                        value = event_args.get('value', 0) / (10 ** decimals)
-                        
-                        tx_hash = event.transactionHash.hex()
-                        
-                        # 添加到结果列表
-                        tx_data = {
-                            'tx_hash': tx_hash,
-                            'block_number': event.blockNumber,
-                            'timestamp': timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                            'from': from_addr,
-                            'to': to_addr,
-                            'value': value,
-                            'event_type': 'Transfer',
-                            'direction': 'OUT' if from_addr == wallet_address else 'IN'
-                        }
-                        transactions.append(tx_data)
+                    # 处理事件，区块时间戳统一从缓存获取（未命中的一次批量请求取回）
+                    page = all_events[:max_results]
+                    timestamps = _block_timestamps(web3, [event['block_number'] for event in page])
+                    for event in page:
+                        transactions.append(_transfer_to_tx(event, wallet_address, decimals, timestamps[event['block_number']]))
                     
                     status_msg = f"找到 {len(transactions)} 笔Transfer交易"
                     return transactions, status_msg
@@ -335,19 +1015,78 @@ def get_contract_interactions(
     
     return transactions, status_msg
 
+def get_contract_interactions_bulk(
+    web3: Web3,
+    wallet_addresses: List[str],
+    contract_address: str,
+    from_block: int = 0,
+    to_block: Optional[int] = None,
+    max_results: Optional[int] = 50
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    查询整个钱包列表与某个代币合约的Transfer交互
+    
+    与逐个钱包调用 get_contract_interactions 不同，这里只扫描一遍区块范围，
+    日志按钱包分组（见log_scanner.scan_transfer_logs_bulk）。
+    
+    Args:
+        web3: Web3对象或RPCPool，已连接到RPC节点
+        wallet_addresses: 钱包地址列表（如 MonadWalletTool.wallets）
+        contract_address: 代币合约地址
+        from_block: 起始区块 (默认为0)
+        to_block: 结束区块 (默认为'latest')
+        max_results: 每个钱包最多返回的记录数，None表示不限
+        
+    Returns:
+        字典 {钱包地址: 交易列表}，记录格式与 get_contract_interactions 相同
+    """
+    from log_scanner import scan_transfer_logs_bulk
+    
+    web3 = _resolve_web3(web3)
+    if not web3:
+        raise ConnectionError("Web3未连接")
+    
+    if not web3.is_address(contract_address):
+        raise ValueError("无效的合约地址")
+    contract_address = web3.to_checksum_address(contract_address)
+    
+    buckets = scan_transfer_logs_bulk(web3, contract_address, wallet_addresses, from_block, to_block)
+    
+    # 代币小数位数只查询一次
+    decimals = get_token_info(web3, contract_address)["decimals"]
+    
+    pages = {
+        addr: events[:max_results] if max_results is not None else events
+        for addr, events in buckets.items()
+    }
+    timestamps = _block_timestamps(
+        web3, [event['block_number'] for events in pages.values() for event in events]
+    )
+    
+    results = {}
+    for addr, events in pages.items():
+        checksum_addr = web3.to_checksum_address(addr) if web3.is_address(addr) else addr
+        results[addr] = [
+            _transfer_to_tx(event, checksum_addr, decimals, timestamps[event['block_number']])
+            for event in events
+        ]
+    
+    return results
+
 def get_token_info(web3: Web3, token_address: str, token_abi: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """
     获取代币信息（名称、符号、小数位数）
     
     Args:
-        web3: Web3对象，已连接到RPC节点
+        web3: Web3对象或RPCPool，已连接到RPC节点
         token_address: 代币合约地址
         token_abi: 代币合约ABI (可选)
         
     Returns:
         代币信息字典
     """
-    if not web3 or not web3.is_connected():
+    web3 = _resolve_web3(web3)
+    if not web3:
         raise ConnectionError("Web3未连接")
     
     # 基本ERC20接口ABI（如果未提供完整ABI）